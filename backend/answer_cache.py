@@ -0,0 +1,263 @@
+"""
+Semantic answer cache for the RAG tutor.
+
+Two lookup levels sit in front of the QA chain:
+
+1. Exact match on the normalized question text.
+2. Near-duplicate match on the question embedding (cosine similarity above a
+   threshold), restricted to questions with the same language directive.
+
+Answers restricted to a subset of lessons are cached under that scope and
+only served to requests with the same scope.
+
+Entries expire after a TTL, the least recently used entries are evicted
+beyond max_entries, and the whole cache is dropped when a new index version
+is set so answers never outlive the lessons they were generated from.
+Lookups and answers of requests still running on an older version are
+ignored rather than mixed in.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Leading instruction added by the frontend, e.g. "[Respond in English]"
+_DIRECTIVE_RE = re.compile(r"^\s*(\[[^\]]*\])\s*")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def split_directive(question: str) -> Tuple[str, str]:
+    """
+    Separate a leading "[...]" language directive from the question.
+
+    Args:
+        question: Raw question text
+
+    Returns:
+        Tuple of (normalized directive or "", remaining question)
+    """
+    match = _DIRECTIVE_RE.match(question)
+    if not match:
+        return "", question
+    return match.group(1).casefold(), question[match.end():]
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question for exact-match lookups.
+
+    Case, repeated whitespace and trailing punctuation are ignored; the
+    language directive is kept because it changes the answer.
+
+    Args:
+        question: Raw question text
+
+    Returns:
+        Normalized question
+    """
+    directive, text = split_directive(question)
+    text = _WHITESPACE_RE.sub(" ", text.casefold()).strip().rstrip("?!.。 ")
+    return f"{directive} {text}".strip()
+
+
+class AnswerCache:
+    """
+    Two-level (exact + semantic) LRU answer cache with TTL.
+
+    Cached values are dictionaries (e.g. {"answer": ..., "sources": ...})
+    returned as-is on a hit.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        ttl_seconds: float = 3600,
+        similarity_threshold: float = 0.97
+    ):
+        """
+        Args:
+            max_entries: Maximum number of cached answers
+            ttl_seconds: Seconds before an entry expires
+            similarity_threshold: Minimum cosine similarity for a semantic hit
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.version: Optional[str] = None
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        # (scope, normalized question) -> entry
+        self._entries: "OrderedDict[Tuple[str, str], dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set_version(self, version: str) -> None:
+        """
+        Switch to a newly loaded index version, dropping every entry.
+
+        Args:
+            version: Version of the index now serving requests
+        """
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+
+    def _current(self, version: str) -> bool:
+        """
+        Whether a call is for the current index version.
+
+        The first version seen is adopted; after that only set_version()
+        moves on, so requests still running on an older index neither read
+        nor store entries.
+        """
+        if self.version is None:
+            self.version = version
+        return version == self.version
+
+    def _expired(self, entry: dict, now: float) -> bool:
+        return now - entry["created_at"] > self.ttl_seconds
+
+    def get_exact(self, question: str, version: str, scope: str = "") -> Optional[dict]:
+        """
+        Look up a cached answer by normalized question text.
+
+        Args:
+            question: Raw question text
+            version: Index version the request runs on
+            scope: Lessons the answer must be restricted to ("" for all)
+
+        Returns:
+            Cached value, or None on a miss
+        """
+        key = (scope, normalize_question(question))
+        with self._lock:
+            if not self._current(version):
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry, time.time()):
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry["value"]
+
+    def get_similar(
+        self,
+        question: str,
+        embedding: List[float],
+        version: str,
+        scope: str = ""
+    ) -> Optional[dict]:
+        """
+        Look up a cached answer for a near-duplicate question.
+
+        Only entries with the same language directive and scope are
+        compared. A miss here counts as a cache miss (call get_exact() first).
+
+        Args:
+            question: Raw question text
+            embedding: Embedding of the question
+            version: Index version the request runs on
+            scope: Lessons the answer must be restricted to ("" for all)
+
+        Returns:
+            Cached value of the most similar question, or None on a miss
+        """
+        directive, _ = split_directive(question)
+        query = np.asarray(embedding, dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+
+        with self._lock:
+            if not self._current(version):
+                self.misses += 1
+                return None
+            now = time.time()
+            for key in [k for k, e in self._entries.items() if self._expired(e, now)]:
+                del self._entries[key]
+
+            candidates = [
+                (key, entry) for key, entry in self._entries.items()
+                if entry["directive"] == directive and key[0] == scope
+            ]
+            if not candidates:
+                self.misses += 1
+                return None
+
+            # One matrix-vector product instead of a Python loop per entry
+            matrix = np.stack([entry["embedding"] for _, entry in candidates])
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.similarity_threshold:
+                self.misses += 1
+                return None
+
+            key, entry = candidates[best]
+            self._entries.move_to_end(key)
+            self.semantic_hits += 1
+            return entry["value"]
+
+    def put(
+        self,
+        question: str,
+        embedding: Optional[List[float]],
+        value: dict,
+        version: str,
+        scope: str = ""
+    ) -> None:
+        """
+        Cache an answer.
+
+        Args:
+            question: Raw question text
+            embedding: Embedding of the question (None disables semantic hits)
+            value: Value to return on later hits
+            version: Index version the answer was generated from (answers
+                from an outdated version are not stored)
+            scope: Lessons the answer was restricted to ("" for all)
+        """
+        key = (scope, normalize_question(question))
+        directive, _ = split_directive(question)
+        vector = None
+        if embedding is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            vector /= np.linalg.norm(vector) or 1.0
+
+        with self._lock:
+            if not self._current(version):
+                return
+            self._entries[key] = {
+                "value": value,
+                "embedding": vector if vector is not None else np.zeros(0, dtype=np.float32),
+                "directive": directive if vector is not None else None,
+                "created_at": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report cache counters.
+
+        Returns:
+            Dictionary with exact hits, semantic hits, misses and entry count
+        """
+        with self._lock:
+            return {
+                "exact_hits": self.exact_hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
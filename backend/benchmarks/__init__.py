@@ -0,0 +1,10 @@
+"""
+Offline benchmarks for the RAG tutor.
+
+Everything here runs without an OpenAI key: embeddings are deterministic
+hash-seeded vectors and the chat model is a fake with configurable latency.
+Results are written as JSON so runs can be compared across commits.
+
+Usage (from backend/):
+    python -m benchmarks --sizes 1000,10000,100000 --out results.json
+"""
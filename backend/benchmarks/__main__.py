@@ -0,0 +1,102 @@
+"""
+Command-line entry point: python -m benchmarks
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from . import ann, components, memory, mmr, retrieval_modes, splitters
+from .common import quiet_logging
+
+SUITES = {
+    "ann": ann.run,
+    "components": components.run,
+    "memory": memory.run,
+    "mmr": mmr.run,
+    "retrieval_modes": retrieval_modes.run,
+    "splitters": splitters.run,
+}
+
+
+def git_commit() -> str:
+    """Short hash of the checked-out commit, or "unknown" outside a git checkout"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=Path(__file__).resolve().parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument(
+        "--suite", action="append", choices=sorted(SUITES),
+        help="Suite to run (repeatable; default: all)"
+    )
+    parser.add_argument(
+        "--sizes", default="1000,10000,100000",
+        type=lambda value: [int(size) for size in value.split(",")],
+        help="Comma-separated corpus sizes in chunks"
+    )
+    parser.add_argument("--queries", type=int, default=200, help="Questions per retrieval benchmark")
+    parser.add_argument("--chain-queries", type=int, default=20, help="Questions sent through qa_chain")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Fake LLM latency in seconds")
+    parser.add_argument(
+        "--embed-latency", type=float, default=0.0,
+        help="Fake query embedding latency in seconds (retrieval_modes suite)"
+    )
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes (memory suite)")
+    parser.add_argument("--out", type=Path, help="Write JSON results here (default: stdout)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> dict:
+    """
+    Run the selected suites and emit the JSON report.
+
+    Args:
+        argv: Command-line arguments (defaults to sys.argv)
+
+    Returns:
+        The report
+    """
+    options = parse_args(argv)
+    quiet_logging()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "options": {key: str(value) if isinstance(value, Path) else value for key, value in vars(options).items()},
+        },
+        "results": {},
+    }
+    with tempfile.TemporaryDirectory(prefix="rag-bench-") as tmp:
+        for name in options.suite or sorted(SUITES):
+            workdir = Path(tmp) / name
+            workdir.mkdir()
+            report["results"][name] = SUITES[name](options, workdir)
+
+    output = json.dumps(report, indent=2)
+    if options.out:
+        options.out.write_text(output + "\n")
+        print(f"Results written to {options.out}", file=sys.stderr)
+    else:
+        print(output)
+    return report
+
+
+if __name__ == "__main__":
+    main()
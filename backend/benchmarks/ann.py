@@ -0,0 +1,132 @@
+"""
+Approximate index types: recall and latency against the exact flat index.
+
+Chunks and questions are embedded with the hashing provider
+(embedding_providers.HashingEmbeddings): texts sharing words get similar
+vectors, so the corpus has the kind of structure IVF and HNSW exploit. The
+hash-seeded fakes used by the other suites are uniformly random, which is
+the worst case for every ANN index.
+
+For each corpus size every configuration is built (IVF types are trained on
+the corpus) and reported with:
+
+- build_seconds: training plus adding the vectors
+- memory_mb:     serialized index size (vectors or codes, lists, graph)
+- searches:      per search setting, recall@k against flat, single-query
+                 latency (p50/p99) and QPS
+"""
+
+import sys
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+import main
+from embedding_providers import HashingEmbeddings
+from index_store import build_ann_index, tune_index
+
+from .common import measure, timed
+from .corpus import make_questions, write_corpus
+
+# name -> (build parameters, search settings to sweep)
+CONFIGURATIONS = {
+    "flat": ({"index_type": "flat"}, [{}]),
+    "ivf_flat": (
+        {"index_type": "ivf_flat", "nlist": main.Config.IVF_NLIST},
+        [{"nprobe": nprobe} for nprobe in (4, 16, 64)],
+    ),
+    "hnsw": (
+        {"index_type": "hnsw", "hnsw_m": main.Config.HNSW_M, "ef_construction": main.Config.HNSW_EF_CONSTRUCTION},
+        [{"ef_search": ef_search} for ef_search in (16, 64, 256)],
+    ),
+    "ivf_pq": (
+        {
+            "index_type": "ivf_pq",
+            "nlist": main.Config.IVF_NLIST,
+            "pq_m": main.Config.PQ_M,
+            "pq_nbits": main.Config.PQ_NBITS,
+        },
+        [{"nprobe": nprobe} for nprobe in (4, 16, 64)],
+    ),
+}
+
+
+def recall_at_k(found: np.ndarray, expected: np.ndarray) -> float:
+    """
+    Fraction of the exact top-k that the approximate search returned.
+
+    Args:
+        found: Approximate result ids, one row per query
+        expected: Exact result ids, one row per query
+
+    Returns:
+        Mean recall over the queries
+    """
+    k = expected.shape[1]
+    return float(np.mean([len(set(f) & set(e)) / k for f, e in zip(found, expected)]))
+
+
+def bench_size(n_chunks: int, workdir: Path, options) -> dict:
+    """
+    Build and search every index configuration for one corpus size.
+
+    Args:
+        n_chunks: Corpus size in chunks
+        workdir: Scratch directory
+        options: Parsed command-line options
+
+    Returns:
+        Results keyed by configuration name
+    """
+    corpus = write_corpus(workdir / f"lessons_{n_chunks}", n_chunks)
+    texts = [doc.page_content for doc in main.load_documents(corpus)]
+    embeddings = HashingEmbeddings(size=options.dim)
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    queries = np.asarray(embeddings.embed_documents(make_questions(options.queries)), dtype=np.float32)
+    k = main.Config.RETRIEVER_K
+
+    _, expected = build_ann_index(vectors, "flat").search(queries, k)
+    results = {}
+    for name, (params, settings) in CONFIGURATIONS.items():
+        index, build_seconds = timed(lambda params=params: build_ann_index(vectors, **params))
+        searches = {}
+        for setting in settings:
+            tune_index(index, **{"nprobe": main.Config.IVF_NPROBE, "ef_search": main.Config.HNSW_EF_SEARCH, **setting})
+            _, found = index.search(queries, k)
+            cycle = iter(range(10 ** 9))
+            latency = measure(
+                lambda index=index, cycle=cycle: index.search(queries[next(cycle) % len(queries)][None, :], k),
+                len(queries)
+            )
+            label = ",".join(f"{key}={value}" for key, value in setting.items()) or "exact"
+            searches[label] = {
+                f"recall_at_{k}": round(recall_at_k(found, expected), 4),
+                **latency,
+                "qps": round(1000 / latency["mean_ms"], 1),
+            }
+        results[name] = {
+            "params": params,
+            "build_seconds": round(build_seconds, 4),
+            "memory_mb": round(len(faiss.serialize_index(index)) / 1e6, 3),
+            "searches": searches,
+        }
+    return results
+
+
+def run(options, workdir: Path) -> dict:
+    """
+    Run the ANN index benchmarks for every requested size.
+
+    Args:
+        options: Parsed command-line options
+        workdir: Scratch directory
+
+    Returns:
+        Results keyed by corpus size
+    """
+    results = {}
+    for n_chunks in options.sizes:
+        print(f"ann: {n_chunks} chunks...", file=sys.stderr, flush=True)
+        results[str(n_chunks)] = bench_size(n_chunks, workdir, options)
+    return results
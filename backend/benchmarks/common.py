@@ -0,0 +1,128 @@
+"""
+Shared helpers for the benchmark suites.
+"""
+
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# Module globals of main replaced by initialize_app()
+_MAIN_GLOBALS = (
+    "api_key", "documents", "vectorstore", "retriever", "llm", "qa_chain",
+    "answer_chain", "index_manifest", "index_version",
+)
+
+
+def quiet_logging() -> None:
+    """
+    Keep the API's logs out of the benchmark output.
+
+    Per-file loading logs would drown the progress output, and stdout is
+    reserved for the JSON report.
+    """
+    logging.getLogger("main").setLevel(logging.WARNING)
+    logging.getLogger("index_store").setLevel(logging.WARNING)
+    logging.getLogger("langchain_text_splitters").setLevel(logging.ERROR)
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.StreamHandler) and handler.stream is sys.stdout:
+            handler.setStream(sys.stderr)
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """
+    Summarize latency samples.
+
+    Args:
+        samples: Durations in seconds
+
+    Returns:
+        Dictionary with count, mean, p50, p99 and max in milliseconds
+    """
+    ms = np.asarray(samples) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(ms.mean()), 4),
+        "p50_ms": round(float(np.percentile(ms, 50)), 4),
+        "p99_ms": round(float(np.percentile(ms, 99)), 4),
+        "max_ms": round(float(ms.max()), 4),
+    }
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """
+    Time repeated calls of a function.
+
+    Args:
+        func: Zero-argument callable to time
+        repeat: Number of calls
+
+    Returns:
+        summarize() of the per-call durations
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def timed(func: Callable[[], object]):
+    """
+    Run a function once and time it.
+
+    Args:
+        func: Zero-argument callable
+
+    Returns:
+        Tuple of (result, seconds)
+    """
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+@contextmanager
+def offline_main(data_path: Path, index_path: Path, embeddings: Embeddings, llm):
+    """
+    Point the API module at a corpus and fake clients for the duration of a block.
+
+    Config paths, the client factories and the module globals set by
+    initialize_app() are restored on exit.
+
+    Args:
+        data_path: Lessons directory
+        index_path: Directory for the persisted index
+        embeddings: Embeddings returned by get_embeddings()
+        llm: Chat model returned by get_llm()
+
+    Yields:
+        The main module
+    """
+    import main
+
+    saved_globals = {name: getattr(main, name) for name in _MAIN_GLOBALS}
+    saved_config = (main.Config.DATA_PATH, main.Config.INDEX_PATH)
+    saved_factories = (main.get_embeddings, main.get_llm)
+    saved_key = os.environ.get("OPENAI_API_KEY")
+
+    os.environ["OPENAI_API_KEY"] = saved_key or "sk-benchmark"
+    main.Config.DATA_PATH, main.Config.INDEX_PATH = data_path, index_path
+    main.get_embeddings = lambda api_key: embeddings
+    main.get_llm = lambda api_key: llm
+    try:
+        yield main
+    finally:
+        main.Config.DATA_PATH, main.Config.INDEX_PATH = saved_config
+        main.get_embeddings, main.get_llm = saved_factories
+        for name, value in saved_globals.items():
+            setattr(main, name, value)
+        if saved_key is None:
+            del os.environ["OPENAI_API_KEY"]
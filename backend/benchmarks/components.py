@@ -0,0 +1,171 @@
+"""
+Component benchmarks at several corpus sizes.
+
+For each size a synthetic corpus is written and the following are measured:
+
+- load:       load_documents() throughput (MB/s and chunks/s)
+- build:      embedding, FAISS index and BM25 index construction time
+- retrieval:  LessonRetriever latency and QPS (uncached and on retrieval
+              cache hits), search-only latency, lesson-scoped search latency
+              and batch_search() throughput
+- format_docs: cost of formatting the top-k chunks into the prompt context
+- startup:    initialize_app() with no persisted index (cold) and with one (warm)
+- query:      end-to-end qa_chain latency with the fake chat model
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+import main
+from bm25 import BM25Index
+from index_store import batch_search, lesson_ranges, search_ranges
+from retrieval_cache import RetrievalCache
+
+from .common import measure, offline_main, summarize, timed
+from .corpus import make_questions, write_corpus
+from .fakes import FakeChatModel, HashEmbeddings
+
+
+def bench_size(n_chunks: int, workdir: Path, options) -> dict:
+    """
+    Run every component benchmark for one corpus size.
+
+    Args:
+        n_chunks: Target corpus size in chunks
+        workdir: Scratch directory for the corpus and index
+        options: Parsed command-line options
+
+    Returns:
+        Results keyed by component
+    """
+    embeddings = HashEmbeddings(size=options.dim)
+    corpus = write_corpus(workdir / f"lessons_{n_chunks}", n_chunks)
+    corpus_bytes = sum(path.stat().st_size for path in corpus.glob("*.txt"))
+    questions = make_questions(options.queries)
+    results = {}
+
+    docs, seconds = timed(lambda: main.load_documents(corpus))
+    results["load"] = {
+        "chunks": len(docs),
+        "files": len(list(corpus.glob("*.txt"))),
+        "megabytes": round(corpus_bytes / 1e6, 3),
+        "seconds": round(seconds, 4),
+        "mb_per_second": round(corpus_bytes / 1e6 / seconds, 2),
+        "chunks_per_second": round(len(docs) / seconds, 1),
+    }
+
+    texts = [doc.page_content for doc in docs]
+    vectors, embed_seconds = timed(lambda: embeddings.embed_documents(texts))
+    vectorstore, index_seconds = timed(lambda: FAISS.from_embeddings(
+        list(zip(texts, vectors)),
+        embeddings,
+        metadatas=[doc.metadata for doc in docs],
+        ids=[doc.id for doc in docs],
+    ))
+    _, bm25_seconds = timed(lambda: BM25Index.from_vectorstore(vectorstore))
+    results["build"] = {
+        "embed_seconds": round(embed_seconds, 4),
+        "index_seconds": round(index_seconds, 4),
+        "bm25_seconds": round(bm25_seconds, 4),
+        "vectors": vectorstore.index.ntotal,
+        "dimension": options.dim,
+    }
+
+    retriever = main.build_retriever(vectorstore)
+    query_vectors = embeddings.embed_documents(questions)
+    cycle = iter(range(10 ** 9))
+
+    retrieve = measure(lambda: retriever.invoke(questions[next(cycle) % len(questions)]), len(questions))
+    cached_retriever = retriever.default.model_copy(update={"cache": RetrievalCache(), "index_version": "benchmark"})
+    for question in questions:
+        cached_retriever.invoke(question)
+    cache_hit = measure(lambda: cached_retriever.invoke(questions[next(cycle) % len(questions)]), len(questions))
+    search = measure(
+        lambda: vectorstore.similarity_search_by_vector(query_vectors[next(cycle) % len(questions)], k=main.Config.RETRIEVER_K),
+        len(questions)
+    )
+    ranges, partition_seconds = timed(lambda: lesson_ranges(vectorstore))
+    one_lesson = next(iter(ranges.values()))
+    scoped = measure(
+        lambda: search_ranges(vectorstore, query_vectors[next(cycle) % len(questions)], main.Config.RETRIEVER_K, one_lesson),
+        len(questions)
+    )
+    _, batch_seconds = timed(lambda: batch_search(vectorstore, query_vectors, main.Config.RETRIEVER_K))
+    results["retrieval"] = {
+        "retriever": {**retrieve, "qps": round(1000 / retrieve["mean_ms"], 1)},
+        "retriever_cache_hit": {**cache_hit, "qps": round(1000 / cache_hit["mean_ms"], 1)},
+        "search_only": {**search, "qps": round(1000 / search["mean_ms"], 1)},
+        "search_one_lesson": {**scoped, "qps": round(1000 / scoped["mean_ms"], 1)},
+        "partition_seconds": round(partition_seconds, 4),
+        "batch_search": {
+            "queries": len(questions),
+            "seconds": round(batch_seconds, 4),
+            "qps": round(len(questions) / batch_seconds, 1),
+        },
+    }
+
+    top_k = retriever.invoke(questions[0])
+    results["format_docs"] = measure(lambda: main.format_docs(top_k), 1000)
+
+    results["startup"], results["query"] = bench_startup_and_query(
+        corpus, workdir / f"index_{n_chunks}", embeddings, questions, options
+    )
+    return results
+
+
+def bench_startup_and_query(corpus: Path, index_path: Path, embeddings, questions, options):
+    """
+    Time initialize_app() cold and warm, then end-to-end chain queries.
+
+    Args:
+        corpus: Lessons directory
+        index_path: Directory for the persisted index (must not exist yet)
+        embeddings: Embeddings for the fake clients
+        questions: Questions for the query benchmark
+        options: Parsed command-line options
+
+    Returns:
+        Tuple of (startup results, query results)
+    """
+    llm = FakeChatModel(latency=options.llm_latency)
+    with offline_main(corpus, index_path, embeddings, llm) as app:
+        _, cold = timed(app.initialize_app)
+        _, warm = timed(app.initialize_app)
+
+        async def run_queries():
+            samples = []
+            for question in questions[:options.chain_queries]:
+                start = time.perf_counter()
+                await app.qa_chain.ainvoke(question)
+                samples.append(time.perf_counter() - start)
+            return samples
+
+        samples = asyncio.run(run_queries())
+
+    startup = {"cold_seconds": round(cold, 4), "warm_seconds": round(warm, 4)}
+    query = {**summarize(samples), "llm_latency_ms": options.llm_latency * 1000}
+    query["overhead_ms"] = round(float(np.mean(samples)) * 1000 - query["llm_latency_ms"], 4)
+    return startup, query
+
+
+def run(options, workdir: Path) -> dict:
+    """
+    Run the component benchmarks for every requested corpus size.
+
+    Args:
+        options: Parsed command-line options
+        workdir: Scratch directory
+
+    Returns:
+        Results keyed by corpus size
+    """
+    results = {}
+    for n_chunks in options.sizes:
+        print(f"components: {n_chunks} chunks...", file=sys.stderr, flush=True)
+        results[str(n_chunks)] = bench_size(n_chunks, workdir, options)
+    return results
@@ -0,0 +1,91 @@
+"""
+Synthetic lesson corpora of a chosen size.
+
+Paragraphs are sampled from the vocabulary of the real lessons and sized so
+that each one becomes a single chunk with the default splitter settings, so
+a corpus of N paragraphs indexes to roughly N chunks.
+"""
+
+import re
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+LESSONS_PATH = Path(__file__).resolve().parent.parent.parent / "content" / "lessons"
+PARAGRAPHS_PER_FILE = 200
+PARAGRAPH_CHARS = 420  # Below CHUNK_SIZE, and two paragraphs never fit in one chunk
+
+_WORD_RE = re.compile(r"[A-Za-z][A-Za-z0-9_\-]+")
+
+
+def lesson_vocabulary(lessons_path: Path = LESSONS_PATH) -> List[str]:
+    """
+    Collect the distinct words of the real lessons.
+
+    Args:
+        lessons_path: Directory of lesson .txt files
+
+    Returns:
+        Sorted list of words (a small fallback list if no lessons exist)
+    """
+    words = set()
+    for path in lessons_path.glob("*.txt"):
+        words.update(_WORD_RE.findall(path.read_text(encoding="utf-8")))
+    return sorted(words) or ["retrieval", "augmented", "generation", "vector", "embedding", "model"]
+
+
+def make_paragraphs(n: int, seed: int = 0) -> List[str]:
+    """
+    Generate n synthetic paragraphs.
+
+    Args:
+        n: Number of paragraphs
+        seed: Random seed (the same seed yields the same corpus)
+
+    Returns:
+        List of paragraphs of about PARAGRAPH_CHARS characters
+    """
+    vocabulary = np.asarray(lesson_vocabulary())
+    rng = np.random.default_rng(seed)
+    mean_len = np.mean([len(w) for w in vocabulary]) + 1
+    words_per_paragraph = max(1, int(PARAGRAPH_CHARS / mean_len))
+    sampled = vocabulary[rng.integers(0, len(vocabulary), size=(n, words_per_paragraph))]
+    return [" ".join(row)[:PARAGRAPH_CHARS] for row in sampled]
+
+
+def write_corpus(out_dir: Path, n_chunks: int, seed: int = 0) -> Path:
+    """
+    Write a synthetic lessons directory that splits into about n_chunks chunks.
+
+    Args:
+        out_dir: Directory to create the lesson files in
+        n_chunks: Target number of chunks
+        seed: Random seed
+
+    Returns:
+        out_dir
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paragraphs = make_paragraphs(n_chunks, seed)
+    for i in range(0, n_chunks, PARAGRAPHS_PER_FILE):
+        lesson = "\n\n".join(paragraphs[i:i + PARAGRAPHS_PER_FILE])
+        (out_dir / f"{i // PARAGRAPHS_PER_FILE:05d}_synthetic.txt").write_text(lesson, encoding="utf-8")
+    return out_dir
+
+
+def make_questions(n: int, seed: int = 1) -> List[str]:
+    """
+    Generate n short questions over the lesson vocabulary.
+
+    Args:
+        n: Number of questions
+        seed: Random seed
+
+    Returns:
+        List of questions
+    """
+    vocabulary = np.asarray(lesson_vocabulary())
+    rng = np.random.default_rng(seed)
+    sampled = vocabulary[rng.integers(0, len(vocabulary), size=(n, 4))]
+    return [f"What is {' '.join(row)}?" for row in sampled]
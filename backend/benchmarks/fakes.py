@@ -0,0 +1,91 @@
+"""
+Deterministic stand-ins for the OpenAI clients.
+"""
+
+import asyncio
+import hashlib
+import time
+from typing import List
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Embeddings seeded from a hash of the text.
+
+    The same text always maps to the same unit vector, so indexes and search
+    results are reproducible across runs. An optional per-call latency
+    simulates the network round trip to an embedding API.
+    """
+
+    def __init__(self, size: int = 384, latency: float = 0.0):
+        """
+        Args:
+            size: Embedding dimension
+            latency: Seconds slept per embedding call (not per text)
+        """
+        self.size = size
+        self.latency = latency
+
+    def _vector(self, text: str) -> List[float]:
+        seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+        vector = np.random.default_rng(seed).standard_normal(self.size).astype(np.float32)
+        vector /= np.linalg.norm(vector)
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        if self.latency:
+            time.sleep(self.latency)
+        return self._vector(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._vector(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._vector(text)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Chat model returning a fixed answer after a configurable delay.
+
+    latency is the time to the first token; token_latency is added between
+    streamed tokens.
+    """
+
+    answer: str = "This is a benchmark answer from the fake tutor."
+    latency: float = 0.0
+    token_latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-fake-chat-model"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency + self.token_latency * len(self.answer.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency + self.token_latency * len(self.answer.split()))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.answer))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for i, word in enumerate(self.answer.split(" ")):
+            if i:
+                await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
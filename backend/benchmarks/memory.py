@@ -0,0 +1,123 @@
+"""
+Memory per worker process, with the persisted index loaded or memory-mapped.
+
+For each corpus size the index is built and saved once. Then --workers
+processes are started the way `uvicorn --workers N` starts them (spawned,
+nothing inherited), each runs initialize_app() on the saved index, answers
+--queries retrievals and reports its memory while all workers are alive:
+
+- rss_mb:     resident set size; shared pages count in every process
+- pss_mb:     proportional set size; shared pages are split between the
+              processes mapping them, so the sum is the real footprint
+- private_mb: pages no other process uses (the worker's own copies)
+- init_private_mb: private memory added by initialize_app() and the queries
+
+Requires Linux (/proc/self/smaps_rollup).
+"""
+
+import multiprocessing
+import sys
+from pathlib import Path
+from typing import Dict
+
+from .common import offline_main, quiet_logging
+from .corpus import make_questions, write_corpus
+from .fakes import FakeChatModel, HashEmbeddings
+
+MODES = {"in_memory": False, "mmap": True}
+
+
+def read_memory() -> Dict[str, float]:
+    """
+    Memory of the current process.
+
+    Returns:
+        rss_mb, pss_mb and private_mb, in MB
+    """
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss_mb": round(fields["Rss"], 1),
+        "pss_mb": round(fields["Pss"], 1),
+        "private_mb": round(fields["Private_Clean"] + fields["Private_Dirty"], 1),
+    }
+
+
+def worker(corpus: Path, index_path: Path, options, memory_map: bool, barrier, results) -> None:
+    """
+    Start the app on the saved index, query it and report memory.
+
+    Runs in a spawned process; waits on the barrier so every worker is
+    measured while the others are alive and mapping the same files.
+    """
+    quiet_logging()
+    with offline_main(corpus, index_path, HashEmbeddings(size=options.dim), FakeChatModel()) as app:
+        app.Config.INDEX_MMAP = memory_map
+        before = read_memory()
+        app.initialize_app()
+        for question in make_questions(options.queries):
+            app.retriever.invoke(question)
+        barrier.wait()
+        after = read_memory()
+        barrier.wait()
+    results.put({**after, "init_private_mb": round(after["private_mb"] - before["private_mb"], 1)})
+
+
+def bench_size(n_chunks: int, workdir: Path, options) -> dict:
+    """
+    Measure worker memory for one corpus size in both load modes.
+
+    Args:
+        n_chunks: Corpus size in chunks
+        workdir: Scratch directory
+        options: Parsed command-line options
+
+    Returns:
+        Per-worker memory and totals keyed by mode
+    """
+    corpus = write_corpus(workdir / f"lessons_{n_chunks}", n_chunks)
+    index_path = workdir / f"index_{n_chunks}"
+    with offline_main(corpus, index_path, HashEmbeddings(size=options.dim), FakeChatModel()) as app:
+        app.initialize_app()
+
+    context = multiprocessing.get_context("spawn")
+    results = {}
+    for mode, memory_map in MODES.items():
+        barrier, queue = context.Barrier(options.workers, timeout=600), context.Queue()
+        processes = [
+            context.Process(target=worker, args=(corpus, index_path, options, memory_map, barrier, queue))
+            for _ in range(options.workers)
+        ]
+        for process in processes:
+            process.start()
+        workers = [queue.get(timeout=900) for _ in processes]
+        for process in processes:
+            process.join()
+        results[mode] = {
+            "workers": workers,
+            "mean": {key: round(sum(w[key] for w in workers) / len(workers), 1) for key in workers[0]},
+            "total_pss_mb": round(sum(w["pss_mb"] for w in workers), 1),
+        }
+    return results
+
+
+def run(options, workdir: Path) -> dict:
+    """
+    Run the worker memory benchmarks for every requested size.
+
+    Args:
+        options: Parsed command-line options
+        workdir: Scratch directory
+
+    Returns:
+        Results keyed by corpus size
+    """
+    results = {}
+    for n_chunks in options.sizes:
+        print(f"memory: {n_chunks} chunks, {options.workers} workers...", file=sys.stderr, flush=True)
+        results[str(n_chunks)] = bench_size(n_chunks, workdir, options)
+    return results
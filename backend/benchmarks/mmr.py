@@ -0,0 +1,167 @@
+"""
+Cost and effect of maximal-marginal-relevance re-ranking.
+
+Latency is measured on synthetic corpora of each requested size with the
+hashing embeddings (embedding_providers.HashingEmbeddings). Question
+embeddings are computed up front, so only the search differs between runs:
+
+- search:  dense top-k search, the baseline
+- mmr:     per MMR_FETCH_K setting, the same search fetching fetch_k
+           candidates and re-ranking them (reconstruct + MMR); added_ms is
+           the mean difference to the baseline
+- rerank:  the re-ranking step alone (reconstructing the fetch_k vectors and
+           running maximal_marginal_relevance)
+
+The effect is measured on the real lessons with the labeled questions of
+the retrieval_modes suite: hit rate of the expected lesson, distinct lessons
+and mean pairwise cosine similarity among the k results (lower is more
+diverse).
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+import main
+from embedding_providers import HashingEmbeddings
+from index_store import lesson_ranges, reconstruct_vectors
+from retrieval import LessonRetriever, maximal_marginal_relevance
+
+from .common import measure
+from .corpus import LESSONS_PATH, make_questions, write_corpus
+from .retrieval_modes import LABELED_QUESTIONS
+
+FETCH_KS = (10, 20, 50)
+
+
+def build_store(docs, dim: int) -> FAISS:
+    """Index documents with the hashing embeddings"""
+    embeddings = HashingEmbeddings(size=dim)
+    texts = [doc.page_content for doc in docs]
+    return FAISS.from_embeddings(
+        list(zip(texts, embeddings.embed_documents(texts))),
+        embeddings,
+        metadatas=[doc.metadata for doc in docs],
+        ids=[doc.id for doc in docs],
+    )
+
+
+def retrievers(vectorstore: FAISS) -> dict:
+    """Vector-mode retrievers without MMR and with each fetch_k"""
+    ranges = lesson_ranges(vectorstore)
+    settings = {"search": {}}
+    settings.update({
+        f"mmr_fetch_k={fetch_k}": {"mmr": True, "mmr_fetch_k": fetch_k, "mmr_lambda": main.Config.MMR_LAMBDA}
+        for fetch_k in FETCH_KS
+    })
+    built = {}
+    for name, options in settings.items():
+        retriever = LessonRetriever(
+            vectorstore=vectorstore, k=main.Config.RETRIEVER_K, lesson_ranges=ranges, mode="vector", **options
+        )
+        if retriever.mmr:
+            retriever.prepare_mmr()
+        built[name] = retriever
+    return built
+
+
+def pairwise_similarity(vectors: np.ndarray) -> float:
+    """Mean cosine similarity between distinct rows"""
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    similarity = vectors @ vectors.T
+    n = len(vectors)
+    return float((similarity.sum() - np.trace(similarity)) / max(n * (n - 1), 1))
+
+
+def bench_quality(options) -> dict:
+    """
+    Measure hit rate and diversity with and without MMR on the real lessons.
+
+    Args:
+        options: Parsed command-line options
+
+    Returns:
+        Results keyed by configuration
+    """
+    vectorstore = build_store(main.load_documents(LESSONS_PATH), options.dim)
+    positions = {doc_id: i for i, doc_id in vectorstore.index_to_docstore_id.items()}
+    results = {}
+    for name, retriever in retrievers(vectorstore).items():
+        hits, lessons, similarity = 0, 0, 0.0
+        for question, lesson in LABELED_QUESTIONS:
+            docs = retriever.invoke(question)
+            found = [doc.metadata["lesson_id"] for doc in docs]
+            hits += any(found_id.split("_")[0] == lesson for found_id in found)
+            lessons += len(set(found))
+            vectors = reconstruct_vectors(vectorstore.index, [positions[doc.id] for doc in docs])
+            similarity += pairwise_similarity(vectors)
+        n = len(LABELED_QUESTIONS)
+        results[name] = {
+            "hit_rate": round(hits / n, 3),
+            "distinct_lessons": round(lessons / n, 2),
+            "mean_pairwise_similarity": round(similarity / n, 3),
+        }
+    return results
+
+
+def bench_latency(n_chunks: int, workdir: Path, options) -> dict:
+    """
+    Measure search latency with and without MMR for one corpus size.
+
+    Args:
+        n_chunks: Corpus size in chunks
+        workdir: Scratch directory
+        options: Parsed command-line options
+
+    Returns:
+        Latency summaries keyed by configuration, plus the re-ranking step alone
+    """
+    vectorstore = build_store(main.load_documents(write_corpus(workdir / f"lessons_{n_chunks}", n_chunks)), options.dim)
+    questions = vectorstore.embedding_function.embed_documents(make_questions(options.queries))
+    k = main.Config.RETRIEVER_K
+
+    results = {}
+    for name, retriever in retrievers(vectorstore).items():
+        cycle = iter(range(10 ** 9))
+        results[name] = measure(
+            lambda retriever=retriever, cycle=cycle: retriever._search(questions[next(cycle) % len(questions)]),
+            len(questions)
+        )
+        if name != "search":
+            results[name]["added_ms"] = round(results[name]["mean_ms"] - results["search"]["mean_ms"], 4)
+
+    rerank = {}
+    for fetch_k in FETCH_KS:
+        candidates = min(fetch_k, vectorstore.index.ntotal)
+        _, ids = vectorstore.index.search(np.asarray(questions, dtype=np.float32), candidates)
+        cycle = iter(range(10 ** 9))
+
+        def step(cycle=cycle, ids=ids):
+            row = next(cycle) % len(questions)
+            vectors = reconstruct_vectors(vectorstore.index, ids[row])
+            maximal_marginal_relevance(np.asarray(questions[row]), vectors, k, main.Config.MMR_LAMBDA)
+
+        rerank[f"fetch_k={fetch_k}"] = measure(step, len(questions))
+    results["rerank"] = rerank
+    return results
+
+
+def run(options, workdir: Path) -> dict:
+    """
+    Run the MMR benchmarks.
+
+    Args:
+        options: Parsed command-line options
+        workdir: Scratch directory
+
+    Returns:
+        {"quality": per-configuration quality, "latency": per-size latency}
+    """
+    print("mmr: quality on lessons...", file=sys.stderr, flush=True)
+    results = {"quality": bench_quality(options), "latency": {}}
+    for n_chunks in options.sizes:
+        print(f"mmr: {n_chunks} chunks...", file=sys.stderr, flush=True)
+        results["latency"][str(n_chunks)] = bench_latency(n_chunks, workdir, options)
+    return results
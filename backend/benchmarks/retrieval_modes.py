@@ -0,0 +1,191 @@
+"""
+Retrieval latency and quality per mode (vector, lexical, hybrid).
+
+Quality is measured on the real lessons with a small set of labeled
+questions (keyword questions, paraphrases and Italian questions); a question
+counts as a hit when a chunk of the expected lesson is in the top k. With
+the hash-seeded fake embeddings dense search carries no meaning, so vector
+and hybrid quality here are lower bounds; lexical quality is real.
+
+Latency is measured per mode on synthetic corpora of each requested size,
+with half free-form questions and half keyword phrases taken from chunks.
+Use --embed-latency to simulate the embedding API round trip that the
+lexical fast path saves.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from prometheus_client import REGISTRY
+
+import main
+from bm25 import BM25Index
+from index_store import lesson_ranges
+from retrieval import LessonRetriever
+
+from .common import measure
+from .corpus import LESSONS_PATH, make_questions, write_corpus
+from .fakes import HashEmbeddings
+
+# (question, expected lesson number)
+LABELED_QUESTIONS = [
+    ("FAISS vs Pinecone", "04"),
+    ("HTTP methods", "12"),
+    ("Dockerfile multi-stage", "09"),
+    ("GitHub Actions workflow", "11"),
+    ("What is Word2Vec?", "05"),
+    ("How does backpropagation work?", "13"),
+    ("What is temperature in LLMs?", "14"),
+    ("pytest fixtures", "10"),
+    ("Pydantic models in FastAPI", "08"),
+    ("few-shot prompting", "06"),
+    ("What is RAG?", "03"),
+    ("How do I build my first RAG system?", "15"),
+    ("Explain supervised vs unsupervised learning", "01"),
+    ("What is LangChain used for?", "02"),
+    ("python virtual environments", "00"),
+    ("How do I monitor LLMs in production?", "07"),
+    ("How can I ship my app inside a container?", "09"),
+    ("Why do chatbots make things up?", "14"),
+    ("Come funziona un database vettoriale?", "04"),
+    ("Cos'è il machine learning?", "01"),
+]
+
+FAST_PATH_COVERAGE = 0.8  # Opt-in LEXICAL_FAST_PATH_COVERAGE value measured by hybrid_fast_path
+
+MODES = {
+    "vector": {"mode": "vector"},
+    "lexical": {"mode": "lexical"},
+    "hybrid": {"mode": "hybrid"},
+    "hybrid_fast_path": {"mode": "hybrid", "fast_path_coverage": FAST_PATH_COVERAGE},
+}
+
+
+def build_retrievers(vectorstore: FAISS) -> dict:
+    """
+    Build one retriever per benchmarked mode over the same index.
+
+    Args:
+        vectorstore: FAISS store
+
+    Returns:
+        Mapping of mode name to LessonRetriever
+    """
+    bm25 = BM25Index.from_vectorstore(vectorstore)
+    ranges = lesson_ranges(vectorstore)
+    return {
+        name: LessonRetriever(
+            vectorstore=vectorstore,
+            k=main.Config.RETRIEVER_K,
+            lesson_ranges=ranges,
+            bm25=bm25,
+            fetch_k=main.Config.HYBRID_FETCH_K,
+            rrf_k=main.Config.RRF_K,
+            fast_path_margin=main.Config.LEXICAL_FAST_PATH_MARGIN,
+            **settings
+        )
+        for name, settings in MODES.items()
+    }
+
+
+def fast_path_count() -> float:
+    """Number of retrievals served by the lexical fast path so far"""
+    return REGISTRY.get_sample_value("rag_retrievals_total", {"path": "lexical_fast_path"}) or 0.0
+
+
+def bench_quality(options) -> dict:
+    """
+    Measure hit rate and MRR per mode on the real lessons.
+
+    Args:
+        options: Parsed command-line options
+
+    Returns:
+        Results keyed by mode
+    """
+    docs = main.load_documents(LESSONS_PATH)
+    vectorstore = FAISS.from_documents(docs, HashEmbeddings(size=options.dim))
+    results = {}
+    for name, retriever in build_retrievers(vectorstore).items():
+        hits, reciprocal_ranks = 0, 0.0
+        fast_path_before = fast_path_count()
+        for question, lesson in LABELED_QUESTIONS:
+            ranked = [doc.metadata["lesson_id"].split("_")[0] for doc in retriever.invoke(question)]
+            if lesson in ranked:
+                hits += 1
+                reciprocal_ranks += 1.0 / (ranked.index(lesson) + 1)
+        results[name] = {
+            "questions": len(LABELED_QUESTIONS),
+            "hit_rate": round(hits / len(LABELED_QUESTIONS), 3),
+            "mrr": round(reciprocal_ranks / len(LABELED_QUESTIONS), 3),
+            "fast_path_rate": round((fast_path_count() - fast_path_before) / len(LABELED_QUESTIONS), 3),
+        }
+    return results
+
+
+def bench_latency(n_chunks: int, workdir: Path, options) -> dict:
+    """
+    Measure retrieval latency per mode on a synthetic corpus.
+
+    Args:
+        n_chunks: Corpus size in chunks
+        workdir: Scratch directory
+        options: Parsed command-line options
+
+    Returns:
+        Latency summary (with QPS and fast path rate) keyed by mode
+    """
+    corpus = write_corpus(workdir / f"lessons_{n_chunks}", n_chunks)
+    docs = main.load_documents(corpus)
+    embeddings = HashEmbeddings(size=options.dim)
+    texts = [doc.page_content for doc in docs]
+    vectorstore = FAISS.from_embeddings(
+        list(zip(texts, embeddings.embed_documents(texts))),
+        embeddings,
+        metadatas=[doc.metadata for doc in docs],
+        ids=[doc.id for doc in docs],
+    )
+    # Only simulate the API round trip for query embeddings
+    embeddings.latency = options.embed_latency
+
+    # Half free-form questions, half keyword phrases lifted from chunks
+    rng = np.random.default_rng(2)
+    keyword_questions = [
+        " ".join(texts[i].split()[5:8]) for i in rng.integers(0, len(texts), options.queries - options.queries // 2)
+    ]
+    questions = make_questions(options.queries // 2) + keyword_questions
+    results = {}
+    for name, retriever in build_retrievers(vectorstore).items():
+        cycle = iter(range(10 ** 9))
+        fast_path_before = fast_path_count()
+        summary = measure(
+            lambda retriever=retriever, cycle=cycle: retriever.invoke(questions[next(cycle) % len(questions)]),
+            len(questions)
+        )
+        results[name] = {
+            **summary,
+            "qps": round(1000 / summary["mean_ms"], 1),
+            "fast_path_rate": round((fast_path_count() - fast_path_before) / len(questions), 3),
+        }
+    return results
+
+
+def run(options, workdir: Path) -> dict:
+    """
+    Run the retrieval mode benchmarks.
+
+    Args:
+        options: Parsed command-line options
+        workdir: Scratch directory
+
+    Returns:
+        {"quality": per-mode quality, "latency": per-size, per-mode latency}
+    """
+    print("retrieval_modes: quality on lessons...", file=sys.stderr, flush=True)
+    results = {"quality": bench_quality(options), "latency": {}}
+    for n_chunks in options.sizes:
+        print(f"retrieval_modes: {n_chunks} chunks...", file=sys.stderr, flush=True)
+        results["latency"][str(n_chunks)] = bench_latency(n_chunks, workdir, options)
+    return results
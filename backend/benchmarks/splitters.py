@@ -0,0 +1,121 @@
+"""
+Structure-aware vs. fixed-size splitting of the real lessons.
+
+Each splitter (Config.LESSON_SPLITTER) indexes content/lessons with the
+hashing embeddings (embedding_providers.HashingEmbeddings) and reports:
+
+- chunks:    chunk count, mean/max length and chunks over CHUNK_SIZE
+- index:     FAISS vector bytes and chunk text bytes (overlap is stored twice)
+- prompt:    mean tokens of the top-k chunks and of the assembled context
+             (format_docs) for the labeled questions of the retrieval_modes
+             suite
+- quality:   per retrieval mode, hit rate of the expected lesson at rank 1
+             and in the top k
+
+Hashing embeddings only capture shared words, so the hit rates compare the
+splitters with each other rather than predict production quality.
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import faiss
+
+import main
+from bm25 import BM25Index
+from context_assembly import count_tokens
+from index_store import lesson_ranges
+from retrieval import LessonRetriever
+
+from .corpus import LESSONS_PATH
+from .mmr import build_store
+from .retrieval_modes import LABELED_QUESTIONS
+
+SPLITTERS = ("character", "structured")
+MODES = ("vector", "hybrid")
+
+
+def bench_splitter(splitter: str, options) -> dict:
+    """
+    Index the lessons with one splitter and measure the result.
+
+    Args:
+        splitter: Config.LESSON_SPLITTER value
+        options: Parsed command-line options
+
+    Returns:
+        Chunk, index, prompt and quality figures
+    """
+    previous = main.Config.LESSON_SPLITTER
+    main.Config.LESSON_SPLITTER = splitter
+    try:
+        start = time.perf_counter()
+        docs = main.load_documents(LESSONS_PATH)
+        split_ms = (time.perf_counter() - start) * 1000
+    finally:
+        main.Config.LESSON_SPLITTER = previous
+
+    vectorstore = build_store(docs, options.dim)
+    sizes = [len(doc.page_content) for doc in docs]
+    bm25 = BM25Index.from_vectorstore(vectorstore)
+    ranges = lesson_ranges(vectorstore)
+    k = main.Config.RETRIEVER_K
+
+    quality, retrieved_tokens, context_tokens = {}, [], []
+    for mode in MODES:
+        retriever = LessonRetriever(
+            vectorstore=vectorstore, k=k, lesson_ranges=ranges, mode=mode, bm25=bm25,
+            fetch_k=main.Config.HYBRID_FETCH_K, rrf_k=main.Config.RRF_K
+        )
+        first, anywhere = 0, 0
+        for question, lesson in LABELED_QUESTIONS:
+            found = retriever.invoke(question)
+            ranked = [doc.metadata["lesson_id"].split("_")[0] for doc in found]
+            first += bool(ranked) and ranked[0] == lesson
+            anywhere += lesson in ranked
+            if mode == main.Config.RETRIEVAL_MODE:
+                retrieved_tokens.append(sum(doc.metadata["tokens"] for doc in found))
+                context_tokens.append(count_tokens(main.format_docs(found), main.Config.CONTEXT_TOKENIZER))
+        quality[mode] = {
+            "hit_rate_at_1": round(first / len(LABELED_QUESTIONS), 3),
+            f"hit_rate_at_{k}": round(anywhere / len(LABELED_QUESTIONS), 3),
+        }
+
+    return {
+        "chunks": {
+            "count": len(docs),
+            "mean_chars": round(sum(sizes) / len(sizes), 1),
+            "max_chars": max(sizes),
+            "over_chunk_size": sum(size > main.Config.CHUNK_SIZE for size in sizes),
+            "split_ms": round(split_ms, 2),
+        },
+        "index": {
+            "vector_bytes": int(faiss.serialize_index(vectorstore.index).nbytes),
+            "text_bytes": sum(len(doc.page_content.encode("utf-8")) for doc in docs),
+        },
+        "prompt": {
+            "mode": main.Config.RETRIEVAL_MODE,
+            "retrieved_tokens": round(sum(retrieved_tokens) / len(retrieved_tokens), 1),
+            "context_tokens": round(sum(context_tokens) / len(context_tokens), 1),
+        },
+        "quality": quality,
+    }
+
+
+def run(options, workdir: Path) -> dict:
+    """
+    Run the splitter comparison.
+
+    Args:
+        options: Parsed command-line options
+        workdir: Scratch directory (unused; the real lessons are read in place)
+
+    Returns:
+        Results keyed by splitter
+    """
+    results = {}
+    for splitter in SPLITTERS:
+        print(f"splitters: {splitter}...", file=sys.stderr, flush=True)
+        results[splitter] = bench_splitter(splitter, options)
+    return results
@@ -0,0 +1,189 @@
+"""
+In-memory BM25 index over the lesson chunks.
+
+The index is built from the FAISS store, so position i in the BM25 index is
+FAISS id i. Lesson id ranges (index_store.lesson_ranges) therefore scope
+lexical search exactly like vector search.
+
+BM25 term weights are static for a given corpus, so they are computed once
+at build time; a query is a scatter-add of the postings of its terms.
+"""
+
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Question words that say nothing about the topic; left out of coverage()
+STOP_WORDS = frozenset({
+    "a", "about", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "should", "the", "to", "use",
+    "used", "what", "when", "where", "which", "who", "why", "with", "work", "works", "you",
+})
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split text into lowercase word tokens.
+
+    Args:
+        text: Text to tokenize
+
+    Returns:
+        List of tokens
+    """
+    return _TOKEN_RE.findall(text.casefold())
+
+
+class BM25Index:
+    """Okapi BM25 inverted index with precomputed term weights."""
+
+    def __init__(self, texts: Iterable[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Args:
+            texts: Chunk texts, in FAISS id order
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        term_docs: Dict[str, List[int]] = defaultdict(list)
+        term_freqs: Dict[str, List[int]] = defaultdict(list)
+        lengths = []
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            counts: Dict[str, int] = defaultdict(int)
+            for token in tokens:
+                counts[token] += 1
+            for token, count in counts.items():
+                term_docs[token].append(doc)
+                term_freqs[token].append(count)
+
+        self.size = len(lengths)
+        doc_lengths = np.asarray(lengths, dtype=np.float32)
+        norms = k1 * (1 - b + b * doc_lengths / max(float(doc_lengths.mean()) if self.size else 0.0, 1.0))
+
+        # term -> (FAISS ids, BM25 weight of the term in each of them)
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for token, docs in term_docs.items():
+            ids = np.asarray(docs, dtype=np.int64)
+            tf = np.asarray(term_freqs[token], dtype=np.float32)
+            idf = self._idf(len(ids))
+            self.postings[token] = (ids, (idf * tf * (k1 + 1) / (tf + norms[ids])).astype(np.float32))
+
+    def _idf(self, doc_freq: int) -> float:
+        return float(np.log(1 + (self.size - doc_freq + 0.5) / (doc_freq + 0.5)))
+
+    def idf(self, token: str) -> float:
+        """Inverse document frequency of a token (highest for tokens not in the corpus)"""
+        posting = self.postings.get(token)
+        return self._idf(0 if posting is None else len(posting[0]))
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore: FAISS, **kwargs) -> "BM25Index":
+        """
+        Build the index over the chunks of a FAISS store.
+
+        Args:
+            vectorstore: FAISS store
+            **kwargs: BM25 parameters (k1, b)
+
+        Returns:
+            BM25Index aligned with the store's FAISS ids
+        """
+        docstore, ids = vectorstore.docstore, vectorstore.index_to_docstore_id
+        return cls((docstore.search(ids[i]).page_content for i in range(vectorstore.index.ntotal)), **kwargs)
+
+    def search(
+        self,
+        query: str,
+        k: int,
+        ranges: Optional[Iterable[Tuple[int, int]]] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Score every chunk containing a query term and return the best.
+
+        Args:
+            query: Query text
+            k: Number of results
+            ranges: Only consider these [start, end) FAISS id ranges
+
+        Returns:
+            List of (FAISS id, BM25 score) pairs, best first; chunks sharing
+            no term with the query are never returned
+        """
+        scores = np.zeros(self.size, dtype=np.float32)
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if posting is not None:
+                ids, weights = posting
+                scores[ids] += weights
+
+        if ranges is None:
+            candidates = np.flatnonzero(scores)
+        else:
+            candidates = np.concatenate(
+                [start + np.flatnonzero(scores[start:end]) for start, end in ranges] or [np.zeros(0, dtype=np.int64)]
+            )
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+        best = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(int(i), float(scores[i])) for i in best]
+
+    def term_weight(self, token: str, doc: int) -> float:
+        """BM25 weight of a token in one chunk (0 if the chunk doesn't contain it)"""
+        posting = self.postings.get(token)
+        if posting is None:
+            return 0.0
+        ids, weights = posting
+        position = int(np.searchsorted(ids, doc))  # Postings are in FAISS id order
+        return float(weights[position]) if position < len(ids) and ids[position] == doc else 0.0
+
+    def coverage(self, query: str, doc: int) -> float:
+        """
+        Tell how much of the query's topic a chunk matches.
+
+        The chunk's BM25 score over the distinct content terms of the query
+        (STOP_WORDS left out) is divided by their summed idf, roughly the
+        score of an average-length chunk containing each term once. Terms
+        missing from the corpus count with the highest idf, so paraphrases
+        and questions in another language score low; a question made of
+        stop words only has no coverage.
+
+        Args:
+            query: Query text
+            doc: FAISS id of the chunk
+
+        Returns:
+            Coverage (around 1.0 or more when a chunk matches every content term)
+        """
+        terms = [token for token in set(tokenize(query)) if token not in STOP_WORDS]
+        weight = sum(self.idf(token) for token in terms)
+        if not weight:
+            return 0.0
+        return sum(self.term_weight(token, doc) for token in terms) / weight
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """
+    Merge ranked lists with reciprocal-rank fusion.
+
+    Each item scores sum(1 / (k + rank)) over the lists it appears in, so
+    items ranked well by several retrievers rise to the top without having
+    to calibrate BM25 scores against vector distances.
+
+    Args:
+        rankings: Ranked lists of ids, best first
+        k: Rank offset damping the weight of the top positions
+
+    Returns:
+        List of (id, fused score) pairs, best first
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            scores[item] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
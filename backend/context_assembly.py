@@ -0,0 +1,271 @@
+"""
+Assembly of the retrieved chunks into the context the LLM reads.
+
+The retriever returns the top-k chunks best first. Chunks of one lesson
+overlap (CHUNK_OVERLAP) and neighbouring chunks are often retrieved
+together, so joining them as they are repeats text. assemble_context():
+
+1. Merges chunks of the same lesson that overlap or follow each other into
+   one passage, in lesson order. A passage ranks like its best chunk.
+2. Drops passages whose word shingles are mostly contained in a
+   higher-ranked passage (near-duplicates, e.g. the same explanation in two
+   lessons).
+3. Packs passages best first up to a token budget. A passage that does not
+   fit is skipped in favour of smaller, lower-ranked ones; if not even the
+   best one fits, it is truncated.
+
+Token counts are computed once per chunk when the lessons are split
+(metadata["tokens"], see count_tokens()), so assembling a context needs no
+tokenizer call: a merged passage costs its chunks' counts minus the share
+of the overlapping text.
+
+A tiktoken encoding is loaded once, by load_tokenizer() at startup. If it
+can't be loaded (tiktoken downloads encodings on first use, which fails
+air-gapped) startup fails instead of silently estimating, so the index
+manifest always names the tokenizer its counts came from; set
+CONTEXT_TOKENIZER=estimate to estimate on purpose.
+"""
+
+import logging
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Tokenizer name that skips tiktoken and estimates from the text length
+ESTIMATE = "estimate"
+CHARS_PER_TOKEN = 4  # Rough average for English prose with OpenAI encodings
+SHINGLE_SIZE = 3  # Words per shingle for near-duplicate detection
+SEPARATOR = "\n\n"
+
+
+@lru_cache(maxsize=None)
+def _encoding(tokenizer: str):
+    """tiktoken encoding by name, or None for ESTIMATE"""
+    if tokenizer == ESTIMATE:
+        return None
+    import tiktoken
+    return tiktoken.get_encoding(tokenizer)
+
+
+def load_tokenizer(tokenizer: str) -> None:
+    """
+    Load a tokenizer before any chunk is counted.
+
+    Called once before the lessons are split in parallel, so the loader
+    threads don't each try to fetch the encoding.
+
+    Args:
+        tokenizer: tiktoken encoding name, or "estimate"
+
+    Raises:
+        RuntimeError: If the encoding can't be loaded (e.g. not cached and
+            no network access)
+    """
+    try:
+        _encoding(tokenizer)
+    except Exception as e:
+        raise RuntimeError(
+            f"Tokenizer {tokenizer!r} could not be loaded ({e}). Provide it through "
+            f"TIKTOKEN_CACHE_DIR or set CONTEXT_TOKENIZER={ESTIMATE} to estimate token counts"
+        ) from e
+
+
+def count_tokens(text: str, tokenizer: str = ESTIMATE) -> int:
+    """
+    Count the tokens of a text.
+
+    Args:
+        text: Text to count
+        tokenizer: tiktoken encoding name (e.g. "o200k_base"), or "estimate"
+            for len(text) / CHARS_PER_TOKEN
+
+    Returns:
+        Number of tokens
+    """
+    encoding = _encoding(tokenizer)
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+class Passage:
+    """Contiguous text from one lesson, made of one or more retrieved chunks."""
+
+    def __init__(self, doc: Document, rank: int, tokens: int):
+        self.source = doc.metadata.get("source")
+        self.start = doc.metadata.get("start_index")
+        self.end = doc.metadata.get("end_index")
+        self.last_chunk = doc.metadata.get("chunk")
+        self.text = doc.page_content
+        self.tokens = tokens
+        self.rank = rank
+
+    def follows(self, doc: Document) -> bool:
+        """Whether a later chunk of the same lesson overlaps or directly follows this passage"""
+        if self.source is None or self.start is None or doc.metadata.get("source") != self.source:
+            return False
+        start = doc.metadata.get("start_index")
+        chunk = doc.metadata.get("chunk")
+        consecutive = chunk is not None and self.last_chunk is not None and chunk == self.last_chunk + 1
+        return start is not None and (start <= self.end or consecutive)
+
+    def extend(self, doc: Document, rank: int, tokens: int) -> int:
+        """
+        Append the part of a following chunk not already in the passage.
+
+        Returns:
+            Tokens of the chunk that were already in the passage
+        """
+        start, end = doc.metadata["start_index"], doc.metadata["end_index"]
+        text = doc.page_content
+        if start < self.end:
+            overlap = min(self.end, end) - start
+            new_text = text[overlap:]
+            new_tokens = round(tokens * len(new_text) / len(text)) if text else 0
+            self.text += new_text
+        else:
+            new_tokens = tokens
+            self.text += SEPARATOR + text
+        self.end = max(self.end, end)
+        chunk = doc.metadata.get("chunk")
+        if chunk is not None:
+            self.last_chunk = chunk if self.last_chunk is None else max(self.last_chunk, chunk)
+        self.tokens += new_tokens
+        self.rank = min(self.rank, rank)
+        return tokens - new_tokens
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set:
+    """Set of lower-cased word n-grams of a text (empty if it has fewer than size words)"""
+    words = text.lower().split()
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _offset(doc: Document) -> Optional[Tuple[str, int]]:
+    """(source, start offset) of a chunk, or None if unknown"""
+    source, start = doc.metadata.get("source"), doc.metadata.get("start_index")
+    return None if source is None or start is None else (source, start)
+
+
+def merge_chunks(docs: List[Document], tokenizer: str = ESTIMATE) -> Tuple[List[Passage], int]:
+    """
+    Merge overlapping and consecutive chunks of the same lesson.
+
+    Args:
+        docs: Retrieved chunks, best first
+        tokenizer: Used for chunks without precomputed metadata["tokens"]
+
+    Returns:
+        Tuple of (passages best first, tokens removed as overlap)
+    """
+    ranked = {}
+    for rank, doc in enumerate(docs):
+        key = doc.id or id(doc)
+        if key not in ranked:
+            ranked[key] = (rank, doc)
+
+    # Chunks with known offsets in lesson order, then any others as they are
+    located = [item for item in ranked.values() if _offset(item[1]) is not None]
+    located.sort(key=lambda item: _offset(item[1]))
+    others = [item for item in ranked.values() if _offset(item[1]) is None]
+
+    passages: List[Passage] = []
+    overlap = 0
+    for rank, doc in located + others:
+        tokens = doc.metadata.get("tokens")
+        if tokens is None:
+            tokens = count_tokens(doc.page_content, tokenizer)
+        if passages and passages[-1].follows(doc):
+            overlap += passages[-1].extend(doc, rank, tokens)
+        else:
+            passages.append(Passage(doc, rank, tokens))
+    passages.sort(key=lambda passage: passage.rank)
+    return passages, overlap
+
+
+def drop_near_duplicates(passages: List[Passage], threshold: float) -> Tuple[List[Passage], int]:
+    """
+    Remove passages mostly contained in a higher-ranked one.
+
+    A passage is a near-duplicate when at least threshold of its word
+    shingles appear in a single kept passage. Passages too short to have
+    shingles are always kept.
+
+    Args:
+        passages: Passages best first
+        threshold: Contained fraction of shingles (0-1)
+
+    Returns:
+        Tuple of (kept passages best first, tokens dropped)
+    """
+    kept, kept_shingles = [], []
+    dropped = 0
+    for passage in passages:
+        candidate = shingles(passage.text)
+        if candidate and any(len(candidate & other) >= threshold * len(candidate) for other in kept_shingles):
+            dropped += passage.tokens
+            continue
+        kept.append(passage)
+        kept_shingles.append(candidate)
+    return kept, dropped
+
+
+def truncate(passage: Passage, token_budget: int) -> None:
+    """Cut a passage to about token_budget tokens, at a word boundary"""
+    limit = len(passage.text) * token_budget // max(passage.tokens, 1)
+    cut = passage.text.rfind(" ", 0, limit + 1)
+    passage.text = passage.text[:cut if cut > 0 else limit].rstrip()
+    passage.tokens = token_budget
+
+
+def assemble_context(
+    docs: List[Document],
+    token_budget: Optional[int] = None,
+    duplicate_threshold: Optional[float] = 0.8,
+    tokenizer: str = ESTIMATE
+) -> str:
+    """
+    Build the prompt context from retrieved chunks (see module docstring).
+
+    Args:
+        docs: Retrieved chunks, best first
+        token_budget: Maximum context tokens (None for no limit)
+        duplicate_threshold: Contained shingle fraction that makes a passage
+            a near-duplicate (None keeps every passage)
+        tokenizer: Tokenizer for chunks without precomputed counts
+
+    Returns:
+        Passages joined by blank lines, best first
+    """
+    passages, overlap = merge_chunks(docs, tokenizer)
+    dropped: Dict[str, int] = {"overlap": overlap, "duplicate": 0, "budget": 0}
+    if duplicate_threshold is not None:
+        passages, dropped["duplicate"] = drop_near_duplicates(passages, duplicate_threshold)
+
+    packed: List[Passage] = []
+    used = 0
+    separator_tokens = count_tokens(SEPARATOR, tokenizer)
+    for passage in passages:
+        cost = passage.tokens + (separator_tokens if packed else 0)
+        if token_budget is None or used + cost <= token_budget:
+            packed.append(passage)
+            used += cost
+        else:
+            dropped["budget"] += passage.tokens
+    if not packed and passages:
+        # Not even the best passage fits: keep its beginning
+        best = passages[0]
+        dropped["budget"] -= token_budget
+        truncate(best, token_budget)
+        packed, used = [best], best.tokens
+
+    metrics.CONTEXT_TOKENS.observe(used)
+    for reason, tokens in dropped.items():
+        if tokens:
+            metrics.CONTEXT_TOKENS_DROPPED.labels(reason=reason).inc(tokens)
+    return SEPARATOR.join(passage.text for passage in packed)
@@ -0,0 +1,329 @@
+"""
+Persistent embedding cache for the RAG tutor.
+
+Wraps an embeddings client so that document embeddings are stored in a local
+SQLite database keyed by (embedding model, SHA-256 of the chunk text). When a
+lesson changes only its new or edited chunks miss the cache; everything else
+is served from disk instead of the embedding API.
+
+When the underlying client is a ScheduledEmbeddings, misses are stored batch
+by batch as they are embedded, so an interrupted index build resumes where
+it stopped.
+
+The file is shared by every uvicorn worker and written from the
+scheduler's threads, so it runs in WAL mode (readers never wait for the
+writer) with a busy timeout instead of failing on a locked database.
+Cache hits don't write: their last_used times are collected in memory and
+written with the next store, or once touch_flush_size of them piled up.
+The row count is tracked from the inserts and only recounted when the
+cache may be over max_entries or every recount_interval inserted rows.
+"""
+
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from embedding_scheduler import ScheduledEmbeddings
+
+logger = logging.getLogger(__name__)
+
+
+def text_hash(text: str) -> str:
+    """
+    Compute the content hash used as cache key for a chunk.
+
+    Args:
+        text: Chunk text
+
+    Returns:
+        Hex SHA-256 digest of the UTF-8 encoded text
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper backed by a content-addressed SQLite cache.
+
+    Only embed_documents() is cached on disk; one-off questions shouldn't
+    fill the persistent cache. Query embeddings are kept in a small
+    in-memory LRU instead, so a question embedded once per request (e.g. for
+    an answer-cache lookup and again by the retriever) costs one API call.
+    When the disk cache grows beyond max_entries the least recently used
+    entries are evicted.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        cache_path: Path,
+        model: str,
+        max_entries: int = 100_000,
+        query_cache_size: int = 1024,
+        busy_timeout: float = 10.0,
+        touch_flush_size: int = 1000,
+        recount_interval: int = 1000
+    ):
+        """
+        Args:
+            underlying: Embeddings client used on cache misses
+            cache_path: SQLite database file
+            model: Embedding model name (part of the cache key)
+            max_entries: Maximum number of cached vectors before eviction
+            query_cache_size: Number of query embeddings kept in memory
+            busy_timeout: Seconds to wait for another connection's write lock
+            touch_flush_size: Pending last_used updates that trigger a write
+            recount_interval: Inserted rows after which the entries are recounted
+        """
+        self.underlying = underlying
+        self.cache_path = Path(cache_path)
+        self.model = model
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.query_cache_size = query_cache_size
+        self._query_cache: "OrderedDict[str, List[float]]" = OrderedDict()
+        self.touch_flush_size = touch_flush_size
+        self.recount_interval = recount_interval
+        self._touched: Dict[str, float] = {}  # text_hash -> last_used not yet written
+
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.cache_path), timeout=busy_timeout, check_same_thread=False)
+        self._conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout * 1000)}")
+        (journal_mode,) = self._conn.execute("PRAGMA journal_mode = WAL").fetchone()
+        if journal_mode.lower() != "wal":
+            logger.warning(f"Embedding cache {self.cache_path} runs in {journal_mode} mode, not WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)"
+        )
+        self._conn.commit()
+        self._recount()
+
+    def _recount(self) -> None:
+        """Count the rows (of every model) and reset the inserts since the last count"""
+        (self._entries,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        self._inserted = 0
+
+    def _flush_touches(self) -> None:
+        """Write the collected last_used times of cache hits"""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                [(used, self.model, key) for key, used in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _lookup(self, hashes: List[str]) -> Dict[str, List[float]]:
+        """Fetch cached vectors for the given hashes and mark them as used (in memory)"""
+        found = {}
+        # SQLite limits the number of bound parameters per statement
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._conn.execute(
+                f"SELECT text_hash, vector FROM embeddings "
+                f"WHERE model = ? AND text_hash IN ({placeholders})",
+                [self.model, *batch]
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+
+        if found:
+            now = time.time()
+            self._touched.update(dict.fromkeys(found, now))
+            if len(self._touched) >= self.touch_flush_size:
+                self._flush_touches()
+                self._conn.commit()
+        return found
+
+    def _store(self, vectors: Dict[str, List[float]]) -> None:
+        """Insert new vectors and evict the least recently used overflow"""
+        now = time.time()
+        # Written first, so eviction below sees the recent hits
+        self._flush_touches()
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, last_used) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (self.model, key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                for key, vector in vectors.items()
+            ]
+        )
+
+        # Replaced rows and other workers' inserts make this an estimate,
+        # corrected by the recount before anything is evicted
+        self._inserted += len(vectors)
+        if self._entries + self._inserted <= self.max_entries and self._inserted < self.recount_interval:
+            return
+        self._recount()
+        overflow = self._entries - self.max_entries
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used LIMIT ?)",
+                (overflow,)
+            )
+            self.evictions += overflow
+            self._entries -= overflow
+            logger.info(f"Evicted {overflow} entries from embedding cache")
+
+    def _checkpoint(self, texts: List[str], vectors: List[List[float]]) -> None:
+        """Store one embedded batch right away (called from the scheduler's workers)"""
+        with self._lock:
+            self._store({text_hash(text): vector for text, vector in zip(texts, vectors)})
+            self._conn.commit()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed documents, calling the underlying client only for cache misses.
+
+        Args:
+            texts: Chunk texts to embed
+
+        Returns:
+            One embedding per input text, in input order
+        """
+        hashes = [text_hash(text) for text in texts]
+
+        with self._lock:
+            cached = self._lookup(list(dict.fromkeys(hashes)))
+            self._conn.commit()
+
+        # Embed each distinct missing text once, preserving first-seen order
+        missing = {}
+        for key, text in zip(hashes, texts):
+            if key not in cached and key not in missing:
+                missing[key] = text
+
+        self.hits += len(texts) - sum(1 for key in hashes if key in missing)
+        self.misses += len(missing)
+
+        if missing:
+            if isinstance(self.underlying, ScheduledEmbeddings):
+                # Checkpoint every batch; the misses are stored as they arrive
+                new_vectors = self.underlying.embed_documents(list(missing.values()), on_batch=self._checkpoint)
+                computed = dict(zip(missing.keys(), new_vectors))
+            else:
+                new_vectors = self.underlying.embed_documents(list(missing.values()))
+                computed = dict(zip(missing.keys(), new_vectors))
+                with self._lock:
+                    self._store(computed)
+                    self._conn.commit()
+            cached.update(computed)
+
+        return [cached[key] for key in hashes]
+
+    def _cached_query(self, text: str) -> Optional[List[float]]:
+        """Look up a query embedding in the in-memory LRU"""
+        with self._lock:
+            vector = self._query_cache.get(text)
+            if vector is not None:
+                self._query_cache.move_to_end(text)
+            return vector
+
+    def _remember_query(self, text: str, vector: List[float]) -> None:
+        """Add a query embedding to the in-memory LRU"""
+        with self._lock:
+            self._query_cache[text] = vector
+            self._query_cache.move_to_end(text)
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+
+    def embed_query(self, text: str) -> List[float]:
+        """
+        Embed a query (in-memory cache only).
+
+        Args:
+            text: Query text
+
+        Returns:
+            Query embedding
+        """
+        vector = self._cached_query(text)
+        if vector is None:
+            vector = self.underlying.embed_query(text)
+            self._remember_query(text, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """
+        Embed a query asynchronously (in-memory cache only).
+
+        Args:
+            text: Query text
+
+        Returns:
+            Query embedding
+        """
+        vector = self._cached_query(text)
+        if vector is None:
+            vector = await self.underlying.aembed_query(text)
+            self._remember_query(text, vector)
+        return vector
+
+    async def aembed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embed several queries with one request (in-memory cache only).
+
+        Args:
+            texts: Query texts
+
+        Returns:
+            One embedding per query, in input order
+        """
+        found = {}
+        for text in texts:
+            vector = self._cached_query(text)
+            if vector is not None:
+                found[text] = vector
+        missing = [text for text in dict.fromkeys(texts) if text not in found]
+        if missing:
+            vectors = await self.underlying.aembed_documents(missing)
+            for text, vector in zip(missing, vectors):
+                found[text] = vector
+                self._remember_query(text, vector)
+        return [found[text] for text in texts]
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report cache counters.
+
+        Returns:
+            Dictionary with hits, misses, evictions and current entry count
+        """
+        with self._lock:
+            (entries,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": entries,
+        }
+
+    def close(self) -> None:
+        """Write the pending last_used times and close the SQLite connection"""
+        with self._lock:
+            self._flush_touches()
+            self._conn.commit()
+            self._conn.close()
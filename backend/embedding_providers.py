@@ -0,0 +1,150 @@
+"""
+Embedding providers that run in-process, without network access.
+
+- HashingEmbeddings: feature-hashed bag of words and word bigrams. Needs no
+  model files, so an index can be built anywhere; quality is close to
+  lexical search.
+- LocalModelEmbeddings: a sentence-transformers model loaded from a local
+  directory and run on CPU (requires the optional sentence-transformers
+  package). model_fingerprint() identifies the model files, so a swapped
+  model under the same directory name invalidates the index and the
+  embedding cache.
+
+main.get_embeddings() picks the provider from Config.EMBEDDING_PROVIDER.
+"""
+
+import hashlib
+import math
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from bm25 import tokenize
+
+WEIGHT_SUFFIXES = (".safetensors", ".bin", ".pt", ".onnx", ".h5")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Feature-hashing embeddings (the "hashing trick").
+
+    Each unigram and bigram is hashed with CRC32 (stable across processes,
+    unlike hash()) to a bucket and a sign; counts are dampened with
+    1 + log(tf) and every vector is L2-normalized, so inner products are
+    cosine similarities of the term profiles.
+    """
+
+    def __init__(self, size: int = 1024):
+        """
+        Args:
+            size: Embedding dimension (number of hash buckets)
+        """
+        self.size = size
+        self._buckets: Dict[str, Tuple[int, float]] = {}
+
+    def _bucket(self, feature: str) -> Tuple[int, float]:
+        bucket = self._buckets.get(feature)
+        if bucket is None:
+            digest = zlib.crc32(feature.encode("utf-8"))
+            bucket = (digest % self.size, 1.0 if digest & 0x80000000 else -1.0)
+            if len(self._buckets) < 1_000_000:  # Bound memory on huge vocabularies
+                self._buckets[feature] = bucket
+        return bucket
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.size), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            features = Counter(tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])])
+            for feature, count in features.items():
+                column, sign = self._bucket(feature)
+                matrix[row, column] += sign * (1.0 + math.log(count))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return matrix / np.where(norms == 0, 1.0, norms)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0].tolist()
+
+    # Embedding takes microseconds; skip the executor hop of the defaults
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+
+def model_fingerprint(model_path: Path) -> str:
+    """
+    Short hash identifying the model saved in a directory.
+
+    Covers the contents of every JSON file (config.json, the tokenizer and
+    pooling configs) and the name, size and mtime of every weight file, so
+    it changes when the model is replaced without reading gigabytes of
+    weights.
+
+    Args:
+        model_path: Directory containing the saved model
+
+    Returns:
+        First 12 hex digits of a SHA-256, stable while the files are unchanged
+    """
+    digest = hashlib.sha256()
+    root = Path(model_path)
+    files = sorted(root.rglob("*")) if root.is_dir() else []
+    for path in files:
+        if not path.is_file():
+            continue
+        name = path.relative_to(root).as_posix()
+        if path.suffix == ".json":
+            digest.update(f"{name}\0".encode("utf-8") + path.read_bytes() + b"\0")
+        elif path.suffix in WEIGHT_SUFFIXES:
+            stat = path.stat()
+            digest.update(f"{name}\0{stat.st_size}\0{stat.st_mtime_ns}\0".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+
+class LocalModelEmbeddings(Embeddings):
+    """Sentence-transformers model loaded from a local directory, run on CPU."""
+
+    def __init__(self, model_path: Path, batch_size: int = 64):
+        """
+        Args:
+            model_path: Directory containing the saved model
+            batch_size: Texts encoded per forward pass
+
+        Raises:
+            ImportError: If sentence-transformers is not installed
+            FileNotFoundError: If the model directory does not exist
+        """
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "EMBEDDING_PROVIDER=local requires sentence-transformers "
+                "(pip install sentence-transformers)"
+            ) from e
+        if not Path(model_path).is_dir():
+            raise FileNotFoundError(f"Local embedding model not found: {model_path}")
+
+        self.batch_size = batch_size
+        self.model = SentenceTransformer(str(model_path), device="cpu")
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return np.asarray(vectors, dtype=np.float32).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
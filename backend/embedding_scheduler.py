@@ -0,0 +1,313 @@
+"""
+Concurrent, rate-limited bulk embedding for index builds.
+
+FAISS.from_documents() hands every chunk to one embed_documents() call,
+which the OpenAI client sends as one request after another. With
+ScheduledEmbeddings in between:
+
+1. The chunks are cut into batches of batch_size texts.
+2. Up to max_concurrency batches are in flight at once, each in a worker
+   thread going through the shared pooled HTTP client.
+3. Every batch first takes one request and its estimated tokens from a
+   RateLimiter: token buckets for requests and tokens per minute. The
+   buckets follow the x-ratelimit-* headers of the embeddings responses
+   (limit sets the rate, remaining caps what is left), and a 429 pauses
+   all batches for the requested delay and halves the rate, which then
+   recovers step by step with every successful response.
+4. Vectors are returned in chunk order, whatever order the batches finish
+   in.
+5. Each finished batch is handed to an on_batch callback as soon as it
+   arrives. CachedEmbeddings uses it to write the batch to its SQLite
+   cache, so a build that is interrupted (crash, deploy, exhausted retries)
+   resumes from the cache instead of embedding everything again.
+
+main.get_embeddings() wraps the OpenAI client; local and hashing
+embeddings run in-process and have no rate limit.
+"""
+
+import logging
+import re
+import threading
+import time
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from langchain_core.embeddings import Embeddings
+
+import metrics
+from context_assembly import count_tokens
+from upstream import retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_KINDS = ("requests", "tokens")
+DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a rate-limit reset duration ("20ms", "1s", "6m0s", "1h2m3.5s").
+
+    Args:
+        value: Header value
+
+    Returns:
+        Seconds, or None if absent or unparsable
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DURATION_PART.findall(value)
+    if not parts or "".join(number + unit for number, unit in parts) != value.strip():
+        return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in parts)
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """Bucket refilled at rate units per second up to capacity."""
+
+    def __init__(self, per_minute: float, now: float):
+        """
+        Args:
+            per_minute: Units allowed per minute (also the burst capacity)
+            now: Current clock reading
+        """
+        self.rate = per_minute / 60
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.updated = now
+
+    def refill(self, now: float, throttle: float) -> None:
+        """Add what accrued since the last refill, at throttle times the rate"""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate * throttle)
+        self.updated = now
+
+    def wait(self, amount: float, throttle: float) -> float:
+        """
+        Seconds until amount can be taken.
+
+        An amount larger than the capacity only waits for a full bucket and
+        leaves the bucket in debt.
+        """
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing / (self.rate * throttle))
+
+
+class RateLimiter:
+    """
+    Client-side requests and tokens per minute budget, adapted from responses.
+
+    Thread-safe: acquire() is called from the embedding workers, observe()
+    from the HTTP transports.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: float,
+        tokens_per_minute: float,
+        min_throttle: float = 0.1,
+        recovery: float = 0.05,
+        default_pause: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        """
+        Args:
+            requests_per_minute: Starting request budget (until headers say otherwise)
+            tokens_per_minute: Starting token budget (until headers say otherwise)
+            min_throttle: Lowest share of the rate that 429s can push it down to
+            recovery: Share of the rate regained per successful response
+            default_pause: Pause after a 429 that says nothing about when to retry
+            clock: Monotonic time source (replaceable in tests)
+            sleep: Blocking sleep (replaceable in tests)
+        """
+        self.min_throttle = min_throttle
+        self.recovery = recovery
+        self.default_pause = default_pause
+        self.throttle = 1.0
+        self._clock = clock
+        self._sleep = sleep
+        now = clock()
+        self.buckets: Dict[str, TokenBucket] = {
+            "requests": TokenBucket(requests_per_minute, now),
+            "tokens": TokenBucket(tokens_per_minute, now),
+        }
+        self._paused_until = now
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        for bucket in self.buckets.values():
+            bucket.refill(now, self.throttle)
+
+    def acquire(self, tokens: int) -> float:
+        """
+        Block until a request with this many tokens may be sent, then take it.
+
+        Args:
+            tokens: Estimated input tokens of the request
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._refill(now)
+                delay = max(
+                    self._paused_until - now,
+                    self.buckets["requests"].wait(1, self.throttle),
+                    self.buckets["tokens"].wait(tokens, self.throttle),
+                )
+                if delay <= 0:
+                    self.buckets["requests"].level -= 1
+                    self.buckets["tokens"].level -= tokens
+                    return waited
+            self._sleep(delay)
+            waited += delay
+
+    def observe(self, response: httpx.Response) -> None:
+        """
+        Adapt to an embeddings response.
+
+        x-ratelimit-limit-{requests,tokens} set the rate (per minute) and
+        the capacity, x-ratelimit-remaining-* cap the bucket levels. A 429
+        pauses every acquire() for Retry-After (else the longest
+        x-ratelimit-reset-*, else default_pause) and halves the throttle;
+        successful responses raise it again by recovery.
+
+        Args:
+            response: Upstream response (any attempt, including retried ones)
+        """
+        headers = response.headers
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            resets = []
+            for kind in RATE_LIMIT_KINDS:
+                bucket = self.buckets[kind]
+                limit = _number(headers.get(f"x-ratelimit-limit-{kind}"))
+                if limit:
+                    bucket.rate = limit / 60
+                    bucket.capacity = limit
+                remaining = _number(headers.get(f"x-ratelimit-remaining-{kind}"))
+                if remaining is not None:
+                    bucket.level = min(bucket.level, remaining)
+                reset = parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if reset is not None:
+                    resets.append(reset)
+
+            if response.status_code == 429:
+                pause = retry_after_seconds(response)
+                if pause is None:
+                    pause = max(resets, default=self.default_pause)
+                self._paused_until = max(self._paused_until, now + pause)
+                self.throttle = max(self.min_throttle, self.throttle / 2)
+                logger.warning(f"Embeddings rate limited, pausing {pause:.2f}s at {self.throttle:.0%} of the rate")
+            elif response.status_code < 400:
+                self.throttle = min(1.0, self.throttle + self.recovery)
+
+
+class ScheduledEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that embeds documents in concurrent, rate-limited batches.
+
+    Only embed_documents() (what index builds call) is scheduled. The async
+    methods and queries serve live requests and pass straight through to
+    the underlying client, so they never queue behind a build.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        batch_size: int = 256,
+        max_concurrency: int = 4,
+        limiter: Optional[RateLimiter] = None
+    ):
+        """
+        Args:
+            underlying: Embeddings client; its embed_documents() must be thread-safe
+            batch_size: Texts per request
+            max_concurrency: Requests in flight at once
+            limiter: Rate limiter every batch is admitted by (None for no limit)
+        """
+        self.underlying = underlying
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.limiter = limiter
+
+    def _embed_batch(
+        self,
+        batch: List[str],
+        on_batch: Optional[Callable[[List[str], List[List[float]]], None]]
+    ) -> List[List[float]]:
+        if self.limiter is not None:
+            waited = self.limiter.acquire(sum(count_tokens(text) for text in batch))
+            metrics.EMBEDDING_THROTTLE_SECONDS.inc(waited)
+        vectors = self.underlying.embed_documents(batch)
+        metrics.EMBEDDING_BATCHES.inc()
+        if on_batch is not None:
+            on_batch(batch, vectors)
+        return vectors
+
+    def embed_documents(
+        self,
+        texts: List[str],
+        on_batch: Optional[Callable[[List[str], List[List[float]]], None]] = None
+    ) -> List[List[float]]:
+        """
+        Embed documents in batches, several at a time.
+
+        When a batch fails no new batch is started; batches already in
+        flight finish (and reach on_batch) before the error is raised.
+
+        Args:
+            texts: Texts to embed
+            on_batch: Called with (texts, vectors) of every finished batch,
+                from the worker thread that embedded it
+
+        Returns:
+            One embedding per input text, in input order
+        """
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+        if not batches:
+            return []
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(batches))) as pool:
+            futures = [pool.submit(self._embed_batch, batch, on_batch) for batch in batches]
+            done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+            failed = next((future for future in done if future.exception() is not None), None)
+            if failed is not None:
+                for future in futures:
+                    future.cancel()
+                pool.shutdown(wait=True)
+                finished = sum(future.done() and not future.cancelled() and future.exception() is None for future in futures)
+                logger.error(f"Embedding failed after {finished}/{len(batches)} batches")
+                raise failed.exception()
+        if len(batches) > 1:
+            logger.info(
+                f"Embedded {len(texts)} texts in {len(batches)} batches "
+                f"({time.perf_counter() - start:.2f}s, up to {self.max_concurrency} in flight)"
+            )
+        return [vector for future in futures for vector in future.result()]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.underlying.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.underlying.embed_query(text)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await self.underlying.aembed_query(text)
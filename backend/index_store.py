@@ -0,0 +1,711 @@
+"""
+Index persistence for the RAG tutor.
+
+Saves the FAISS vector store to disk together with a manifest describing
+exactly what was indexed (lesson file hashes, chunking parameters, embedding
+provider and model, FAISS index type and index format version). On startup
+the manifest is compared with the current state of the lessons so the index
+is only rebuilt when something actually changed.
+
+Besides the exact flat index, approximate (ANN) index types can be built
+with build_ann_index(): IVF-Flat, HNSW and IVF-PQ.
+
+Chunks are also written to a flat JSON-lines file with an offsets array, so
+an index can be opened memory-mapped (load_index(memory_map=True)): FAISS maps the
+vectors with IO_FLAG_MMAP_IFC and MmapDocstore reads chunks from the mapped
+file. Several worker processes then share one copy in the page cache
+instead of each unpickling its own.
+
+Every saved index carries a SHA256SUMS file (sha256sum format) covering its
+data files, so a prebuilt artifact (see `python -m main build-index`) can be
+checked with `sha256sum -c` at build time and is verified again on load.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import faiss
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = "manifest.json"
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq")
+INDEX_NAME = "index"
+CHUNKS_FILENAME = "chunks.jsonl"
+CHUNK_OFFSETS_FILENAME = "chunks.offsets.npy"
+CHUNK_IDS_FILENAME = "chunk_ids.json"
+CHECKSUMS_FILENAME = "SHA256SUMS"
+
+
+def hash_file(path: Path) -> str:
+    """
+    Compute the SHA-256 hash of a file's contents.
+
+    Args:
+        path: File to hash
+
+    Returns:
+        Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compute_file_hashes(data_path: Path) -> Dict[str, str]:
+    """
+    Hash every lesson file in the data directory.
+
+    Args:
+        data_path: Directory containing the .txt lessons
+
+    Returns:
+        Mapping of file name to SHA-256 digest, sorted by file name
+    """
+    return {
+        txt_file.name: hash_file(txt_file)
+        for txt_file in sorted(data_path.glob("*.txt"))
+    }
+
+
+def build_manifest(
+    data_path: Path,
+    chunk_size: int,
+    chunk_overlap: int,
+    embedding_provider: str,
+    embedding_model: str,
+    index_params: dict,
+    index_version: int,
+    tokenizer: Optional[str] = None,
+    splitter: Optional[str] = None
+) -> dict:
+    """
+    Describe the index that the current lessons and settings would produce.
+
+    Args:
+        data_path: Directory containing the .txt lessons
+        chunk_size: Splitter chunk size
+        chunk_overlap: Splitter chunk overlap
+        embedding_provider: Embedding backend ("openai", "local", "hashing")
+        embedding_model: Name of the embedding model
+        index_params: FAISS index type and build parameters (see build_ann_index)
+        index_version: On-disk format version of the index
+        tokenizer: Tokenizer of the per-chunk token counts
+        splitter: Lesson splitter and its settings (e.g. "structured-200")
+
+    Returns:
+        Manifest dictionary (JSON serialisable)
+    """
+    return {
+        "index_version": index_version,
+        "embedding_provider": embedding_provider,
+        "embedding_model": embedding_model,
+        "index": index_params,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "splitter": splitter,
+        "tokenizer": tokenizer,
+        "files": compute_file_hashes(data_path),
+    }
+
+
+def manifest_fingerprint(manifest: dict) -> str:
+    """
+    Short, stable identifier of an index version.
+
+    Caches built on top of the index use this to detect that the lessons or
+    indexing settings changed underneath them.
+
+    Args:
+        manifest: Index manifest
+
+    Returns:
+        First 12 hex characters of the manifest's SHA-256
+    """
+    encoded = json.dumps(manifest, sort_keys=True).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:12]
+
+
+def read_manifest(index_path: Path) -> Optional[dict]:
+    """
+    Read the manifest stored next to a persisted index.
+
+    Args:
+        index_path: Directory of the persisted index
+
+    Returns:
+        Manifest dictionary, or None if missing or unreadable
+    """
+    manifest_file = index_path / MANIFEST_FILENAME
+    if not manifest_file.exists():
+        return None
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Ignoring unreadable index manifest {manifest_file}: {e}")
+        return None
+
+
+def save_index(vectorstore: FAISS, index_path: Path, manifest: dict) -> None:
+    """
+    Persist a vector store and its manifest.
+
+    The index is written to a sibling temporary directory first and then
+    moved into place, so a crash mid-write never leaves a half-written index
+    that a later startup would try to load. An existing index is renamed
+    aside before the new one is renamed in and only deleted afterwards, so
+    index_path only ever points to a complete index (at worst it is missing
+    for the instant between the two renames). The temporary directories are
+    per process, so workers starting together don't write into each other's.
+
+    Args:
+        vectorstore: FAISS store to persist
+        index_path: Target directory
+        manifest: Manifest describing the store
+    """
+    tmp_path = index_path.with_name(f"{index_path.name}.tmp{os.getpid()}")
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    tmp_path.mkdir(parents=True)
+
+    vectorstore.save_local(str(tmp_path), index_name=INDEX_NAME)
+    write_chunk_file(vectorstore, tmp_path)
+    write_checksums(tmp_path)
+    # The manifest is written last: its presence marks a complete index
+    with open(tmp_path / MANIFEST_FILENAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+    old_path = index_path.with_name(f"{index_path.name}.old{os.getpid()}")
+    if old_path.exists():
+        shutil.rmtree(old_path)
+    if index_path.exists():
+        index_path.rename(old_path)
+    try:
+        tmp_path.rename(index_path)
+    except OSError:
+        if old_path.exists() and not index_path.exists():
+            old_path.rename(index_path)
+        raise
+    if old_path.exists():
+        shutil.rmtree(old_path, ignore_errors=True)
+    logger.info(f"Saved vector store to {index_path}")
+
+
+def load_index(
+    index_path: Path,
+    manifest: dict,
+    embeddings: Embeddings,
+    memory_map: bool = False,
+    verify: bool = True
+) -> Optional[FAISS]:
+    """
+    Load a persisted vector store if it matches the expected manifest.
+
+    Args:
+        index_path: Directory of the persisted index
+        manifest: Manifest the index is expected to have
+        embeddings: Embeddings used to embed queries against the index
+        memory_map: Memory-map the vectors and chunks read-only instead of
+            loading them (the store must then be copied with
+            clone_vectorstore() before it is modified)
+        verify: Check the data files against SHA256SUMS first
+
+    Returns:
+        The loaded FAISS store, or None if it is missing, stale or corrupt
+    """
+    stored = read_manifest(index_path)
+    if stored is None:
+        logger.info(f"No persisted index found at {index_path}")
+        return None
+    if stored != manifest:
+        changed = sorted(
+            key for key in set(stored) | set(manifest)
+            if stored.get(key) != manifest.get(key)
+        )
+        logger.info(f"Persisted index is stale (changed: {', '.join(changed)})")
+        return None
+    if verify:
+        mismatched = verify_checksums(index_path)
+        if mismatched:
+            logger.warning(f"Ignoring persisted index at {index_path}: checksum mismatch ({', '.join(mismatched)})")
+            return None
+
+    try:
+        if memory_map:
+            docstore = MmapDocstore(index_path)
+            vectorstore = FAISS(
+                embeddings,
+                faiss.read_index(str(index_path / f"{INDEX_NAME}.faiss"), faiss.IO_FLAG_MMAP_IFC),
+                docstore,
+                dict(enumerate(docstore.ids))
+            )
+        else:
+            vectorstore = FAISS.load_local(
+                str(index_path),
+                embeddings,
+                index_name=INDEX_NAME,
+                # The index directory is written only by this application
+                allow_dangerous_deserialization=True
+            )
+    except Exception as e:
+        logger.warning(f"Failed to load persisted index from {index_path}: {e}")
+        return None
+
+    logger.info(f"Loaded vector store from {index_path}{' (memory-mapped)' if memory_map else ''}")
+    return vectorstore
+
+
+def write_chunk_file(vectorstore: FAISS, directory: Path) -> None:
+    """
+    Write the chunks of a store as JSON lines in FAISS id order.
+
+    Next to the chunk file go the byte offset of every line (a .npy array,
+    so it can be memory-mapped too) and the list of chunk ids.
+
+    Args:
+        vectorstore: FAISS store
+        directory: Index directory
+    """
+    ids = [vectorstore.index_to_docstore_id[i] for i in range(vectorstore.index.ntotal)]
+    offsets = [0]
+    with open(directory / CHUNKS_FILENAME, "wb") as f:
+        for doc_id in ids:
+            doc = vectorstore.docstore.search(doc_id)
+            line = json.dumps(
+                {"id": doc_id, "metadata": doc.metadata, "page_content": doc.page_content},
+                ensure_ascii=False
+            ).encode("utf-8") + b"\n"
+            f.write(line)
+            offsets.append(offsets[-1] + len(line))
+    np.save(directory / CHUNK_OFFSETS_FILENAME, np.asarray(offsets, dtype=np.int64))
+    with open(directory / CHUNK_IDS_FILENAME, "w", encoding="utf-8") as f:
+        json.dump(ids, f)
+
+
+def write_checksums(directory: Path) -> None:
+    """
+    Write SHA256SUMS for every file in an index directory.
+
+    The manifest is not covered: it is written afterwards and is compared
+    field by field on load anyway.
+
+    Args:
+        directory: Index directory
+    """
+    lines = [
+        f"{hash_file(path)}  {path.name}\n"
+        for path in sorted(directory.iterdir())
+        if path.is_file() and path.name not in (CHECKSUMS_FILENAME, MANIFEST_FILENAME)
+    ]
+    with open(directory / CHECKSUMS_FILENAME, "w", encoding="utf-8") as f:
+        f.writelines(lines)
+
+
+def verify_checksums(directory: Path) -> List[str]:
+    """
+    Check the files of an index directory against its SHA256SUMS.
+
+    Args:
+        directory: Index directory
+
+    Returns:
+        Names of missing or modified files (SHA256SUMS itself if it is
+        missing); empty if everything matches
+    """
+    checksums_file = directory / CHECKSUMS_FILENAME
+    if not checksums_file.exists():
+        return [CHECKSUMS_FILENAME]
+    mismatched = []
+    for line in checksums_file.read_text(encoding="utf-8").splitlines():
+        digest, name = line.split(maxsplit=1)
+        path = directory / name
+        if not path.is_file() or hash_file(path) != digest:
+            mismatched.append(name)
+    return mismatched
+
+
+class MmapDocstore(Docstore, Sequence):
+    """
+    Read-only docstore over a memory-mapped chunk file.
+
+    Documents are decoded on access, so a process only holds the chunk id
+    mapping; the chunk texts stay in the (shared) page cache. Indexing by
+    position returns chunks in FAISS id order.
+    """
+
+    def __init__(self, index_path: Path):
+        """
+        Args:
+            index_path: Index directory written by save_index()
+        """
+        with open(index_path / CHUNK_IDS_FILENAME, encoding="utf-8") as f:
+            self.ids: List[str] = json.load(f)
+        self._rows = {doc_id: row for row, doc_id in enumerate(self.ids)}
+        self._offsets = np.load(index_path / CHUNK_OFFSETS_FILENAME, mmap_mode="r")
+        with open(index_path / CHUNKS_FILENAME, "rb") as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if self.ids else b""
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, row: int) -> Document:
+        if not -len(self.ids) <= row < len(self.ids):
+            raise IndexError(row)
+        row %= len(self.ids)
+        record = json.loads(self._data[self._offsets[row]:self._offsets[row + 1]])
+        return Document(id=record["id"], page_content=record["page_content"], metadata=record["metadata"])
+
+    def __iter__(self) -> Iterator[Document]:
+        return (self[row] for row in range(len(self.ids)))
+
+    def search(self, search: str) -> Union[str, Document]:
+        """Return the chunk with this id (InMemoryDocstore's message if missing)"""
+        row = self._rows.get(search)
+        if row is None:
+            return f"ID {search} not found."
+        return self[row]
+
+
+def documents_from_vectorstore(vectorstore: FAISS) -> Sequence[Document]:
+    """
+    Recover the indexed documents from a FAISS store, in index order.
+
+    Args:
+        vectorstore: FAISS store
+
+    Returns:
+        Documents stored in the docstore (for a memory-mapped store, the
+        docstore itself, which decodes them on access)
+    """
+    if isinstance(vectorstore.docstore, MmapDocstore):
+        return vectorstore.docstore
+    ids = vectorstore.index_to_docstore_id
+    return [vectorstore.docstore.search(ids[i]) for i in range(len(ids))]
+
+
+def diff_file_hashes(old: Dict[str, str], new: Dict[str, str]) -> Dict[str, List[str]]:
+    """
+    Compare two file-hash maps.
+
+    Args:
+        old: File hashes the index was built from
+        new: Current file hashes
+
+    Returns:
+        Dictionary with sorted "added", "modified" and "deleted" file names
+    """
+    return {
+        "added": sorted(set(new) - set(old)),
+        "modified": sorted(name for name in set(new) & set(old) if new[name] != old[name]),
+        "deleted": sorted(set(old) - set(new)),
+    }
+
+
+def clone_vectorstore(vectorstore: FAISS) -> FAISS:
+    """
+    Make an independent copy of a FAISS store.
+
+    Changes are applied to the copy so that requests still using the live
+    store never see a half-updated index. The copy is always held in memory,
+    so a memory-mapped store (which is read-only) can be edited this way.
+
+    Args:
+        vectorstore: FAISS store to copy
+
+    Returns:
+        A new FAISS store with the same vectors and documents
+    """
+    ids = vectorstore.index_to_docstore_id
+    return FAISS(
+        vectorstore.embedding_function,
+        faiss.deserialize_index(faiss.serialize_index(vectorstore.index)),
+        InMemoryDocstore({doc_id: vectorstore.docstore.search(doc_id) for doc_id in ids.values()}),
+        dict(ids),
+        normalize_L2=vectorstore._normalize_L2,
+        distance_strategy=vectorstore.distance_strategy
+    )
+
+
+def ids_for_sources(vectorstore: FAISS, sources: Iterable[str]) -> List[str]:
+    """
+    Find the docstore ids of all chunks that came from the given files.
+
+    Args:
+        vectorstore: FAISS store
+        sources: Lesson file names
+
+    Returns:
+        List of docstore ids
+    """
+    sources = set(sources)
+    return [
+        doc_id
+        for doc_id in vectorstore.index_to_docstore_id.values()
+        if vectorstore.docstore.search(doc_id).metadata.get("source") in sources
+    ]
+
+
+def batch_search(
+    vectorstore: FAISS,
+    embeddings: Sequence[Sequence[float]],
+    k: int
+) -> List[List[Tuple[Document, float]]]:
+    """
+    Search many query vectors with a single FAISS call.
+
+    FAISS processes a matrix of queries in one pass (and in parallel across
+    cores), which is much cheaper than one similarity_search per question.
+
+    Args:
+        vectorstore: FAISS store to search
+        embeddings: One query embedding per question
+        k: Number of results per question
+
+    Returns:
+        For each query, a list of (Document, L2 distance) pairs, closest first
+    """
+    matrix = np.asarray(embeddings, dtype=np.float32)
+    if vectorstore._normalize_L2:
+        faiss.normalize_L2(matrix)
+    scores, indices = vectorstore.index.search(matrix, k)
+
+    results = []
+    for row_scores, row_indices in zip(scores, indices):
+        results.append([
+            (vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]), float(score))
+            for score, i in zip(row_scores, row_indices)
+            if i != -1  # Fewer than k vectors in the index
+        ])
+    return results
+
+
+def lesson_ranges(vectorstore: FAISS) -> Dict[str, List[Tuple[int, int]]]:
+    """
+    Partition the FAISS ids of a store by lesson.
+
+    Chunks are indexed one lesson at a time, so each lesson normally occupies
+    one contiguous run of FAISS ids; deletions compact the index without
+    reordering it. A lesson that is split anyway gets several ranges.
+
+    IVF indexes get their direct map here (see range_nprobe), so call this
+    once before sharing the index between threads.
+
+    Args:
+        vectorstore: FAISS store
+
+    Returns:
+        Mapping of lesson id to [start, end) FAISS id ranges
+    """
+    ranges: Dict[str, List[Tuple[int, int]]] = {}
+    previous = None
+    for i in range(vectorstore.index.ntotal):
+        metadata = vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]).metadata
+        lesson = metadata.get("lesson_id") or Path(metadata.get("source", "")).stem
+        if lesson == previous:
+            start, _ = ranges[lesson][-1]
+            ranges[lesson][-1] = (start, i + 1)
+        else:
+            ranges.setdefault(lesson, []).append((i, i + 1))
+        previous = lesson
+    ivf = faiss.try_extract_index_ivf(vectorstore.index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+    return ranges
+
+
+def range_nprobe(ivf: faiss.IndexIVF, query: np.ndarray, start: int, end: int) -> int:
+    """
+    Number of IVF lists to probe so a range search is exact.
+
+    FAISS probes the lists whose centroids are nearest to the query, so the
+    tuned nprobe is widened until it reaches every list holding a vector of
+    the range. A lesson clustered near the query keeps the tuned nprobe; the
+    worst case, a range far from the query, probes every list.
+
+    Args:
+        ivf: IVF index (its direct map is built if missing)
+        query: Query matrix of one row
+        start: First FAISS id of the range
+        end: FAISS id after the range
+
+    Returns:
+        nprobe for the range search
+    """
+    if ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+    lists = {faiss.lo_listno(ivf.direct_map.get(i)) for i in range(start, end)}
+    _, nearest = ivf.quantizer.search(query, ivf.nlist)
+    needed = max(rank for rank, list_no in enumerate(nearest[0], 1) if list_no in lists)
+    return max(ivf.nprobe, needed)
+
+
+def search_ranges(
+    vectorstore: FAISS,
+    embedding: Sequence[float],
+    k: int,
+    ranges: Iterable[Tuple[int, int]]
+) -> List[Tuple[Document, float]]:
+    """
+    Search only the vectors inside the given FAISS id ranges.
+
+    Each range is searched with an IDSelectorRange, which flat indexes
+    evaluate by scanning that range alone, so the cost is proportional to the
+    size of the selected lessons rather than to the whole index.
+
+    ANN indexes are searched exactly within the range: HNSW through its flat
+    vector storage (graph search with a narrow filter misses results), IVF
+    with the tuned nprobe widened to the lists holding the range (see
+    range_nprobe), only scoring vectors inside the range.
+
+    Args:
+        vectorstore: FAISS store to search
+        embedding: Query embedding
+        k: Number of results
+        ranges: [start, end) FAISS id ranges to search
+
+    Returns:
+        List of (Document, score) pairs, best first
+    """
+    query = np.asarray([embedding], dtype=np.float32)
+    if vectorstore._normalize_L2:
+        faiss.normalize_L2(query)
+
+    index = vectorstore.index
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    ivf = faiss.try_extract_index_ivf(index)
+
+    hits = []
+    for start, end in ranges:
+        selector = faiss.IDSelectorRange(start, end)
+        if ivf is not None:
+            params = faiss.SearchParametersIVF(sel=selector, nprobe=range_nprobe(ivf, query, start, end))
+        else:
+            params = faiss.SearchParameters(sel=selector)
+        scores, indices = index.search(query, min(k, end - start), params=params)
+        hits.extend((float(score), int(i)) for score, i in zip(scores[0], indices[0]) if i != -1)
+
+    # L2 distances rank ascending, inner products descending
+    hits.sort(reverse=index.metric_type == faiss.METRIC_INNER_PRODUCT)
+    return [
+        (vectorstore.docstore.search(vectorstore.index_to_docstore_id[i]), score)
+        for score, i in hits[:k]
+    ]
+
+
+def reconstruct_vectors(index: faiss.Index, ids: Sequence[int]) -> np.ndarray:
+    """
+    Read stored vectors back from an index.
+
+    Flat and HNSW indexes return the exact vectors, IVF-PQ its decoded
+    approximations. IVF indexes need a direct map from id to list entry,
+    which is built on first use; call this once before sharing the index
+    between threads.
+
+    Args:
+        index: FAISS index
+        ids: FAISS ids of the vectors
+
+    Returns:
+        float32 matrix, one row per id
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None and ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.make_direct_map()
+    if len(ids) == 0:
+        return np.empty((0, index.d), dtype=np.float32)
+    return index.reconstruct_batch(np.asarray(ids, dtype=np.int64))
+
+
+def build_ann_index(
+    vectors: np.ndarray,
+    index_type: str = "flat",
+    nlist: int = 256,
+    hnsw_m: int = 32,
+    ef_construction: int = 40,
+    pq_m: int = 16,
+    pq_nbits: int = 8
+) -> faiss.Index:
+    """
+    Build a FAISS index of the given type over a matrix of vectors.
+
+    IVF indexes are trained on the vectors themselves. Parameters that the
+    corpus is too small for are reduced: nlist to one list per 39 vectors
+    (FAISS's minimum for k-means), pq_nbits so every PQ centroid gets a
+    training vector, and pq_m to a divisor of the dimension.
+
+    Args:
+        vectors: float32 matrix, one row per chunk in FAISS id order
+        index_type: "flat", "ivf_flat", "hnsw" or "ivf_pq"
+        nlist: Number of IVF lists
+        hnsw_m: Neighbors per HNSW node
+        ef_construction: HNSW candidate list size while building
+        pq_m: Number of PQ sub-quantizers
+        pq_nbits: Bits per PQ code
+
+    Returns:
+        FAISS index (L2 metric) containing all vectors
+
+    Raises:
+        ValueError: If index_type is unknown
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, dimension = vectors.shape
+
+    if index_type == "flat":
+        index = faiss.IndexFlatL2(dimension)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+    elif index_type in ("ivf_flat", "ivf_pq"):
+        nlist = max(1, min(nlist, n // 39))
+        quantizer = faiss.IndexFlatL2(dimension)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+        else:
+            pq_m = max(1, min(pq_m, dimension))
+            while dimension % pq_m:
+                pq_m -= 1
+            pq_nbits = max(1, min(pq_nbits, int(np.log2(max(n, 2)))))
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, pq_nbits)
+        index.train(vectors)
+    else:
+        raise ValueError(f"Unknown index type {index_type!r} (expected one of {', '.join(INDEX_TYPES)})")
+
+    index.add(vectors)
+    return index
+
+
+def tune_index(index: faiss.Index, nprobe: int, ef_search: int) -> None:
+    """
+    Apply search-time parameters to an index.
+
+    They don't change what is stored, so they are set after building or
+    loading rather than recorded in the manifest. Flat indexes are left
+    unchanged.
+
+    Args:
+        index: FAISS index
+        nprobe: IVF lists probed per query
+        ef_search: HNSW candidate list size per query
+    """
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = ef_search
@@ -0,0 +1,238 @@
+"""
+Structure-aware splitting of lessons.
+
+The lessons are plain text with a light structure: a title line (or
+"=== TITLE ==="), Markdown headings in some lessons, section headings ending
+with a colon ("Why RAG is Important:"), numbered subsection headings
+("1. Document Ingestion Pipeline" followed by its text) and ``` code
+blocks. split_structured():
+
+1. Cuts the lesson into blocks: paragraphs (separated by blank lines) and
+   fenced code blocks. A caption line ending with a colon ("Example:") stays
+   with the code block it introduces.
+2. Recognizes headings and tracks the heading path of every block.
+3. Packs consecutive blocks of one section into chunks of up to chunk_size
+   characters. A heading never ends a chunk: a heading with no text of its
+   own ("Types of Testing:" followed by "1. Unit Tests") starts the chunk of
+   its first subsection. Blocks longer than chunk_size are cut at line
+   breaks (code keeps its indentation), then at spaces for a single
+   overlong line.
+4. Merges chunks shorter than min_chunk_size into the previous chunk of
+   their section (which may then exceed chunk_size by up to
+   min_chunk_size, so a short tail is not left on its own), else into the
+   previous chunk of a sibling section if the result fits chunk_size (the
+   merged chunk takes their common parent's heading path), else into the
+   next one if it belongs to the same section or a subsection.
+
+Chunks are contiguous slices of the lesson, so consecutive chunks don't
+overlap and their offsets map straight back to the text.
+"""
+
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+FENCE = re.compile(r"^\s*```")
+TITLE = re.compile(r"^===\s*(.+?)\s*===$")
+MARKDOWN_HEADING = re.compile(r"^(#{1,6})\s+(.+?)\s*#*$")
+NUMBERED_HEADING = re.compile(r"^\d+\.\s+(.{1,60})$")
+NUMBERED_ITEM = re.compile(r"^\d+\.\s")
+NUMBERING = re.compile(r"^\d+\.\s+")
+MAX_HEADING_LENGTH = 60
+MAX_TITLE_LENGTH = 100
+HEADING_PATH_SEPARATOR = " > "
+
+
+class Block(NamedTuple):
+    """Paragraph or code block, as character offsets into the lesson"""
+
+    start: int
+    end: int
+    code: bool
+
+
+class Chunk(NamedTuple):
+    """Chunk of a lesson with the headings of the section it belongs to"""
+
+    start: int
+    end: int
+    headings: Tuple[str, ...]
+
+
+def split_blocks(text: str) -> List[Block]:
+    """
+    Cut a lesson into paragraphs and fenced code blocks.
+
+    Args:
+        text: Lesson text
+
+    Returns:
+        Blocks in lesson order
+    """
+    blocks: List[Block] = []
+    lines: List[Tuple[int, int]] = []  # (start, end) of the current paragraph's lines
+    in_code = False
+    code_start = 0
+
+    def flush():
+        if lines:
+            blocks.append(Block(lines[0][0], lines[-1][1], False))
+            lines.clear()
+
+    position = 0
+    for line in text.splitlines(keepends=True):
+        start, end = position, position + len(line.rstrip("\r\n"))
+        position += len(line)
+        if in_code:
+            if FENCE.match(line):
+                blocks.append(Block(code_start, end, True))
+                in_code = False
+            continue
+        if FENCE.match(line):
+            # A caption ending with a colon introduces the code below it
+            caption = lines.pop() if lines and text[lines[-1][0]:lines[-1][1]].rstrip().endswith(":") else None
+            flush()
+            code_start = caption[0] if caption else start
+            in_code = True
+        elif line.strip():
+            lines.append((start, end))
+        else:
+            flush()
+    if in_code:
+        # Unterminated fence: the rest of the lesson is code
+        blocks.append(Block(code_start, len(text.rstrip()), True))
+    flush()
+    return blocks
+
+
+def heading(text: str, block: Block, first: bool, parent_level: int) -> Optional[Tuple[int, str, bool]]:
+    """
+    Recognize a block that starts a section.
+
+    Args:
+        text: Lesson text
+        block: Block to classify
+        first: Whether this is the first block of the lesson
+        parent_level: Level of the innermost enclosing heading that is not
+            a numbered heading (numbered headings nest under it)
+
+    Returns:
+        Tuple of (level, heading text, whether it is a numbered heading),
+        or None. The lesson title is level 1, Markdown headings are their
+        number of "#" and colon headings level 2.
+    """
+    if block.code:
+        return None
+    lines = text[block.start:block.end].split("\n")
+    line = lines[0].strip()
+
+    match = TITLE.match(line)
+    if match:
+        return 1, match.group(1), False
+    if first and len(lines) == 1 and len(line) <= MAX_TITLE_LENGTH and not line.endswith((".", "!", "?", ":")):
+        return 1, line, False
+    match = MARKDOWN_HEADING.match(line)
+    if match:
+        return len(match.group(1)), NUMBERING.sub("", match.group(2).rstrip(":")), False
+    if len(lines) == 1 and line.endswith(":") and len(line) <= MAX_HEADING_LENGTH and line[0].isalnum():
+        return 2, line[:-1], False
+    match = NUMBERED_HEADING.match(line)
+    if match and not line.endswith((".", ":")) and (len(lines) == 1 or not NUMBERED_ITEM.match(lines[1])):
+        return parent_level + 1, match.group(1), True
+    return None
+
+
+def split_long(text: str, block: Block, chunk_size: int) -> List[Block]:
+    """Cut a block longer than chunk_size at line breaks, then at spaces"""
+    pieces: List[Block] = []
+    start = block.start
+    while block.end - start > chunk_size:
+        limit = start + chunk_size
+        cut = text.rfind("\n", start + 1, limit + 1)
+        if cut <= start:
+            cut = text.rfind(" ", start + 1, limit + 1)
+        if cut <= start:
+            cut = limit
+        pieces.append(Block(start, len(text[:cut].rstrip()), block.code))
+        start = cut
+        # Code pieces start at the beginning of a line, indentation included
+        while start < block.end and (text[start] in "\r\n" if block.code else text[start].isspace()):
+            start += 1
+    if start < block.end:
+        pieces.append(Block(start, block.end, block.code))
+    return pieces
+
+
+def merge_small(chunks: List[Chunk], chunk_size: int, min_chunk_size: int) -> List[Chunk]:
+    """Merge chunks shorter than min_chunk_size into a neighbour (see module docstring)"""
+    limit = chunk_size + min_chunk_size
+    merged: List[Chunk] = []
+    carry: Optional[Chunk] = None  # Short chunk waiting to join the next one
+
+    for chunk in chunks:
+        if carry is not None:
+            if chunk.headings[:len(carry.headings)] == carry.headings and chunk.end - carry.start <= limit:
+                chunk = Chunk(carry.start, chunk.end, chunk.headings)
+            else:
+                merged.append(carry)
+            carry = None
+        parent = chunk.headings[:-1]
+        if chunk.end - chunk.start >= min_chunk_size:
+            merged.append(chunk)
+        elif merged and merged[-1].headings == chunk.headings and chunk.end - merged[-1].start <= limit:
+            merged[-1] = Chunk(merged[-1].start, chunk.end, chunk.headings)
+        elif (
+            merged and chunk.headings and merged[-1].headings[:len(parent)] == parent
+            and chunk.end - merged[-1].start <= chunk_size
+        ):
+            merged[-1] = Chunk(merged[-1].start, chunk.end, parent)
+        else:
+            carry = chunk
+    if carry is not None:
+        merged.append(carry)
+    return merged
+
+
+def split_structured(text: str, chunk_size: int = 500, min_chunk_size: int = 200) -> List[Chunk]:
+    """
+    Split a lesson along its sections (see module docstring).
+
+    Args:
+        text: Lesson text
+        chunk_size: Maximum chunk length in characters (exceeded by a
+            heading leading into its subsection and merged short chunks)
+        min_chunk_size: Chunks shorter than this are merged into a neighbour
+
+    Returns:
+        Chunks in lesson order. headings is the section's heading path
+        below the lesson title (empty before the first section).
+    """
+    stack: List[Tuple[int, str, bool]] = []  # (level, heading, numbered) of the enclosing sections
+    chunks: List[Chunk] = []
+    current: Optional[Chunk] = None
+    open_heading = False  # current ends with a heading that has no text yet
+
+    for i, block in enumerate(split_blocks(text)):
+        parent_level = max((level for level, _, numbered in stack if not numbered), default=1)
+        found = heading(text, block, i == 0, parent_level)
+        if found is not None:
+            level, title, numbered = found
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            stack.append((level, title.strip(), numbered))
+        headings = tuple(title for level, title, _ in stack if level > 1)
+
+        pieces = [block] if block.end - block.start <= chunk_size else split_long(text, block, chunk_size)
+        for piece in pieces:
+            if current is not None and (
+                open_heading or (current.headings == headings and piece.end - current.start <= chunk_size)
+            ):
+                current = Chunk(current.start, piece.end, headings)
+            else:
+                if current is not None:
+                    chunks.append(current)
+                current = Chunk(piece.start, piece.end, headings)
+            open_heading = False  # The heading leads into the first piece only
+        open_heading = found is not None and "\n" not in text[block.start:block.end]
+    if current is not None:
+        chunks.append(current)
+    return merge_small(chunks, chunk_size, min_chunk_size)
@@ -6,14 +6,25 @@ Retrieval Augmented Generation (RAG) with multilingual support.
 Built with LangChain, FAISS vector store, and OpenAI embeddings.
 """
 
+import asyncio
+import json
 import logging
 import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Optional
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
 
+import httpx
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import Match
 from pydantic import BaseModel, Field, validator
 import os
 
@@ -22,10 +33,46 @@ from langchain_community.vectorstores import FAISS
 from langchain_openai import OpenAIEmbeddings, ChatOpenAI
 from langchain_text_splitters import CharacterTextSplitter
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import ConfigurableField, Runnable, RunnableLambda, RunnablePassthrough
 from langchain_core.prompts import ChatPromptTemplate
 
+from answer_cache import AnswerCache, normalize_question, split_directive
+from context_assembly import assemble_context, count_tokens, load_tokenizer
+from bm25 import BM25Index
+from embedding_cache import CachedEmbeddings
+from embedding_providers import HashingEmbeddings, LocalModelEmbeddings, model_fingerprint
+from embedding_scheduler import RateLimiter, ScheduledEmbeddings
+from index_store import (
+    build_manifest,
+    clone_vectorstore,
+    diff_file_hashes,
+    documents_from_vectorstore,
+    build_ann_index,
+    ids_for_sources,
+    lesson_ranges,
+    load_index,
+    manifest_fingerprint,
+    read_manifest,
+    save_index,
+    tune_index,
+)
+import metrics
+from metrics import (
+    observe_stage,
+    server_timing_header,
+    stage_listener,
+    start_request_timings,
+    time_stage,
+)
+from reranking import CrossEncoderReranker, LexicalReranker, Reranker
+from lesson_splitter import HEADING_PATH_SEPARATOR, split_structured
+from retrieval import LessonRetriever
+from retrieval_cache import RetrievalCache
+from single_flight import SingleFlight
+from upstream import CircuitBreaker, RetryPolicy, build_http_clients, upstream_retry_after
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -39,12 +86,86 @@ class Config:
     """Application configuration"""
     BASE_DIR = Path(__file__).resolve().parent
     ENV_PATH = BASE_DIR.parent / ".env"  # .env is now at root level
-    DATA_PATH = BASE_DIR.parent / "content" / "lessons"  # New lessons location
+    DATA_PATH = Path(os.getenv("DATA_PATH", BASE_DIR.parent / "content" / "lessons"))  # New lessons location
+    LESSON_SPLITTER = os.getenv("LESSON_SPLITTER", "character")  # "character" or "structured" (sections, whole code blocks)
     CHUNK_SIZE = 500
-    CHUNK_OVERLAP = 50
+    CHUNK_OVERLAP = 50  # Character splitter only; structured chunks don't overlap
+    MIN_CHUNK_SIZE = 200  # Structured splitter: shorter chunks are merged into a neighbour
     RETRIEVER_K = 4  # Increased for better context
+    CONTEXT_TOKEN_BUDGET = 1500  # Max lesson context tokens per prompt; None disables the limit
+    CONTEXT_DUPLICATE_THRESHOLD = 0.8  # Share of a passage's shingles found elsewhere that drops it; None keeps all
+    CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "o200k_base")  # tiktoken encoding of LLM_MODEL, or "estimate"
+    RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")  # "vector", "lexical" or "hybrid"
+    HYBRID_FETCH_K = 20  # Candidates per retriever before rank fusion
+    RRF_K = 60  # Reciprocal-rank fusion constant
+    # BM25 content-term coverage that skips the embedding in hybrid mode, e.g. 0.8; None (default) disables.
+    # Only used with the answer cache off: its near-duplicate lookup embeds every question anyway.
+    LEXICAL_FAST_PATH_COVERAGE = float(os.environ["LEXICAL_FAST_PATH_COVERAGE"]) if os.getenv("LEXICAL_FAST_PATH_COVERAGE") else None
+    LEXICAL_FAST_PATH_MARGIN = 1.5  # Best BM25 score over the runner-up's needed for the fast path
+    MMR_ENABLED = os.getenv("MMR_ENABLED", "false").lower() == "true"  # Diversify the top k by maximal marginal relevance
+    MMR_FETCH_K = 20  # Candidates re-ranked by MMR
+    MMR_LAMBDA = 0.5  # 1 = relevance only, 0 = diversity only
+    RERANKER = os.getenv("RERANKER", "none")  # Second-stage reranker: "none", "lexical" or "cross_encoder"
+    RERANK_TOP_N = 20  # First-stage candidates rescored by the reranker
+    RERANK_BUDGET_MS = 150  # Reranking time per query before the first-stage order is kept; None disables the limit
+    RERANK_BATCH_SIZE = 16  # Cross-encoder pairs per forward pass
+    CROSS_ENCODER_MODEL_PATH = Path(os.getenv("CROSS_ENCODER_MODEL_PATH", BASE_DIR / "models" / "reranker"))
+    OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))  # Pooled connections per client
+    OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+    OPENAI_KEEPALIVE_EXPIRY = 30.0  # Seconds an idle connection is kept
+    OPENAI_TIMEOUT = 60.0  # Read/write timeout per attempt
+    OPENAI_CONNECT_TIMEOUT = 5.0
+    OPENAI_MAX_RETRIES = 3  # Retries on 429/5xx/timeouts, with jittered exponential backoff
+    OPENAI_RETRY_BASE_DELAY = 0.5
+    OPENAI_RETRY_MAX_DELAY = 8.0  # Also caps server-requested Retry-After
+    CIRCUIT_FAILURE_THRESHOLD = 5  # Consecutive failed OpenAI calls that open the circuit
+    CIRCUIT_RESET_SECONDS = 30.0  # Fail fast this long before a trial call
     LLM_MODEL = "gpt-4o-mini"
     LLM_TEMPERATURE = 0.7  # Slightly higher for more natural responses
+    EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")  # "openai", "local" or "hashing"
+    EMBEDDING_MODEL = "text-embedding-ada-002"  # OpenAI model
+    LOCAL_EMBEDDING_MODEL_PATH = Path(os.getenv("LOCAL_EMBEDDING_MODEL_PATH", BASE_DIR / "models" / "embeddings"))
+    HASHING_EMBEDDING_DIM = 1024
+    LOAD_WORKERS = 8  # Threads reading and splitting lesson files
+    INDEX_PATH = Path(os.getenv("INDEX_PATH", BASE_DIR / "vectorstore"))  # Persisted FAISS index
+    INDEX_VERSION = 7  # Bump when the on-disk index format or chunk metadata changes
+    INDEX_MMAP = os.getenv("INDEX_MMAP", "true").lower() == "true"  # Share the persisted index between workers
+    INDEX_VERIFY_CHECKSUMS = os.getenv("INDEX_VERIFY_CHECKSUMS", "true").lower() == "true"
+    # Read-only index built by `python -m main build-index` (e.g. in the Docker image), used when INDEX_PATH has none
+    BUNDLED_INDEX_PATH = Path(os.environ["BUNDLED_INDEX_PATH"]) if os.getenv("BUNDLED_INDEX_PATH") else None
+    INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")  # "flat" (exact), "ivf_flat", "hnsw" or "ivf_pq"
+    IVF_NLIST = 256  # IVF lists (capped at one per 39 chunks)
+    IVF_NPROBE = 16  # IVF lists searched per query
+    HNSW_M = 32  # HNSW neighbors per node
+    HNSW_EF_CONSTRUCTION = 40
+    HNSW_EF_SEARCH = 64  # HNSW candidates per query
+    PQ_M = 64  # IVF-PQ sub-quantizers (bytes per vector with 8-bit codes)
+    PQ_NBITS = 8
+    EMBEDDING_CACHE_PATH = Path(os.getenv("EMBEDDING_CACHE_PATH", BASE_DIR / "embedding_cache.sqlite"))
+    EMBEDDING_CACHE_MAX_ENTRIES = 100_000  # Least recently used vectors are evicted beyond this
+    EMBEDDING_BATCH_SIZE = 256  # Chunks per OpenAI embeddings request during index builds
+    EMBEDDING_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_MAX_CONCURRENCY", "4"))  # Embeddings requests in flight
+    # Starting client-side budget; the x-ratelimit-* headers of the responses take over
+    EMBEDDING_REQUESTS_PER_MINUTE = int(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "3000"))
+    EMBEDDING_TOKENS_PER_MINUTE = int(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "1000000"))
+    ANSWER_CACHE_ENABLED = True
+    ANSWER_CACHE_MAX_ENTRIES = 1000
+    ANSWER_CACHE_TTL_SECONDS = 3600
+    ANSWER_CACHE_SIMILARITY_THRESHOLD = 0.97  # Cosine similarity for near-duplicate questions
+    RETRIEVAL_CACHE_ENABLED = True
+    RETRIEVAL_CACHE_MAX_ENTRIES = 5000  # Cached retrievals (chunk ids and scores per question)
+    COALESCE_ENABLED = True  # Identical concurrent questions share one chain execution
+    BATCH_MAX_QUESTIONS = 100  # Upper bound for /query/batch
+    BATCH_MAX_CONCURRENCY = 8  # Parallel LLM calls per batch
+    LESSON_WATCH_INTERVAL = float(os.getenv("LESSON_WATCH_INTERVAL", "0"))  # Seconds; 0 disables the watcher
+    READY_WAIT_SECONDS = 10.0  # How long a query arriving during startup waits before a 503
+    READY_RETRY_AFTER_SECONDS = 5  # Retry-After sent with 503s while initializing
+    # Lesson numbers per level, matching the catalog in frontend/app.py
+    LESSON_LEVELS = {
+        "beginner": ["00", "12", "13", "14"],
+        "intermediate": ["01", "02", "03", "04", "05", "15"],
+        "advanced": ["06", "07", "08", "09", "10", "11"],
+    }
 
 # Load environment variables
 load_dotenv(dotenv_path=Config.ENV_PATH)
@@ -67,10 +188,149 @@ def get_api_key() -> str:
     logger.info("API key loaded successfully")
     return api_key
 
+def lesson_id(source: str) -> str:
+    """
+    Derive the lesson id from a lesson file name.
+
+    Args:
+        source: Lesson file name, e.g. "03_rag_architecture.txt"
+
+    Returns:
+        Lesson id, e.g. "03_rag_architecture"
+    """
+    return Path(source).stem
+
+def split_lesson(text: str, source: str) -> List[Document]:
+    """
+    Split one lesson into chunk Documents.
+
+    Config.LESSON_SPLITTER selects the splitter:
+    - "character": CHUNK_SIZE windows cut at blank lines, overlapping by
+      CHUNK_OVERLAP
+    - "structured": chunks follow the lesson's sections and keep code blocks
+      whole (see lesson_splitter.py); metadata["heading_path"] records the
+      section, e.g. "RAG Architecture Components > Embedding Generation"
+
+    Each chunk gets a stable id of the form "<source>:<chunk index>" so the
+    chunks of a single lesson can be replaced in the index when it changes.
+    The metadata records the source file, lesson id, chunk index, the
+    chunk's character offsets in the lesson text and its token count (used
+    to pack the prompt context without tokenizing at query time).
+
+    Args:
+        text: Lesson text
+        source: Lesson file name
+
+    Returns:
+        List of Document objects for the lesson
+
+    Raises:
+        ValueError: If LESSON_SPLITTER is unknown
+    """
+    headings = None
+    if Config.LESSON_SPLITTER == "structured":
+        structured = split_structured(text, Config.CHUNK_SIZE, Config.MIN_CHUNK_SIZE)
+        chunks = [text[chunk.start:chunk.end] for chunk in structured]
+        offsets = [chunk.start for chunk in structured]
+        headings = [HEADING_PATH_SEPARATOR.join(chunk.headings) for chunk in structured]
+    elif Config.LESSON_SPLITTER == "character":
+        splitter = CharacterTextSplitter(
+            chunk_size=Config.CHUNK_SIZE,
+            chunk_overlap=Config.CHUNK_OVERLAP
+        )
+        chunks = splitter.split_text(text)
+
+        # Locate each chunk after the previous one, allowing for the overlap
+        # (same search as the splitter's add_start_index, without building
+        # intermediate Documents)
+        offsets = []
+        start, previous_len = 0, 0
+        for chunk in chunks:
+            start = text.find(chunk, max(0, start + previous_len - Config.CHUNK_OVERLAP))
+            offsets.append(start)
+            previous_len = len(chunk)
+    else:
+        raise ValueError(f"Unknown LESSON_SPLITTER {Config.LESSON_SPLITTER!r} (expected structured or character)")
+
+    # Handle edge case: no chunks
+    if not chunks:
+        chunks, offsets, headings = [text], [0], None
+
+    lesson = lesson_id(source)
+    docs = [
+        Document(
+            id=f"{source}:{i}",
+            page_content=chunk,
+            metadata={
+                "source": source,
+                "lesson_id": lesson,
+                "chunk": i,
+                "start_index": start,
+                "end_index": start + len(chunk),
+                "tokens": count_tokens(chunk, Config.CONTEXT_TOKENIZER),
+            }
+        )
+        for i, (chunk, start) in enumerate(zip(chunks, offsets))
+    ]
+    if headings is not None:
+        for doc, path in zip(docs, headings):
+            doc.metadata["heading_path"] = path
+    return docs
+
+def load_lesson_file(txt_file: Path) -> List[Document]:
+    """
+    Read and split a single lesson file.
+
+    Chunk offsets refer to the file contents as stored on disk.
+
+    Args:
+        txt_file: Path to the lesson
+
+    Returns:
+        List of Document objects (empty if the file has no content)
+    """
+    with open(txt_file, "r", encoding="utf-8") as f:
+        content = f.read()
+    if not content.strip():  # Skip empty files
+        return []
+    logger.info(f"Loaded: {txt_file.name} ({len(content)} chars)")
+    return split_lesson(content, txt_file.name)
+
+def load_lesson_files(txt_files: List[Path]) -> List[Document]:
+    """
+    Read and split lesson files in parallel.
+
+    Files that cannot be read are logged and skipped. Chunks are returned
+    in the order of txt_files.
+
+    Args:
+        txt_files: Paths to the lessons
+
+    Returns:
+        List of Document objects
+    """
+    def load(txt_file: Path) -> List[Document]:
+        try:
+            return load_lesson_file(txt_file)
+        except Exception as e:
+            logger.warning(f"Failed to load {txt_file.name}: {e}")
+            return []
+
+    # Before the threads start, so they share one loaded encoding
+    load_tokenizer(Config.CONTEXT_TOKENIZER)
+    if len(txt_files) <= 1:
+        return [doc for txt_file in txt_files for doc in load(txt_file)]
+
+    with ThreadPoolExecutor(max_workers=min(Config.LOAD_WORKERS, len(txt_files))) as pool:
+        return [doc for docs in pool.map(load, txt_files) for doc in docs]
+
 def load_documents(data_path: Path) -> List[Document]:
     """
     Load and process all text documents from the data directory.
 
+    Each file is read and split on its own (in parallel), so chunks never
+    straddle two lessons.
+
     Args:
         data_path: Path to directory containing text files
 
@@ -86,53 +346,196 @@ def load_documents(data_path: Path) -> List[Document]:
         raise FileNotFoundError(f"Data directory not found: {data_path}")
 
     # Find all .txt files
-    txt_files = list(data_path.glob("*.txt"))
+    txt_files = sorted(data_path.glob("*.txt"))
     if not txt_files:
         logger.error(f"No .txt files found in {data_path}")
         raise ValueError(f"No text files found in {data_path}")
 
     logger.info(f"Found {len(txt_files)} text files")
 
-    # Load all documents
-    all_text = []
-    for txt_file in txt_files:
-        try:
-            with open(txt_file, "r", encoding="utf-8") as f:
-                content = f.read().strip()
-                if content:  # Only add non-empty files
-                    all_text.append(content)
-                    logger.info(f"Loaded: {txt_file.name} ({len(content)} chars)")
-        except Exception as e:
-            logger.warning(f"Failed to load {txt_file.name}: {e}")
-            continue
+    # Load and split each document
+    docs = load_lesson_files(txt_files)
 
-    if not all_text:
+    if not docs:
         raise ValueError("No content loaded from text files")
 
-    # Combine all text
-    combined_text = "\n\n".join(all_text)
-    logger.info(f"Total content: {len(combined_text)} characters")
+    logger.info(f"Created {len(docs)} chunks")
+    return docs
 
-    # Split into chunks
-    splitter = CharacterTextSplitter(
-        chunk_size=Config.CHUNK_SIZE,
-        chunk_overlap=Config.CHUNK_OVERLAP
+def embedding_model_name() -> str:
+    """
+    Name of the embedding model of the configured provider.
+
+    Recorded in the index manifest and used as the embedding cache key. A
+    local model is named by its directory and a fingerprint of its files,
+    so replacing the model in place rebuilds the index and misses the cache.
+
+    Returns:
+        Model name, e.g. "text-embedding-ada-002", "hashing-1024" or
+        "local:minilm:3f2a9c0d81be"
+    """
+    if Config.EMBEDDING_PROVIDER == "local":
+        model_path = Config.LOCAL_EMBEDDING_MODEL_PATH
+        return f"local:{model_path.name}:{model_fingerprint(model_path)}"
+    if Config.EMBEDDING_PROVIDER == "hashing":
+        return f"hashing-{Config.HASHING_EMBEDDING_DIM}"
+    return Config.EMBEDDING_MODEL
+
+def get_http_clients() -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    Pooled HTTP clients shared by every OpenAI call (chat and embeddings).
+
+    Created on first use with Config's connection limits, retry policy and
+    the global circuit breaker (see upstream.py).
+
+    Returns:
+        Tuple of (sync client, async client)
+    """
+    global http_clients
+    with http_clients_lock:
+        if http_clients is None:
+            http_clients = build_http_clients(
+                RetryPolicy(
+                    max_retries=Config.OPENAI_MAX_RETRIES,
+                    base_delay=Config.OPENAI_RETRY_BASE_DELAY,
+                    max_delay=Config.OPENAI_RETRY_MAX_DELAY
+                ),
+                upstream_breaker,
+                max_connections=Config.OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=Config.OPENAI_KEEPALIVE_EXPIRY,
+                timeout=Config.OPENAI_TIMEOUT,
+                connect_timeout=Config.OPENAI_CONNECT_TIMEOUT,
+                on_response=observe_upstream_response
+            )
+        return http_clients
+
+def observe_upstream_response(request: httpx.Request, response: httpx.Response) -> None:
+    """
+    Feed embeddings API responses to the bulk embedding rate limiter.
+
+    Chat completions have their own rate limits, so only /embeddings
+    responses adjust it.
+
+    Args:
+        request: Upstream request
+        response: Its response (every attempt, including retried ones)
+    """
+    if request.url.path.endswith("/embeddings"):
+        embedding_rate_limiter.observe(response)
+
+def get_embeddings(api_key: str) -> Embeddings:
+    """
+    Create the embeddings client used for indexing and querying.
+
+    The provider is selected by Config.EMBEDDING_PROVIDER:
+    - "openai": OpenAI embeddings API
+    - "local": sentence-transformers model from LOCAL_EMBEDDING_MODEL_PATH, on CPU
+    - "hashing": feature-hashing embedder, no model files or network
+
+    OpenAI and local model embeddings go through a persistent cache, so
+    rebuilding the index after a lesson edit only embeds the chunks that
+    changed. Hashing is cheaper than a cache lookup and is used directly.
+    OpenAI document embeddings are sent in concurrent, rate-limited batches
+    that are cached as they arrive (see embedding_scheduler.py).
+
+    Args:
+        api_key: OpenAI API key (only used by the "openai" provider)
+
+    Returns:
+        Embeddings instance
+
+    Raises:
+        ValueError: If EMBEDDING_PROVIDER is unknown
+    """
+    provider = Config.EMBEDDING_PROVIDER
+    if provider == "hashing":
+        return HashingEmbeddings(size=Config.HASHING_EMBEDDING_DIM)
+    if provider == "local":
+        underlying = LocalModelEmbeddings(Config.LOCAL_EMBEDDING_MODEL_PATH)
+    elif provider == "openai":
+        http_client, http_async_client = get_http_clients()
+        underlying = OpenAIEmbeddings(
+            model=Config.EMBEDDING_MODEL,
+            api_key=api_key,
+            http_client=http_client,
+            http_async_client=http_async_client,
+            max_retries=0  # Retried by the shared transport
+        )
+        underlying = ScheduledEmbeddings(
+            underlying,
+            batch_size=Config.EMBEDDING_BATCH_SIZE,
+            max_concurrency=Config.EMBEDDING_MAX_CONCURRENCY,
+            limiter=embedding_rate_limiter
+        )
+    else:
+        raise ValueError(f"Unknown EMBEDDING_PROVIDER {provider!r} (expected openai, local or hashing)")
+
+    return CachedEmbeddings(
+        underlying,
+        cache_path=Config.EMBEDDING_CACHE_PATH,
+        model=embedding_model_name(),
+        max_entries=Config.EMBEDDING_CACHE_MAX_ENTRIES
     )
-    chunks = splitter.split_text(combined_text)
 
-    # Handle edge case: no chunks
-    if not chunks:
-        chunks = [combined_text]
+def get_reranker(bm25: Optional[BM25Index]) -> Optional[Reranker]:
+    """
+    Create the second-stage reranker selected by Config.RERANKER.
 
-    logger.info(f"Created {len(chunks)} chunks")
+    - "none": keep the first-stage order
+    - "lexical": feature scorer weighted by the BM25 idf (see reranking.py)
+    - "cross_encoder": cross-encoder from CROSS_ENCODER_MODEL_PATH, on CPU.
+      The model is loaded once and shared by every retriever build.
 
-    # Convert to Document objects
-    docs = [Document(page_content=chunk) for chunk in chunks]
-    return docs
+    Args:
+        bm25: BM25 index of the current lessons (None in vector mode)
+
+    Returns:
+        Reranker instance, or None
+
+    Raises:
+        ValueError: If RERANKER is unknown
+    """
+    global cross_encoder
+    if Config.RERANKER == "none":
+        return None
+    if Config.RERANKER == "lexical":
+        return LexicalReranker(idf=bm25.idf if bm25 is not None else None)
+    if Config.RERANKER == "cross_encoder":
+        with cross_encoder_lock:
+            if cross_encoder is None:
+                start = time.perf_counter()
+                cross_encoder = CrossEncoderReranker(
+                    Config.CROSS_ENCODER_MODEL_PATH, batch_size=Config.RERANK_BATCH_SIZE
+                )
+                logger.info(f"Cross-encoder loaded ({time.perf_counter() - start:.2f}s)")
+            return cross_encoder
+    raise ValueError(f"Unknown RERANKER {Config.RERANKER!r} (expected none, lexical or cross_encoder)")
+
+def get_llm(api_key: str) -> ChatOpenAI:
+    """
+    Create the chat model that generates answers.
+
+    Args:
+        api_key: OpenAI API key
+
+    Returns:
+        ChatOpenAI instance
+    """
+    http_client, http_async_client = get_http_clients()
+    return ChatOpenAI(
+        model=Config.LLM_MODEL,
+        temperature=Config.LLM_TEMPERATURE,
+        api_key=api_key,
+        http_client=http_client,
+        http_async_client=http_async_client,
+        max_retries=0  # Retried by the shared transport
+    )
 
 def create_vectorstore(
     documents: List[Document],
-    api_key: str
+    api_key: str,
+    embeddings: Optional[Embeddings] = None
 ) -> FAISS:
     """
     Create FAISS vector store from documents.
@@ -140,6 +543,7 @@ def create_vectorstore(
     Args:
         documents: List of Document objects
         api_key: OpenAI API key
+        embeddings: Embeddings to use (defaults to get_embeddings(api_key))
 
     Returns:
         FAISS vector store
@@ -152,24 +556,407 @@ def create_vectorstore(
         raise ValueError("Cannot create vectorstore from empty document list")
 
     logger.info(f"Creating embeddings for {len(documents)} documents...")
-    embeddings = OpenAIEmbeddings(api_key=api_key)
+    if embeddings is None:
+        embeddings = get_embeddings(api_key)
 
     vectorstore = FAISS.from_documents(documents, embeddings)
+    if Config.INDEX_TYPE != "flat":
+        # Train and fill the ANN index from the exact vectors of the flat one
+        start = time.perf_counter()
+        vectors = vectorstore.index.reconstruct_n(0, vectorstore.index.ntotal)
+        vectorstore.index = build_ann_index(vectors, **index_params())
+        logger.info(f"Built {Config.INDEX_TYPE} index ({time.perf_counter() - start:.2f}s)")
+    tune_index(vectorstore.index, nprobe=Config.IVF_NPROBE, ef_search=Config.HNSW_EF_SEARCH)
     logger.info("Vector store created successfully")
+    if isinstance(embeddings, CachedEmbeddings):
+        logger.info(f"Embedding cache: {embeddings.stats()}")
 
     return vectorstore
 
+def index_params() -> dict:
+    """
+    FAISS index type and build parameters from Config.
+
+    Only parameters that change what is stored are included (nprobe and
+    efSearch are applied at search time), so the manifest changes exactly
+    when the index must be rebuilt.
+
+    Returns:
+        Keyword arguments for index_store.build_ann_index()
+
+    Raises:
+        ValueError: If INDEX_TYPE is unknown
+    """
+    params = {
+        "flat": {},
+        "ivf_flat": {"nlist": Config.IVF_NLIST},
+        "hnsw": {"hnsw_m": Config.HNSW_M, "ef_construction": Config.HNSW_EF_CONSTRUCTION},
+        "ivf_pq": {"nlist": Config.IVF_NLIST, "pq_m": Config.PQ_M, "pq_nbits": Config.PQ_NBITS},
+    }
+    if Config.INDEX_TYPE not in params:
+        raise ValueError(f"Unknown INDEX_TYPE {Config.INDEX_TYPE!r} (expected one of {', '.join(params)})")
+    return {"index_type": Config.INDEX_TYPE, **params[Config.INDEX_TYPE]}
+
+def splitter_name() -> str:
+    """
+    Name of the lesson splitter and its settings, recorded in the index manifest.
+
+    Returns:
+        e.g. "structured-200" (min chunk size) or "character"
+    """
+    if Config.LESSON_SPLITTER == "structured":
+        return f"structured-{Config.MIN_CHUNK_SIZE}"
+    return Config.LESSON_SPLITTER
+
+def current_manifest() -> dict:
+    """
+    Build the index manifest for the current lessons and configuration.
+
+    The tokenizer is loaded here, so the manifest never names one that
+    could not be used.
+
+    Returns:
+        Manifest dictionary
+
+    Raises:
+        RuntimeError: If CONTEXT_TOKENIZER can't be loaded
+    """
+    load_tokenizer(Config.CONTEXT_TOKENIZER)
+    return build_manifest(
+        Config.DATA_PATH,
+        chunk_size=Config.CHUNK_SIZE,
+        chunk_overlap=Config.CHUNK_OVERLAP,
+        splitter=splitter_name(),
+        tokenizer=Config.CONTEXT_TOKENIZER,
+        embedding_provider=Config.EMBEDDING_PROVIDER,
+        embedding_model=embedding_model_name(),
+        index_params=index_params(),
+        index_version=Config.INDEX_VERSION
+    )
+
+def load_persisted_index(manifest: dict, embeddings: Embeddings) -> Optional[FAISS]:
+    """
+    Open the persisted index if its manifest matches.
+
+    Config.INDEX_PATH is tried first, then the prebuilt artifact at
+    Config.BUNDLED_INDEX_PATH. With Config.INDEX_MMAP the vectors and chunk
+    texts are memory-mapped read-only, so uvicorn workers share one copy
+    through the page cache.
+
+    Args:
+        manifest: Manifest the index must have
+        embeddings: Embeddings used to embed queries
+
+    Returns:
+        FAISS store with search parameters applied, or None if missing or stale
+    """
+    for index_path in (Config.INDEX_PATH, Config.BUNDLED_INDEX_PATH):
+        if index_path is None:
+            continue
+        vectorstore = load_index(
+            index_path, manifest, embeddings,
+            memory_map=Config.INDEX_MMAP,
+            verify=Config.INDEX_VERIFY_CHECKSUMS
+        )
+        if vectorstore is not None:
+            tune_index(vectorstore.index, nprobe=Config.IVF_NPROBE, ef_search=Config.HNSW_EF_SEARCH)
+            return vectorstore
+    return None
+
+def persist_index(vectorstore: FAISS, manifest: dict) -> FAISS:
+    """
+    Save a newly built store and return the store to serve.
+
+    With Config.INDEX_MMAP the saved files are reopened memory-mapped, so a
+    new index is served from the page cache just like after a restart.
+
+    Args:
+        vectorstore: Newly built or updated store (held in memory)
+        manifest: Manifest describing it
+
+    Returns:
+        The store to serve: memory-mapped if enabled and saving succeeded,
+        otherwise the given store
+    """
+    try:
+        save_index(vectorstore, Config.INDEX_PATH, manifest)
+    except OSError as e:
+        # A read-only filesystem should not prevent the API from starting
+        logger.warning(f"Could not persist vector store to {Config.INDEX_PATH}: {e}")
+        return vectorstore
+    if not Config.INDEX_MMAP:
+        return vectorstore
+    return load_persisted_index(manifest, vectorstore.embedding_function) or vectorstore
+
+def load_or_create_vectorstore(
+    api_key: str,
+    manifest: Optional[dict] = None
+) -> Tuple[FAISS, Sequence[Document]]:
+    """
+    Load the persisted vector store, rebuilding it only when it is stale.
+
+    The persisted index is reused when its manifest (lesson file hashes,
+    chunking parameters, embedding model and index version) matches the
+    current configuration. Otherwise the lessons are loaded, embedded and
+    the new index is saved for the next startup.
+
+    Args:
+        api_key: OpenAI API key
+        manifest: Manifest of the current lessons (computed if not given)
+
+    Returns:
+        Tuple of (FAISS vector store, indexed documents)
+    """
+    embeddings = get_embeddings(api_key)
+    if manifest is None:
+        manifest = current_manifest()
+
+    vectorstore = load_persisted_index(manifest, embeddings)
+    if vectorstore is None:
+        vectorstore = create_vectorstore(load_documents(Config.DATA_PATH), api_key, embeddings)
+        vectorstore = persist_index(vectorstore, manifest)
+
+    return vectorstore, documents_from_vectorstore(vectorstore)
+
+def build_index(index_path: Path) -> dict:
+    """
+    Build the index offline and save it as a deployable artifact.
+
+    Runs the same load, split, embed and FAISS pipeline as a cold startup
+    and writes the result with its manifest and SHA256SUMS. An API started
+    with the same lessons and settings loads it without embedding anything
+    (point Config.INDEX_PATH or Config.BUNDLED_INDEX_PATH at it).
+
+    Args:
+        index_path: Directory to write the index to
+
+    Returns:
+        Manifest of the written index
+    """
+    api_key = get_api_key()
+    embeddings = get_embeddings(api_key)
+    manifest = current_manifest()
+    vectorstore = create_vectorstore(load_documents(Config.DATA_PATH), api_key, embeddings)
+    save_index(vectorstore, index_path, manifest)
+    if isinstance(embeddings, CachedEmbeddings):
+        embeddings.close()
+    return manifest
+
 def format_docs(docs: List[Document]) -> str:
     """
     Format list of documents into a single string.
 
+    Overlapping and consecutive chunks of a lesson are merged, near-duplicate
+    passages dropped and the rest packed best first up to
+    Config.CONTEXT_TOKEN_BUDGET (see context_assembly).
+
     Args:
-        docs: List of Document objects
+        docs: List of Document objects, most relevant first
 
     Returns:
         Formatted string with document contents
     """
-    return "\n\n".join(doc.page_content for doc in docs)
+    return assemble_context(
+        docs,
+        token_budget=Config.CONTEXT_TOKEN_BUDGET,
+        duplicate_threshold=Config.CONTEXT_DUPLICATE_THRESHOLD,
+        tokenizer=Config.CONTEXT_TOKENIZER
+    )
+
+# Prompt template with multilingual support
+PROMPT_TEMPLATE = """You are an AI Engineering tutor helping students learn about artificial intelligence, machine learning, and related technologies.
+
+IMPORTANT LANGUAGE INSTRUCTION:
+- Detect the language of the user's question
+- If the question is in Italian, respond completely in Italian
+- If the question is in English, respond in English
+- Maintain the same language throughout your entire response
+
+Context from lessons:
+{context}
+
+Student's Question: {question}
+
+Instructions:
+1. Provide a clear, educational answer based on the context above
+2. Use examples and analogies when helpful for understanding
+3. If the context doesn't fully cover the topic, acknowledge this and provide what information is available
+4. Be encouraging and supportive - you're a tutor helping someone learn
+5. Format your response with proper structure (use bullet points, numbered lists when appropriate)
+
+Answer (in the same language as the question):"""
+
+def build_answer_chain(llm):
+    """
+    Build the generation half of the RAG chain.
+
+    Args:
+        llm: Chat model generating the answer
+
+    Returns:
+        Runnable mapping {"context", "question"} to an answer string
+    """
+    prompt = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
+    return (
+        prompt.with_listeners(on_end=stage_listener("prompt"))
+        | llm.with_listeners(on_end=stage_listener("llm"))
+        | StrOutputParser()
+    )
+
+def build_qa_chain(retriever, llm):
+    """
+    Build the RAG chain using LCEL.
+
+    Args:
+        retriever: Retriever returning relevant lesson chunks
+        llm: Chat model generating the answer
+
+    Returns:
+        Runnable chain mapping a question to an answer string
+    """
+    timed_format_docs = RunnableLambda(format_docs).with_listeners(
+        on_end=stage_listener("format_docs")
+    )
+    return (
+        {"context": retriever | timed_format_docs, "question": RunnablePassthrough()}
+        | build_answer_chain(llm)
+    )
+
+def build_retriever(vectorstore: FAISS, version: Optional[str] = None) -> Runnable:
+    """
+    Build the retriever used by the QA chain.
+
+    The index is partitioned by lesson and the BM25 index is built here,
+    once per index version (at startup, after loading or creating the store,
+    and after each reload). The search can be scoped per call with
+    config={"configurable": {"lesson_ids": [...]}} (see scope_config()).
+
+    Args:
+        vectorstore: FAISS store of lesson chunks
+        version: Index version; retrieval results are cached under it in
+            retrieval_cache (None disables the cache)
+
+    Returns:
+        LessonRetriever returning the top RETRIEVER_K chunks (diversified
+        by MMR if MMR_ENABLED, rescored by the RERANKER), with configurable
+        lesson_ids, mode and rerank fields
+    """
+    bm25 = None
+    if Config.RETRIEVAL_MODE != "vector":
+        start = time.perf_counter()
+        bm25 = BM25Index.from_vectorstore(vectorstore)
+        logger.info(f"BM25 index built ({bm25.size} chunks, {time.perf_counter() - start:.2f}s)")
+
+    retriever = LessonRetriever(
+        vectorstore=vectorstore,
+        k=Config.RETRIEVER_K,
+        lesson_ranges=lesson_ranges(vectorstore),
+        mode=Config.RETRIEVAL_MODE,
+        bm25=bm25,
+        fetch_k=Config.HYBRID_FETCH_K,
+        rrf_k=Config.RRF_K,
+        # The answer-cache lookup has already embedded the question, so skipping
+        # the dense search would lower recall without saving the embedding call
+        fast_path_coverage=None if Config.ANSWER_CACHE_ENABLED else Config.LEXICAL_FAST_PATH_COVERAGE,
+        fast_path_margin=Config.LEXICAL_FAST_PATH_MARGIN,
+        cache=retrieval_cache if Config.RETRIEVAL_CACHE_ENABLED and version is not None else None,
+        index_version=version,
+        mmr=Config.MMR_ENABLED,
+        mmr_fetch_k=Config.MMR_FETCH_K,
+        mmr_lambda=Config.MMR_LAMBDA,
+        reranker=get_reranker(bm25),
+        rerank_top_n=Config.RERANK_TOP_N,
+        rerank_budget=None if Config.RERANK_BUDGET_MS is None else Config.RERANK_BUDGET_MS / 1000
+    )
+    if Config.MMR_ENABLED:
+        retriever.prepare_mmr()
+    return retriever.configurable_fields(
+        lesson_ids=ConfigurableField(
+            id="lesson_ids",
+            name="Lesson ids",
+            description="Only search these lessons"
+        ),
+        mode=ConfigurableField(
+            id="retrieval_mode",
+            name="Retrieval mode",
+            description="vector, lexical or hybrid"
+        ),
+        use_reranker=ConfigurableField(
+            id="rerank",
+            name="Rerank",
+            description="Rescore the first-stage hits with the reranker"
+        )
+    )
+
+def resolve_lesson_scope(
+    lesson_ids: Optional[List[str]],
+    level: Optional[str],
+    available: List[str]
+) -> Optional[List[str]]:
+    """
+    Turn the lesson filters of a query into indexed lesson ids.
+
+    A requested id matches a lesson by its full id ("03_rag_architecture")
+    or by its number ("03"). When both filters are given, a lesson must
+    match both.
+
+    Args:
+        lesson_ids: Requested lessons, or None
+        level: Requested level (a key of Config.LESSON_LEVELS), or None
+        available: Lesson ids present in the index
+
+    Returns:
+        Sorted list of lesson ids to search, or None for the whole index
+
+    Raises:
+        ValueError: If the filters match no indexed lesson
+    """
+    if lesson_ids is None and level is None:
+        return None
+
+    def matches(lesson: str, wanted: List[str]) -> bool:
+        return any(lesson == w or lesson.startswith(f"{w}_") for w in wanted)
+
+    scope = sorted(available)
+    if lesson_ids is not None:
+        scope = [lesson for lesson in scope if matches(lesson, lesson_ids)]
+    if level is not None:
+        scope = [lesson for lesson in scope if matches(lesson, Config.LESSON_LEVELS[level])]
+    if not scope:
+        raise ValueError("No indexed lessons match the lesson_ids/level filters")
+    return scope
+
+def scope_config(scope: Optional[List[str]], rerank: bool = True) -> Optional[dict]:
+    """
+    Build the runnable config restricting retrieval to some lessons.
+
+    Args:
+        scope: Lesson ids from resolve_lesson_scope()
+        rerank: False skips the second-stage reranker
+
+    Returns:
+        Config for retriever/qa_chain invocations (None for the whole index
+        with reranking)
+    """
+    configurable = {}
+    if scope:
+        configurable["lesson_ids"] = scope
+    if not rerank:
+        configurable["rerank"] = False
+    return {"configurable": configurable} if configurable else None
+
+def format_sse(event: str, data: dict) -> str:
+    """
+    Format one Server-Sent Event.
+
+    Args:
+        event: Event name
+        data: JSON-serialisable payload
+
+    Returns:
+        SSE frame terminated by a blank line
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 # --- Initialize Application Components ---
 # These will be initialized at startup
@@ -179,6 +966,40 @@ vectorstore = None
 retriever = None
 llm = None
 qa_chain = None
+answer_chain = None
+index_manifest = None
+index_version = None
+init_error = None  # Why background initialization failed, if it did
+
+answer_cache = AnswerCache(
+    max_entries=Config.ANSWER_CACHE_MAX_ENTRIES,
+    ttl_seconds=Config.ANSWER_CACHE_TTL_SECONDS,
+    similarity_threshold=Config.ANSWER_CACHE_SIMILARITY_THRESHOLD
+)
+retrieval_cache = RetrievalCache(max_entries=Config.RETRIEVAL_CACHE_MAX_ENTRIES)
+
+single_flight = SingleFlight()
+
+# Shared by the chat and embeddings clients (see get_http_clients)
+upstream_breaker = CircuitBreaker(
+    failure_threshold=Config.CIRCUIT_FAILURE_THRESHOLD,
+    reset_seconds=Config.CIRCUIT_RESET_SECONDS
+)
+http_clients = None
+http_clients_lock = threading.Lock()
+
+# Shared by every index build, adjusted by the embeddings responses (see observe_upstream_response)
+embedding_rate_limiter = RateLimiter(
+    requests_per_minute=Config.EMBEDDING_REQUESTS_PER_MINUTE,
+    tokens_per_minute=Config.EMBEDDING_TOKENS_PER_MINUTE
+)
+
+# Loaded once, on the first retriever build with RERANKER=cross_encoder
+cross_encoder = None
+cross_encoder_lock = threading.Lock()
+
+# Serializes lesson reloads; queries never take this lock
+reload_lock = threading.Lock()
 
 
 def initialize_app():
@@ -193,60 +1014,307 @@ def initialize_app():
 
     Separating initialization allows for better testing and lazy loading.
     """
-    global api_key, documents, vectorstore, retriever, llm, qa_chain
+    global api_key, documents, vectorstore, retriever, llm, qa_chain, answer_chain
+    global index_manifest, index_version
 
     logger.info("Initializing LangChain Mini-RAG API...")
+    start = time.perf_counter()
 
     # Get API key
     api_key = get_api_key()
 
-    # Load documents
-    documents = load_documents(Config.DATA_PATH)
-
-    # Create vector store
-    vectorstore = create_vectorstore(documents, api_key)
-    retriever = vectorstore.as_retriever(search_kwargs={"k": Config.RETRIEVER_K})
+    # Load the persisted vector store, or build it from the lessons
+    index_manifest = current_manifest()
+    index_version = manifest_fingerprint(index_manifest)
+    answer_cache.set_version(index_version)
+    retrieval_cache.set_version(index_version)
+    vectorstore, documents = load_or_create_vectorstore(api_key, index_manifest)
+    retriever = build_retriever(vectorstore, index_version)
 
     # Build QA chain
-    llm = ChatOpenAI(
-        model=Config.LLM_MODEL,
-        temperature=Config.LLM_TEMPERATURE,
-        api_key=api_key
-    )
+    llm = get_llm(api_key)
+    qa_chain = build_qa_chain(retriever, llm)
+    answer_chain = build_answer_chain(llm)
 
-    # Create prompt template with multilingual support
-    template = """You are an AI Engineering tutor helping students learn about artificial intelligence, machine learning, and related technologies.
+    metrics.INDEX_VECTORS.set(vectorstore.index.ntotal)
+    metrics.STARTUP_DURATION.set(time.perf_counter() - start)
+    logger.info("QA chain initialized successfully")
 
-IMPORTANT LANGUAGE INSTRUCTION:
-- Detect the language of the user's question
-- If the question is in Italian, respond completely in Italian
-- If the question is in English, respond in English
-- Maintain the same language throughout your entire response
+def reload_lessons() -> dict:
+    """
+    Apply lesson file changes to the live index without a restart.
 
-Context from lessons:
-{context}
+    Only added, modified and deleted lessons are re-chunked and re-embedded.
+    The changes are applied to a copy of the index; the retriever and QA
+    chain globals are then swapped in one step, so requests already running
+    finish on the previous version.
 
-Student's Question: {question}
+    ANN indexes (INDEX_TYPE other than "flat") can't be edited in place:
+    HNSW can't remove vectors and IVF keeps the ids of removed ones, which
+    breaks the contiguous ids the store relies on. They are rebuilt from all
+    lessons instead; the embedding cache still limits embedding calls to
+    the changed chunks.
 
-Instructions:
-1. Provide a clear, educational answer based on the context above
-2. Use examples and analogies when helpful for understanding
-3. If the context doesn't fully cover the topic, acknowledge this and provide what information is available
-4. Be encouraging and supportive - you're a tutor helping someone learn
-5. Format your response with proper structure (use bullet points, numbered lists when appropriate)
+    Every uvicorn worker holds its own copy of these globals. When another
+    worker has already saved an index for the current lessons to
+    Config.INDEX_PATH, that index is loaded instead of embedding the
+    changes again (see watch_lessons(), which follows the saved manifest).
 
-Answer (in the same language as the question):"""
-    prompt = ChatPromptTemplate.from_template(template)
+    Returns:
+        Dictionary with the "added", "modified" and "deleted" file names
+    """
+    global documents, vectorstore, retriever, qa_chain, index_manifest, index_version
+
+    with reload_lock:
+        new_manifest = current_manifest()
+        changes = diff_file_hashes(index_manifest["files"], new_manifest["files"])
+        if not any(changes.values()):
+            logger.info("Lessons unchanged, nothing to reload")
+            return changes
+
+        logger.info(f"Reloading lessons: {changes}")
+        new_docs = []
+        saved = None
+        if read_manifest(Config.INDEX_PATH) == new_manifest:
+            saved = load_persisted_index(new_manifest, vectorstore.embedding_function)
+        if saved is not None:
+            new_vectorstore = saved
+            logger.info(f"Loaded the index another worker saved to {Config.INDEX_PATH}")
+        elif Config.INDEX_TYPE == "flat":
+            new_docs = load_lesson_files([Config.DATA_PATH / name for name in changes["added"] + changes["modified"]])
+            new_vectorstore = clone_vectorstore(vectorstore)
+
+            stale_ids = ids_for_sources(new_vectorstore, changes["modified"] + changes["deleted"])
+            if stale_ids:
+                new_vectorstore.delete(stale_ids)
+
+            if new_docs:
+                new_vectorstore.add_documents(new_docs, ids=[doc.id for doc in new_docs])
+        else:
+            new_vectorstore = create_vectorstore(
+                load_documents(Config.DATA_PATH), api_key, vectorstore.embedding_function
+            )
+
+        if saved is None:
+            new_vectorstore = persist_index(new_vectorstore, new_manifest)
+        new_version = manifest_fingerprint(new_manifest)
+        new_retriever = build_retriever(new_vectorstore, new_version)
+        new_chain = build_qa_chain(new_retriever, llm)
+
+        # Swap everything at once; in-flight requests keep their old references.
+        # The caches then move to the new version and ignore late results of
+        # requests still running on the old one.
+        documents, vectorstore, retriever, qa_chain, index_manifest, index_version = (
+            documents_from_vectorstore(new_vectorstore),
+            new_vectorstore,
+            new_retriever,
+            new_chain,
+            new_manifest,
+            new_version,
+        )
+        answer_cache.set_version(new_version)
+        retrieval_cache.set_version(new_version)
+
+        metrics.INDEX_VECTORS.set(new_vectorstore.index.ntotal)
+        logger.info(f"Lessons reloaded ({len(new_docs)} chunks re-embedded)")
+        return changes
+
+async def lookup_cached_answer(
+    question: str,
+    embeddings: Embeddings,
+    version: str,
+    scope: str = ""
+) -> Tuple[Optional[dict], Optional[List[float]]]:
+    """
+    Look up a question in the answer cache.
 
-    # Build the chain using LCEL
-    qa_chain = (
-        {"context": retriever | format_docs, "question": RunnablePassthrough()}
-        | prompt
-        | llm
-        | StrOutputParser()
+    The exact (normalized text) level is checked first; only on a miss is
+    the question embedded for the near-duplicate level. The language
+    directive is left out of the embedding, as in the retriever, so the
+    retriever reuses it from the query-embedding cache; the answer cache
+    still compares directives.
+
+    Args:
+        question: The user's question
+        embeddings: Embeddings of the vector store the request captured, so
+            a concurrent reload can't embed it with another model
+        version: Index version the request is running against
+        scope: Lessons the answer was restricted to ("" for the whole index)
+
+    Returns:
+        Tuple of (cached value or None, question embedding if computed)
+    """
+    if not Config.ANSWER_CACHE_ENABLED:
+        return None, None
+
+    cached = answer_cache.get_exact(question, version, scope)
+    if cached is not None:
+        return cached, None
+
+    embedding = await embeddings.aembed_query(split_directive(question)[1])
+    return answer_cache.get_similar(question, embedding, version, scope), embedding
+
+def store_cached_answer(
+    question: str,
+    embedding: Optional[List[float]],
+    value: dict,
+    version: str,
+    scope: str = ""
+) -> None:
+    """
+    Store a freshly generated answer in the answer cache.
+
+    Args:
+        question: The user's question
+        embedding: Question embedding from lookup_cached_answer()
+        value: {"answer": ..., "sources": ...} to serve on later hits
+        version: Index version the answer was generated from
+        scope: Lessons the answer was restricted to ("" for the whole index)
+    """
+    if Config.ANSWER_CACHE_ENABLED:
+        answer_cache.put(question, embedding, value, version, scope)
+
+def retrieval_options(query_retriever: Runnable, config: Optional[dict] = None) -> Tuple:
+    """
+    Retrieval settings a request runs with, for telling executions apart.
+
+    Args:
+        query_retriever: Retriever from build_retriever()
+        config: Runnable config of the request (from scope_config())
+
+    Returns:
+        (retrieval mode, rerank, mmr, mmr_fetch_k, mmr_lambda)
+    """
+    lesson_retriever = query_retriever.default
+    configurable = (config or {}).get("configurable", {})
+    return (
+        configurable.get("retrieval_mode", lesson_retriever.mode),
+        configurable.get("rerank", lesson_retriever.use_reranker),
+        lesson_retriever.mmr,
+        lesson_retriever.mmr_fetch_k,
+        lesson_retriever.mmr_lambda,
     )
 
-    logger.info("QA chain initialized successfully")
+def flight_key(question: str, version: str, scope: str = "", options: Tuple = ()) -> Tuple[str, str, str, Tuple]:
+    """
+    Identity of a chain execution for request coalescing.
+
+    Questions are compared like exact answer cache keys (normalized text,
+    language directive kept), within one index version, lesson scope and
+    set of retrieval options, so a request never receives an answer built
+    from differently retrieved context.
+
+    Args:
+        question: The user's question
+        version: Index version the request is running against
+        scope: Lessons the answer is restricted to ("" for the whole index)
+        options: Retrieval settings from retrieval_options()
+
+    Returns:
+        Hashable key
+    """
+    return normalize_question(question), version, scope, options
+
+async def run_coalesced(kind: str, key: Hashable, run: Callable[[], Awaitable]):
+    """
+    Run an execution, sharing it with identical concurrent requests.
+
+    Args:
+        kind: What is executed ("query", "stream_context", "batch")
+        key: Key from flight_key()
+        run: Starts the execution
+
+    Returns:
+        The execution's result
+    """
+    if not Config.COALESCE_ENABLED:
+        return await run()
+    return await single_flight.do(kind, key, run)
+
+def stream_coalesced(kind: str, key: Hashable, run: Callable[[], AsyncIterator]) -> AsyncIterator:
+    """
+    Stream an execution, sharing it with identical concurrent requests.
+
+    Requests that attach late still receive every item from the start.
+
+    Args:
+        kind: What is executed ("stream_answer")
+        key: Key from flight_key()
+        run: Starts the streamed execution
+
+    Returns:
+        Async iterator over the execution's items
+    """
+    if not Config.COALESCE_ENABLED:
+        return run()
+    return single_flight.stream(kind, key, run)
+
+async def embed_questions(embeddings: Embeddings, questions: List[str]) -> List[List[float]]:
+    """
+    Embed a batch of questions with a single embeddings request.
+
+    Args:
+        embeddings: Embeddings of the live vector store
+        questions: Questions to embed
+
+    Returns:
+        One embedding per question, in order
+    """
+    if isinstance(embeddings, CachedEmbeddings):
+        # Keep questions out of the persistent chunk cache
+        return await embeddings.aembed_queries(questions)
+    return await embeddings.aembed_documents(questions)
+
+def lesson_snapshot(data_path: Path) -> Dict[str, Tuple[int, int]]:
+    """
+    Cheap change-detection snapshot of the lesson directory.
+
+    Args:
+        data_path: Directory containing the .txt lessons
+
+    Returns:
+        Mapping of file name to (mtime in ns, size in bytes)
+    """
+    snapshot = {}
+    for txt_file in data_path.glob("*.txt"):
+        stat = txt_file.stat()
+        snapshot[txt_file.name] = (stat.st_mtime_ns, stat.st_size)
+    return snapshot
+
+def saved_index_version() -> Optional[str]:
+    """
+    Version of the index saved at Config.INDEX_PATH.
+
+    Returns:
+        Fingerprint of its manifest, or None if there is no saved index
+    """
+    manifest = read_manifest(Config.INDEX_PATH)
+    return manifest_fingerprint(manifest) if manifest is not None else None
+
+async def watch_lessons(interval: float):
+    """
+    Poll the lesson directory and the saved index, and reload on changes.
+
+    Following the saved manifest keeps uvicorn workers in step: a reload
+    triggered through /admin/reindex only runs in the worker that received
+    it, which then saves the new index; the other workers see its manifest
+    change and load it (see reload_lessons()).
+
+    Args:
+        interval: Seconds between polls
+    """
+    last_snapshot = lesson_snapshot(Config.DATA_PATH)
+    last_saved = saved_index_version()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            snapshot = lesson_snapshot(Config.DATA_PATH)
+            saved = saved_index_version()
+            if snapshot != last_snapshot or saved not in (last_saved, index_version):
+                await run_in_threadpool(reload_lessons)
+            last_snapshot, last_saved = snapshot, saved
+        except Exception as e:
+            logger.error(f"Lesson reload failed: {e}", exc_info=True)
 
 # --- FastAPI Application ---
 app = FastAPI(
@@ -264,6 +1332,49 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def route_label(request: Request) -> str:
+    """
+    Metric label for a request: its route template, or "unmatched".
+
+    Middleware runs before routing, so the route is matched here; labelling
+    by raw path would create a time series per URL a scanner tries.
+
+    Args:
+        request: Incoming request
+
+    Returns:
+        Route path template (e.g. "/query/stream") or "unmatched"
+    """
+    partial = None
+    for route in app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path  # Path matches, method doesn't (405)
+    return partial or "unmatched"
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    """Record request counts, in-flight requests, latency and 5xx errors"""
+    # Label by route template to keep cardinality bounded
+    label = route_label(request)
+    metrics.IN_FLIGHT.labels(path=label).inc()
+    start = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        metrics.IN_FLIGHT.labels(path=label).dec()
+        metrics.REQUEST_DURATION.labels(method=request.method, path=label).observe(
+            time.perf_counter() - start
+        )
+        metrics.REQUESTS.labels(method=request.method, path=label, status=str(status_code)).inc()
+        if status_code >= 500:
+            metrics.ERRORS.labels(endpoint=label).inc()
+
 # --- API Models ---
 class QueryInput(BaseModel):
     """Input model for query endpoint"""
@@ -274,6 +1385,25 @@ class QueryInput(BaseModel):
         description="The question to ask the knowledge base",
         example="What is Artificial Intelligence?"
     )
+    lesson_ids: Optional[List[str]] = Field(
+        None,
+        min_length=1,
+        max_length=100,
+        description=(
+            "Only search these lessons, by id (\"03_rag_architecture\") "
+            "or number (\"03\")"
+        ),
+        example=["03", "04"]
+    )
+    level: Optional[str] = Field(
+        None,
+        description="Only search lessons of this level (beginner, intermediate, advanced)",
+        example="intermediate"
+    )
+    rerank: bool = Field(
+        True,
+        description="Rescore the retrieved chunks with the configured reranker (false trades precision for latency)"
+    )
 
     @validator('question')
     def question_must_not_be_empty(cls, v):
@@ -281,17 +1411,149 @@ class QueryInput(BaseModel):
             raise ValueError('Question cannot be empty or only whitespace')
         return v.strip()
 
+    @validator('level')
+    def level_must_be_known(cls, v):
+        if v is None:
+            return v
+        level = v.strip().casefold()
+        if level not in Config.LESSON_LEVELS:
+            raise ValueError(f"Level must be one of: {', '.join(Config.LESSON_LEVELS)}")
+        return level
+
 class QueryResponse(BaseModel):
     """Response model for query endpoint"""
     question: str = Field(..., description="The original question")
     answer: str = Field(..., description="The generated answer")
 
+class BatchQueryInput(BaseModel):
+    """Input model for batch query endpoint"""
+    questions: List[str] = Field(
+        ...,
+        min_length=1,
+        max_length=Config.BATCH_MAX_QUESTIONS,
+        description="The questions to ask, answered in the same order",
+        example=["What is RAG?", "What is a vector database?"]
+    )
+
+    @validator('questions')
+    def questions_must_be_valid(cls, v):
+        stripped = [question.strip() for question in v]
+        if any(not question for question in stripped):
+            raise ValueError('Questions cannot be empty or only whitespace')
+        if any(len(question) > 1000 for question in stripped):
+            raise ValueError('Questions must be at most 1000 characters')
+        return stripped
+
+class BatchQueryResult(BaseModel):
+    """One answer (or error) in a batch response"""
+    question: str = Field(..., description="The original question")
+    answer: Optional[str] = Field(None, description="The generated answer")
+    error: Optional[str] = Field(None, description="Why this question failed, if it did")
+
+class BatchQueryResponse(BaseModel):
+    """Response model for batch query endpoint"""
+    results: List[BatchQueryResult] = Field(..., description="One result per question, in input order")
+
 class HealthResponse(BaseModel):
     """Response model for health check"""
     status: str = Field(..., description="API status")
     message: str = Field(..., description="Status message")
     documents_loaded: int = Field(..., description="Number of documents in knowledge base")
 
+class ReadyResponse(BaseModel):
+    """Response model for the readiness endpoint"""
+    status: str = Field(..., description="ready, starting or failed")
+    index_loaded: bool = Field(..., description="Whether the vector index is loaded")
+    chain_built: bool = Field(..., description="Whether the QA chain is built")
+    index_version: Optional[str] = Field(None, description="Fingerprint of the loaded index")
+    documents_loaded: int = Field(..., description="Number of documents in knowledge base")
+    error: Optional[str] = Field(None, description="Initialization error, if it failed")
+
+class ReindexResponse(BaseModel):
+    """Response model for the reindex endpoint"""
+    added: List[str] = Field(..., description="Lesson files added to the index")
+    modified: List[str] = Field(..., description="Lesson files re-embedded after changes")
+    deleted: List[str] = Field(..., description="Lesson files removed from the index")
+    documents_loaded: int = Field(..., description="Number of documents in knowledge base")
+
+def lesson_scope(input_data: QueryInput, query_retriever: Runnable) -> Optional[List[str]]:
+    """
+    Resolve the lesson filters of a query against the retriever's index.
+
+    Args:
+        input_data: QueryInput with optional lesson_ids/level
+        query_retriever: Retriever the request will search
+
+    Returns:
+        Lesson ids to search, or None for the whole index
+
+    Raises:
+        HTTPException: 400 if the filters match no indexed lesson
+    """
+    if input_data.lesson_ids is None and input_data.level is None:
+        return None
+    try:
+        return resolve_lesson_scope(
+            input_data.lesson_ids, input_data.level, list(query_retriever.default.lesson_ranges)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+def is_ready() -> bool:
+    """Whether the index is loaded and every chain a query needs is built"""
+    return None not in (vectorstore, retriever, qa_chain, answer_chain)
+
+def not_ready_headers() -> Dict[str, str]:
+    """Headers for a 503 sent while the app is initializing"""
+    return {"Retry-After": str(Config.READY_RETRY_AFTER_SECONDS)}
+
+async def wait_until_ready() -> None:
+    """
+    Hold a request that arrived during startup until initialization finishes.
+
+    Waits at most Config.READY_WAIT_SECONDS for the background
+    initialization, so early requests are answered once the index is
+    loaded instead of failing.
+
+    Raises:
+        HTTPException: 503 with Retry-After if the app is still not ready
+    """
+    if is_ready():
+        return
+    initialization = getattr(app.state, "initialization", None)
+    if initialization is not None and not initialization.done():
+        try:
+            await asyncio.wait_for(asyncio.shield(initialization), Config.READY_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+    if not is_ready():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The tutor is still loading its index, please retry shortly",
+            headers=not_ready_headers()
+        )
+
+def raise_if_upstream_unavailable(error: Exception) -> None:
+    """
+    Turn an OpenAI outage or rate limit into a 503 instead of a 500.
+
+    Args:
+        error: Exception raised while answering a request
+
+    Raises:
+        HTTPException: 503 with Retry-After if upstream is unavailable,
+            rate limited or the circuit breaker is open
+    """
+    retry_after = upstream_retry_after(error)
+    if retry_after is None:
+        return
+    logger.warning(f"OpenAI unavailable: {error}")
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="The AI provider is unavailable or rate limited, please retry shortly",
+        headers={"Retry-After": str(max(1, round(retry_after)))}
+    )
+
 # --- API Endpoints ---
 @app.get(
     "/",
@@ -319,12 +1581,15 @@ async def root():
     summary="Query Knowledge Base",
     description="Ask a question and get an answer based on the knowledge base"
 )
-async def query_docs(input_data: QueryInput) -> QueryResponse:
+async def query_docs(input_data: QueryInput, response: Response) -> QueryResponse:
     """
     Query the knowledge base with a question.
 
+    Per-stage timings are reported in the Server-Timing response header.
+
     Args:
         input_data: QueryInput containing the question
+        response: Response used to set the Server-Timing header
 
     Returns:
         QueryResponse with the question and generated answer
@@ -333,25 +1598,263 @@ async def query_docs(input_data: QueryInput) -> QueryResponse:
         HTTPException: If an error occurs during query processing
     """
     logger.info(f"Query received: {input_data.question[:100]}...")
+    await wait_until_ready()
+    query_chain, query_retriever, query_version = qa_chain, retriever, index_version
+    query_embeddings = vectorstore.embedding_function
+    scope = lesson_scope(input_data, query_retriever)
+    cache_scope = ",".join(scope or [])
+    config = scope_config(scope, input_data.rerank)
+    timings = start_request_timings()
 
     try:
-        # Invoke the QA chain
-        answer = qa_chain.invoke(input_data.question)
+        with time_stage("cache"):
+            cached, embedding = await lookup_cached_answer(
+                input_data.question, query_embeddings, query_version, cache_scope
+            )
+        if cached is not None:
+            logger.info("Answer served from cache")
+            response.headers["Server-Timing"] = server_timing_header(timings)
+            return QueryResponse(
+                question=input_data.question,
+                answer=cached["answer"]
+            )
+
+        # Run the QA chain on the async path (retrieval, embedding and LLM)
+        # so a slow LLM call never blocks the event loop. Identical
+        # questions in flight at the same time share one execution.
+        answer = await run_coalesced(
+            "query",
+            flight_key(input_data.question, query_version, cache_scope, retrieval_options(query_retriever, config)),
+            lambda: query_chain.ainvoke(input_data.question, config=config)
+        )
 
         logger.info(f"Answer generated successfully ({len(answer)} chars)")
+        store_cached_answer(
+            input_data.question, embedding, {"answer": answer, "sources": None}, query_version, cache_scope
+        )
 
+        response.headers["Server-Timing"] = server_timing_header(timings)
         return QueryResponse(
             question=input_data.question,
             answer=answer
         )
 
     except Exception as e:
+        raise_if_upstream_unavailable(e)
         logger.error(f"Error processing query: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An error occurred while processing your query: {str(e)}"
         )
 
+@app.post(
+    "/query/stream",
+    summary="Stream Answer",
+    description=(
+        "Ask a question and receive the answer as Server-Sent Events: one "
+        "`context` event with the retrieved chunks' metadata, then `token` "
+        "events as the LLM generates, then `done` (or `error`)."
+    ),
+    response_class=StreamingResponse
+)
+async def query_docs_stream(input_data: QueryInput) -> StreamingResponse:
+    """
+    Query the knowledge base and stream the answer token by token.
+
+    Args:
+        input_data: QueryInput containing the question
+
+    Returns:
+        StreamingResponse with text/event-stream content
+
+    Raises:
+        HTTPException: If retrieval fails before streaming starts
+    """
+    logger.info(f"Streaming query received: {input_data.question[:100]}...")
+    await wait_until_ready()
+
+    # Take references up front so a concurrent reload can't mix versions
+    query_retriever, query_answer_chain, query_version = retriever, answer_chain, index_version
+    query_embeddings = vectorstore.embedding_function
+    scope = lesson_scope(input_data, query_retriever)
+    cache_scope = ",".join(scope or [])
+    config = scope_config(scope, input_data.rerank)
+    key = flight_key(input_data.question, query_version, cache_scope, retrieval_options(query_retriever, config))
+
+    try:
+        with time_stage("cache"):
+            cached, embedding = await lookup_cached_answer(
+                input_data.question, query_embeddings, query_version, cache_scope
+            )
+        docs = None if cached is not None else await run_coalesced(
+            "stream_context",
+            key,
+            lambda: query_retriever.ainvoke(input_data.question, config=config)
+        )
+    except Exception as e:
+        raise_if_upstream_unavailable(e)
+        logger.error(f"Error retrieving context: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while processing your query: {str(e)}"
+        )
+
+    async def cached_stream():
+        logger.info("Answer served from cache")
+        yield format_sse("context", {
+            "question": input_data.question,
+            "sources": cached.get("sources") or [],
+        })
+        yield format_sse("token", {"text": cached["answer"]})
+        yield format_sse("done", {"answer_length": len(cached["answer"])})
+
+    async def event_stream():
+        sources = [{"id": doc.id, **doc.metadata} for doc in docs]
+        yield format_sse("context", {
+            "question": input_data.question,
+            "sources": sources,
+        })
+        with time_stage("format_docs"):
+            context = format_docs(docs)
+        tokens = []
+        start = time.perf_counter()
+        try:
+            async for token in stream_coalesced(
+                "stream_answer",
+                key,
+                lambda: query_answer_chain.astream({"context": context, "question": input_data.question})
+            ):
+                if not tokens:
+                    # Time-to-first-token: what users perceive as latency
+                    observe_stage("llm_first_token", time.perf_counter() - start)
+                tokens.append(token)
+                yield format_sse("token", {"text": token})
+        except Exception as e:
+            logger.error(f"Error streaming answer: {str(e)}", exc_info=True)
+            metrics.ERRORS.labels(endpoint="/query/stream").inc()
+            yield format_sse("error", {"detail": f"An error occurred while generating the answer: {str(e)}"})
+            return
+        answer = "".join(tokens)
+        logger.info(f"Answer streamed successfully ({len(answer)} chars)")
+        store_cached_answer(
+            input_data.question, embedding, {"answer": answer, "sources": sources}, query_version, cache_scope
+        )
+        yield format_sse("done", {"answer_length": len(answer)})
+
+    return StreamingResponse(
+        cached_stream() if cached is not None else event_stream(),
+        media_type="text/event-stream",
+        # Stop proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post(
+    "/query/batch",
+    response_model=BatchQueryResponse,
+    summary="Batch Query Knowledge Base",
+    description=(
+        "Answer many questions in one call. All questions are embedded in a "
+        "single request and their dense searches run as one FAISS pass; "
+        "retrieval otherwise matches /query over the whole index (hybrid "
+        "fusion, MMR, reranker, retrieval cache). LLM calls then run with "
+        "bounded concurrency. Failures are reported per question."
+    )
+)
+async def query_docs_batch(input_data: BatchQueryInput) -> BatchQueryResponse:
+    """
+    Answer a batch of questions.
+
+    Args:
+        input_data: BatchQueryInput containing the questions
+
+    Returns:
+        BatchQueryResponse with one result per question, in input order
+
+    Raises:
+        HTTPException: If embedding or retrieval for the batch fails
+    """
+    questions = input_data.questions
+    logger.info(f"Batch query received: {len(questions)} questions")
+    await wait_until_ready()
+
+    # Take references up front so a concurrent reload can't mix versions
+    query_vectorstore, query_retriever = vectorstore, retriever
+    query_answer_chain, query_version = answer_chain, index_version
+
+    try:
+        with time_stage("embed"):
+            # Without the language directive, as the retriever embeds them
+            embeddings = await embed_questions(
+                query_vectorstore.embedding_function, [split_directive(question)[1] for question in questions]
+            )
+        cached_answers = [
+            answer_cache.get_exact(question, query_version)
+            or answer_cache.get_similar(question, embedding, query_version)
+            if Config.ANSWER_CACHE_ENABLED else None
+            for question, embedding in zip(questions, embeddings)
+        ]
+        misses = [i for i, cached in enumerate(cached_answers) if cached is None]
+        # The default configuration of the /query retriever (no lesson scope)
+        retrieved = await run_in_threadpool(
+            query_retriever.default.batch_retrieve,
+            [questions[i] for i in misses],
+            [embeddings[i] for i in misses]
+        )
+        docs_per_question: List[Optional[List[Document]]] = [None] * len(questions)
+        for i, docs in zip(misses, retrieved):
+            docs_per_question[i] = docs
+    except Exception as e:
+        raise_if_upstream_unavailable(e)
+        logger.error(f"Error processing batch query: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while processing your batch query: {str(e)}"
+        )
+
+    semaphore = asyncio.Semaphore(Config.BATCH_MAX_CONCURRENCY)
+
+    async def answer_one(
+        question: str,
+        embedding: List[float],
+        cached: Optional[dict],
+        docs: Optional[List[Document]]
+    ) -> BatchQueryResult:
+        if cached is not None:
+            return BatchQueryResult(question=question, answer=cached["answer"])
+
+        async def generate() -> str:
+            async with semaphore:
+                return await query_answer_chain.ainvoke(
+                    {"context": format_docs(docs), "question": question}
+                )
+
+        try:
+            # Repeated questions, in this batch or in flight elsewhere, share one LLM call
+            answer = await run_coalesced(
+                "batch", flight_key(question, query_version, options=retrieval_options(query_retriever)), generate
+            )
+        except Exception as e:
+            logger.warning(f"Batch item failed: {e}")
+            metrics.ERRORS.labels(endpoint="/query/batch").inc()
+            return BatchQueryResult(question=question, error=str(e))
+
+        store_cached_answer(
+            question,
+            embedding,
+            {"answer": answer, "sources": [{"id": doc.id, **doc.metadata} for doc in docs]},
+            query_version
+        )
+        return BatchQueryResult(question=question, answer=answer)
+
+    results = await asyncio.gather(*[
+        answer_one(question, embedding, cached, docs)
+        for question, embedding, cached, docs in zip(questions, embeddings, cached_answers, docs_per_question)
+    ])
+
+    failed = sum(1 for result in results if result.error)
+    logger.info(f"Batch answered ({len(results) - failed} ok, {failed} failed)")
+    return BatchQueryResponse(results=results)
+
 @app.get(
     "/health",
     response_model=HealthResponse,
@@ -360,22 +1863,113 @@ async def query_docs(input_data: QueryInput) -> QueryResponse:
 )
 async def health_check():
     """
-    Detailed health check endpoint.
+    Liveness check endpoint.
 
-    Returns comprehensive information about API status.
+    Answers as soon as the server is up, without touching the index or the
+    LLM, so it stays cheap for liveness probes. Whether queries can be
+    served is reported by /ready.
     """
     return HealthResponse(
         status="healthy",
-        message="All systems operational",
+        message="All systems operational" if is_ready() else "Alive, still initializing (see /ready)",
         documents_loaded=len(documents) if documents else 0
     )
 
+@app.get(
+    "/ready",
+    response_model=ReadyResponse,
+    summary="Readiness Check",
+    description="Whether the index is loaded and the QA chain built (503 with Retry-After until then)",
+    responses={503: {"model": ReadyResponse, "description": "Still initializing, or initialization failed"}}
+)
+async def readiness_check():
+    """
+    Readiness check endpoint.
+
+    Returns:
+        ReadyResponse; status code 200 once queries can be served, 503 before
+    """
+    ready = is_ready()
+    body = ReadyResponse(
+        status="ready" if ready else ("failed" if init_error else "starting"),
+        index_loaded=vectorstore is not None,
+        chain_built=qa_chain is not None and answer_chain is not None,
+        index_version=index_version if vectorstore is not None else None,
+        documents_loaded=len(documents) if documents else 0,
+        error=init_error
+    )
+    if ready:
+        return body
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=body.model_dump(),
+        headers=not_ready_headers()
+    )
+
+@app.post(
+    "/admin/reindex",
+    response_model=ReindexResponse,
+    summary="Reload Lessons",
+    description="Re-index only the lesson files that were added, modified or deleted"
+)
+async def reindex_lessons() -> ReindexResponse:
+    """
+    Apply lesson changes to the live index.
+
+    Returns:
+        ReindexResponse listing the files that changed
+
+    Raises:
+        HTTPException: If the index is not initialized or reloading fails
+    """
+    if vectorstore is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Index is not initialized yet",
+            headers=not_ready_headers()
+        )
+
+    try:
+        changes = await run_in_threadpool(reload_lessons)
+    except Exception as e:
+        logger.error(f"Error reloading lessons: {str(e)}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An error occurred while reloading lessons: {str(e)}"
+        )
+
+    return ReindexResponse(**changes, documents_loaded=len(documents))
+
+@app.get(
+    "/metrics",
+    summary="Prometheus Metrics",
+    description="Request, stage latency, index and startup metrics in Prometheus text format",
+    include_in_schema=False
+)
+async def prometheus_metrics() -> Response:
+    """
+    Expose metrics for Prometheus scraping.
+
+    Returns:
+        Response in the Prometheus text exposition format
+    """
+    return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 # --- Application Startup/Shutdown Events ---
-@app.on_event("startup")
-async def startup_event():
-    """Initialize and log application startup"""
-    # Initialize the application components
-    initialize_app()
+async def initialize_in_background():
+    """
+    Run initialize_app() off the event loop, then start the lesson watcher.
+
+    A failure is logged and reported by /ready instead of stopping the
+    server.
+    """
+    global init_error
+    try:
+        await run_in_threadpool(initialize_app)
+    except Exception as e:
+        init_error = str(e)
+        logger.error(f"Initialization failed: {e}", exc_info=True)
+        return
 
     logger.info("=" * 50)
     logger.info("🎓 Learn AI with RAG - Tutor API started successfully")
@@ -384,11 +1978,68 @@ async def startup_event():
     logger.info(f"🌍 Multilingual support: English & Italian")
     logger.info("=" * 50)
 
+    # Optionally watch the lessons directory for live re-indexing
+    if Config.LESSON_WATCH_INTERVAL > 0:
+        app.state.lesson_watcher = asyncio.create_task(
+            watch_lessons(Config.LESSON_WATCH_INTERVAL)
+        )
+        logger.info(f"👀 Watching lessons every {Config.LESSON_WATCH_INTERVAL}s")
+    elif int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+        logger.warning(
+            "Several workers without LESSON_WATCH_INTERVAL: /admin/reindex only reloads "
+            "the worker that serves it, the others keep their index until restarted"
+        )
+
+@app.on_event("startup")
+async def startup_event():
+    """
+    Start initializing the application in the background.
+
+    The server accepts connections right away: /health answers immediately,
+    /ready turns 200 once the index is loaded and the chain built, and
+    queries arriving before that wait (see wait_until_ready()).
+    """
+    app.state.initialization = asyncio.create_task(initialize_in_background())
+
 @app.on_event("shutdown")
 async def shutdown_event():
     """Log application shutdown"""
+    watcher = getattr(app.state, "lesson_watcher", None)
+    if watcher is not None:
+        watcher.cancel()
     logger.info("🎓 Learn AI with RAG - Tutor API shutting down...")
 
-if __name__ == "__main__":
+def cli(argv: Optional[List[str]] = None) -> None:
+    """
+    Command-line entry point: serve the API (default) or build the index.
+
+    Usage:
+        python -m main                           # serve on port 8000
+        python -m main build-index --out PATH    # build the index artifact
+
+    Args:
+        argv: Arguments (defaults to sys.argv[1:])
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m main", description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command")
+    commands.add_parser("serve", help="Run the API with uvicorn (default)")
+    build = commands.add_parser("build-index", help="Load, split and embed the lessons and save the FAISS index")
+    build.add_argument("--out", type=Path, default=Config.INDEX_PATH, help="Index directory (default: INDEX_PATH)")
+    options = parser.parse_args(argv)
+
+    if options.command == "build-index":
+        start = time.perf_counter()
+        manifest = build_index(options.out)
+        logger.info(
+            f"Built index {manifest_fingerprint(manifest)} (version {manifest['index_version']}, "
+            f"{len(manifest['files'])} lessons) at {options.out} in {time.perf_counter() - start:.1f}s"
+        )
+        return
+
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
+
+if __name__ == "__main__":
+    cli()
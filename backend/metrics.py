@@ -0,0 +1,178 @@
+"""
+Prometheus metrics for the RAG tutor.
+
+Stage histograms cover each step of a query (BM25 lookup, query embedding,
+FAISS search, rank fusion, reranking, format_docs, prompt rendering, LLM). Timings of
+the current request are also collected in a context variable so the
+endpoint can report them in a Server-Timing header.
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_DURATION = Histogram(
+    "rag_stage_duration_seconds",
+    "Time spent in each stage of the RAG pipeline",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+REQUEST_DURATION = Histogram(
+    "rag_http_request_duration_seconds",
+    "HTTP request latency",
+    ["method", "path"],
+    buckets=LATENCY_BUCKETS
+)
+REQUESTS = Counter(
+    "rag_http_requests_total",
+    "HTTP requests by route and status code",
+    ["method", "path", "status"]
+)
+IN_FLIGHT = Gauge(
+    "rag_http_requests_in_flight",
+    "HTTP requests currently being processed",
+    ["path"]
+)
+ERRORS = Counter(
+    "rag_errors_total",
+    "Failed requests and failed items within requests",
+    ["endpoint"]
+)
+RETRIEVALS = Counter(
+    "rag_retrievals_total",
+    "Retrievals by the path that served them (vector, lexical, hybrid, lexical_fast_path, cache)",
+    ["path"]
+)
+RERANKS = Counter(
+    "rag_reranks_total",
+    "Second-stage reranking outcomes (reranked, skipped, budget_exceeded)",
+    ["outcome"]
+)
+INDEX_VECTORS = Gauge(
+    "rag_index_vectors",
+    "Number of vectors in the live FAISS index"
+)
+STARTUP_DURATION = Gauge(
+    "rag_startup_duration_seconds",
+    "Duration of the last application initialization"
+)
+CONTEXT_TOKENS = Histogram(
+    "rag_context_tokens",
+    "Tokens of lesson context sent to the LLM per answer",
+    buckets=(100, 250, 500, 1000, 1500, 2000, 3000, 4000, 8000)
+)
+CONTEXT_TOKENS_DROPPED = Counter(
+    "rag_context_tokens_dropped_total",
+    "Retrieved tokens left out of the context (overlap, duplicate, budget)",
+    ["reason"]
+)
+COALESCE_LEADERS = Counter(
+    "rag_coalesce_leaders_total",
+    "Executions started for a question no identical in-flight request was running (query, stream_context, stream_answer, batch)",
+    ["kind"]
+)
+COALESCED_REQUESTS = Counter(
+    "rag_coalesced_requests_total",
+    "Requests that attached to an identical in-flight execution instead of starting their own",
+    ["kind"]
+)
+UPSTREAM_RETRIES = Counter(
+    "rag_upstream_retries_total",
+    "Retried OpenAI HTTP attempts by reason (status code or error type)",
+    ["reason"]
+)
+UPSTREAM_REJECTED = Counter(
+    "rag_upstream_rejected_total",
+    "OpenAI calls rejected without being sent because the circuit was open"
+)
+UPSTREAM_CIRCUIT_OPEN = Gauge(
+    "rag_upstream_circuit_open",
+    "1 while the OpenAI circuit breaker is open (failing fast), else 0"
+)
+EMBEDDING_BATCHES = Counter(
+    "rag_embedding_batches_total",
+    "Document batches embedded by the bulk embedding scheduler"
+)
+EMBEDDING_THROTTLE_SECONDS = Counter(
+    "rag_embedding_throttle_seconds_total",
+    "Time embedding batches waited for the client-side rate limiter"
+)
+
+# Per-request stage timings (stage -> seconds), set by the endpoint
+_request_timings: contextvars.ContextVar[Optional[Dict[str, float]]] = contextvars.ContextVar(
+    "request_timings", default=None
+)
+
+
+def start_request_timings() -> Dict[str, float]:
+    """
+    Start collecting stage timings for the current request.
+
+    Returns:
+        The dictionary that stage timings will be added to
+    """
+    timings: Dict[str, float] = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    """
+    Record the duration of one pipeline stage.
+
+    Args:
+        stage: Stage name (e.g. "embed", "search", "llm")
+        seconds: Duration in seconds
+    """
+    STAGE_DURATION.labels(stage=stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def time_stage(stage: str):
+    """
+    Context manager timing the enclosed block as a pipeline stage.
+
+    Args:
+        stage: Stage name
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def stage_listener(stage: str) -> Callable:
+    """
+    Build an on_end listener for Runnable.with_listeners().
+
+    Args:
+        stage: Stage name to record the run's duration under
+
+    Returns:
+        Listener recording the run duration
+    """
+    def on_end(run) -> None:
+        observe_stage(stage, (run.end_time - run.start_time).total_seconds())
+    return on_end
+
+
+def server_timing_header(timings: Dict[str, float]) -> str:
+    """
+    Format stage timings as a Server-Timing header value.
+
+    Args:
+        timings: Mapping of stage name to seconds
+
+    Returns:
+        Header value, e.g. "embed;dur=12.3, search;dur=0.4"
+    """
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items())
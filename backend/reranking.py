@@ -0,0 +1,175 @@
+"""
+Second-stage rerankers for retrieved chunks.
+
+Retrieval is split into cheap recall and precise reranking: the retriever
+takes the top RERANK_TOP_N candidates from FAISS/BM25, a Reranker rescores
+them against the question and the best RETRIEVER_K go into the prompt.
+
+- LexicalReranker: feature scorer (idf-weighted query term coverage, query
+  bigrams found in the chunk, first-stage rank as a prior). Runs in
+  microseconds and needs nothing but the texts.
+- CrossEncoderReranker: a sentence-transformers cross-encoder loaded from a
+  local directory and run on CPU (requires the optional
+  sentence-transformers package).
+
+rerank() scores the candidates in batches and stops when the time budget
+runs out, in which case the caller keeps the first-stage order.
+
+main.get_reranker() picks the reranker from Config.RERANKER.
+"""
+
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from bm25 import tokenize
+
+
+class Reranker(ABC):
+    """Scores (question, chunk) pairs; higher means more relevant."""
+
+    name: str = "reranker"
+    """Name used in cache keys"""
+    batch_size: int = 16
+    """Chunks scored per call of score()"""
+
+    @abstractmethod
+    def score(self, query: str, texts: Sequence[str], first_rank: int = 0) -> np.ndarray:
+        """
+        Score a batch of chunks.
+
+        Args:
+            query: Question (without language directive)
+            texts: Chunk texts, in first-stage order
+            first_rank: First-stage rank of texts[0]
+
+        Returns:
+            One score per text
+        """
+
+
+class LexicalReranker(Reranker):
+    """
+    Feature scorer over the question and chunk tokens.
+
+    score = coverage + bigram_weight * bigrams + prior_weight / (1 + rank)
+
+    - coverage: share of the question's idf weight whose terms the chunk
+      contains (every term weighs 1 without idf)
+    - bigrams: share of the question's word bigrams found in the chunk
+    - rank: first-stage rank, which breaks ties and keeps the dense signal
+    """
+
+    name = "lexical"
+
+    def __init__(
+        self,
+        idf: Optional[Callable[[str], float]] = None,
+        bigram_weight: float = 0.5,
+        prior_weight: float = 0.2,
+        batch_size: int = 64
+    ):
+        """
+        Args:
+            idf: Inverse document frequency of a token (e.g. BM25Index.idf)
+            bigram_weight: Weight of the bigram feature
+            prior_weight: Weight of the first-stage rank prior
+            batch_size: Chunks scored per call
+        """
+        self.idf = idf
+        self.bigram_weight = bigram_weight
+        self.prior_weight = prior_weight
+        self.batch_size = batch_size
+
+    def score(self, query: str, texts: Sequence[str], first_rank: int = 0) -> np.ndarray:
+        terms = tokenize(query)
+        weights = {term: self.idf(term) if self.idf else 1.0 for term in set(terms)}
+        total = sum(weights.values()) or 1.0
+        bigrams = set(zip(terms, terms[1:]))
+
+        scores = np.empty(len(texts), dtype=np.float32)
+        for i, text in enumerate(texts):
+            tokens = tokenize(text)
+            present = set(tokens)
+            coverage = sum(weight for term, weight in weights.items() if term in present) / total
+            matched = len(bigrams & set(zip(tokens, tokens[1:]))) / len(bigrams) if bigrams else 0.0
+            scores[i] = coverage + self.bigram_weight * matched + self.prior_weight / (1 + first_rank + i)
+        return scores
+
+
+class CrossEncoderReranker(Reranker):
+    """Sentence-transformers cross-encoder loaded from a local directory, run on CPU."""
+
+    name = "cross_encoder"
+
+    def __init__(self, model_path: Path, batch_size: int = 16, max_length: int = 512):
+        """
+        Args:
+            model_path: Directory containing the saved cross-encoder
+            batch_size: Pairs scored per forward pass
+            max_length: Token limit per (question, chunk) pair
+
+        Raises:
+            ImportError: If sentence-transformers is not installed
+            FileNotFoundError: If the model directory does not exist
+        """
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError(
+                "RERANKER=cross_encoder requires sentence-transformers "
+                "(pip install sentence-transformers)"
+            ) from e
+        if not Path(model_path).is_dir():
+            raise FileNotFoundError(f"Cross-encoder model not found: {model_path}")
+
+        self.batch_size = batch_size
+        self.model = CrossEncoder(str(model_path), device="cpu", max_length=max_length)
+
+    def score(self, query: str, texts: Sequence[str], first_rank: int = 0) -> np.ndarray:
+        scores = self.model.predict(
+            [(query, text) for text in texts],
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return np.asarray(scores, dtype=np.float32).reshape(-1)
+
+
+def rerank(
+    reranker: Reranker,
+    query: str,
+    texts: Sequence[str],
+    budget_seconds: Optional[float] = None,
+    clock: Callable[[], float] = time.perf_counter
+) -> Optional[List[int]]:
+    """
+    Order candidates by reranker score within a time budget.
+
+    Batches are scored one after another; once the budget is spent no new
+    batch is started. A batch already running is not interrupted, so the
+    overrun is at most one batch.
+
+    Args:
+        reranker: Reranker to score with
+        query: Question (without language directive)
+        texts: Candidate texts, in first-stage order
+        budget_seconds: Time allowed for scoring (None for no limit)
+        clock: Monotonic time source (replaceable in tests)
+
+    Returns:
+        Candidate indices, best first (ties keep the first-stage order), or
+        None if the budget ran out before every candidate was scored
+    """
+    deadline = None if budget_seconds is None else clock() + budget_seconds
+    scores = []
+    for start in range(0, len(texts), reranker.batch_size):
+        if deadline is not None and clock() >= deadline:
+            return None
+        scores.append(reranker.score(query, texts[start:start + reranker.batch_size], first_rank=start))
+    if not scores:
+        return []
+    return np.argsort(-np.concatenate(scores), kind="stable").tolist()
@@ -0,0 +1,397 @@
+"""
+Retrieval over the lessons index.
+
+LessonRetriever is the retriever used by the QA chain. It embeds the
+question and searches FAISS as two separately timed stages, so slow queries
+can be attributed to the embedding call or to the index search.
+
+Searches can be scoped to a set of lessons. The FAISS ids of each lesson are
+partitioned into ranges when the retriever is built, and a scoped search
+only scans the ranges of the selected lessons instead of filtering a global
+top-k.
+
+Three retrieval modes are supported:
+
+- "vector":  dense FAISS search only
+- "lexical": BM25 only (no embedding call)
+- "hybrid":  BM25 and FAISS results merged with reciprocal-rank fusion.
+             With fast_path_coverage set, when the best BM25 match covers
+             every content word of the query and clearly beats the
+             runner-up (keyword questions such as "FAISS vs Pinecone"), the
+             lexical results are returned directly and the embedding call
+             is skipped
+
+With mmr=True the dense and hybrid modes fetch mmr_fetch_k candidates,
+read their vectors back from FAISS and pick the final k by maximal marginal
+relevance, so four near-identical chunks of one section don't crowd out
+the rest. Lexical results (lexical mode and the fast path) have no query
+embedding and are not re-ranked.
+
+With a reranker (see reranking.py) every mode returns its top rerank_top_n
+hits instead of k; the reranker rescores them against the question in
+batches and the best k are kept. If scoring takes longer than
+rerank_budget the first-stage order is kept instead (and not cached), so a
+slow reranker costs at most one batch over the budget. use_reranker=False
+(the "rerank" configurable field) skips the second stage for one call.
+
+batch_retrieve() runs the same pipeline for many questions embedded
+together (POST /query/batch); the dense searches of an unscoped retriever
+then go to FAISS as one matrix query.
+
+A leading language directive ("[Respond in English]") is not part of the
+search. Results are kept in a RetrievalCache keyed by the normalized
+question, lesson scope and mode, so a repeated question is served without
+any search at all.
+"""
+
+import threading
+from typing import Dict, List, Literal, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables.config import run_in_executor
+from pydantic import PrivateAttr
+
+import metrics
+from answer_cache import split_directive
+from bm25 import BM25Index, reciprocal_rank_fusion
+from index_store import batch_search, reconstruct_vectors, search_ranges
+from metrics import time_stage
+from reranking import Reranker, rerank
+from retrieval_cache import Hits, RetrievalCache, retrieval_key
+
+RetrievalMode = Literal["vector", "lexical", "hybrid"]
+
+
+def maximal_marginal_relevance(
+    query: np.ndarray,
+    candidates: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5
+) -> List[int]:
+    """
+    Select k diverse candidates by maximal marginal relevance.
+
+    Each step picks the candidate maximizing
+    lambda_mult * sim(query, c) - (1 - lambda_mult) * max sim(c, selected),
+    with cosine similarities. The candidate-candidate similarities are one
+    matrix product and each step updates the running maximum as a vector,
+    so the only Python loop is over the k selections.
+
+    Args:
+        query: Query embedding
+        candidates: Candidate vectors, one row each
+        k: Number of candidates to select
+        lambda_mult: 1 ranks by relevance only, 0 by diversity only
+
+    Returns:
+        Row indices of the selected candidates, in selection order
+    """
+    n = len(candidates)
+    if n == 0:
+        return []
+    vectors = np.asarray(candidates, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+    selected = [int(np.argmax(relevance))]
+    redundancy = similarity[selected[0]].copy()
+    available = np.ones(n, dtype=bool)
+    available[selected[0]] = False
+    for _ in range(min(k, n) - 1):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
+
+
+class LessonRetriever(BaseRetriever):
+    """Top-k similarity retriever over a FAISS store of lesson chunks."""
+
+    vectorstore: FAISS
+    """FAISS store of lesson chunks"""
+    k: int = 4
+    """Number of chunks to return"""
+    lesson_ranges: Dict[str, List[Tuple[int, int]]] = {}
+    """FAISS id ranges of each lesson (see index_store.lesson_ranges)"""
+    lesson_ids: Optional[List[str]] = None
+    """Only search these lessons (None searches the whole index)"""
+    mode: RetrievalMode = "vector"
+    """Retrieval mode (see module docstring); other modes need bm25"""
+    bm25: Optional[BM25Index] = None
+    """BM25 index aligned with the FAISS ids"""
+    fetch_k: int = 20
+    """Candidates taken from each retriever before fusion"""
+    rrf_k: int = 60
+    """Reciprocal-rank fusion constant"""
+    fast_path_coverage: Optional[float] = None
+    """Minimum BM25 query coverage that skips the embedding (None disables the fast path)"""
+    fast_path_margin: float = 1.5
+    """Minimum ratio of the best BM25 score to the runner-up's for the fast path"""
+    cache: Optional[RetrievalCache] = None
+    """Retrieval result cache (None disables)"""
+    index_version: Optional[str] = None
+    """Index version the cached results belong to"""
+    mmr: bool = False
+    """Re-rank dense and hybrid candidates by maximal marginal relevance"""
+    mmr_fetch_k: int = 20
+    """Candidates re-ranked by MMR"""
+    mmr_lambda: float = 0.5
+    """MMR trade-off: 1 is pure relevance, 0 pure diversity"""
+    reranker: Optional[Reranker] = None
+    """Second-stage reranker (None keeps the first-stage order)"""
+    use_reranker: bool = True
+    """Apply the reranker (configurable per call to skip it)"""
+    rerank_top_n: int = 20
+    """First-stage hits passed to the reranker"""
+    rerank_budget: Optional[float] = 0.15
+    """Seconds of reranking before the first-stage order is kept (None for no limit)"""
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    _positions: Optional[Dict[str, int]] = PrivateAttr(default=None)
+    _positions_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    def _ranges(self) -> Optional[List[Tuple[int, int]]]:
+        if self.lesson_ids is None:
+            return None
+        return [r for lesson in self.lesson_ids for r in self.lesson_ranges.get(lesson, [])]
+
+    def _chunk_hits(self, faiss_hits: List[Tuple[int, float]]) -> Hits:
+        return [(self.vectorstore.index_to_docstore_id[i], score) for i, score in faiss_hits]
+
+    def _cache_key(self, query: str) -> tuple:
+        scope = None if self.lesson_ids is None else tuple(self.lesson_ids)
+        mmr = (self.mmr_fetch_k, self.mmr_lambda) if self.mmr else None
+        reranker = (self.reranker.name, self.rerank_top_n) if self._reranking() else None
+        return scope, self.mode, mmr, reranker, retrieval_key(query)
+
+    def _reranking(self) -> bool:
+        return self.reranker is not None and self.use_reranker
+
+    def _depth(self) -> int:
+        """Hits the first stage returns: k, or rerank_top_n for the reranker"""
+        return max(self.k, self.rerank_top_n) if self._reranking() else self.k
+
+    def prepare_mmr(self) -> Dict[str, int]:
+        """
+        Map chunk ids to FAISS ids and make the index reconstructible.
+
+        Runs once, on the first MMR re-ranking (or ahead of it, when the
+        retriever is built).
+
+        Returns:
+            FAISS id of each chunk id
+        """
+        with self._positions_lock:
+            if self._positions is None:
+                reconstruct_vectors(self.vectorstore.index, [])
+                self._positions = {doc_id: i for i, doc_id in self.vectorstore.index_to_docstore_id.items()}
+        return self._positions
+
+    def _diversify(self, embedding: Sequence[float], hits: Hits, k: int) -> Hits:
+        """Pick k of the candidate hits by maximal marginal relevance"""
+        if len(hits) <= 1:
+            return hits[:k]
+        positions = self.prepare_mmr()
+        with time_stage("mmr"):
+            vectors = reconstruct_vectors(self.vectorstore.index, [positions[doc_id] for doc_id, _ in hits])
+            selected = maximal_marginal_relevance(np.asarray(embedding), vectors, k, self.mmr_lambda)
+        return [hits[i] for i in selected]
+
+    def _rerank(self, query: str, hits: Hits) -> Tuple[Hits, bool]:
+        """
+        Keep the k best first-stage hits by reranker score.
+
+        Returns:
+            Tuple of (final hits, whether they may be cached). Hits kept in
+            first-stage order because the budget ran out are not cached.
+        """
+        if not self._reranking():
+            if self.reranker is not None:
+                metrics.RERANKS.labels(outcome="skipped").inc()
+            return hits[:self.k], True
+        texts = [self.vectorstore.docstore.search(doc_id).page_content for doc_id, _ in hits]
+        with time_stage("rerank"):
+            order = rerank(self.reranker, query, texts, self.rerank_budget)
+        if order is None:
+            metrics.RERANKS.labels(outcome="budget_exceeded").inc()
+            return hits[:self.k], False
+        metrics.RERANKS.labels(outcome="reranked").inc()
+        return [hits[i] for i in order[:self.k]], True
+
+    def _cached(self, query: str) -> Optional[List[Document]]:
+        """Documents of a cached retrieval of this query, or None"""
+        if self.cache is None:
+            return None
+        hits = self.cache.get(self._cache_key(query), self.index_version)
+        if hits is None:
+            return None
+        metrics.RETRIEVALS.labels(path="cache").inc()
+        return [self.vectorstore.docstore.search(doc_id) for doc_id, _ in hits]
+
+    def _store(self, query: str, hits: Hits, cache: bool = True) -> List[Document]:
+        """Cache the hits of a retrieval and return their documents"""
+        if cache and self.cache is not None:
+            self.cache.put(self._cache_key(query), hits, self.index_version)
+        return [self.vectorstore.docstore.search(doc_id) for doc_id, _ in hits]
+
+    def _lexical(self, query: str) -> Tuple[List[Tuple[int, float]], Optional[Hits]]:
+        """
+        Run BM25 and decide whether its results can be used on their own.
+
+        Returns:
+            Tuple of (BM25 hits for fusion, final chunk hits or None). The
+            final hits are set in lexical mode, or in hybrid mode when the
+            best match is decisive: it covers the query's content terms and
+            scores fast_path_margin times the runner-up.
+        """
+        with time_stage("lexical"):
+            hits = self.bm25.search(query, max(self._depth(), self.fetch_k), self._ranges())
+        if self.mode == "lexical":
+            metrics.RETRIEVALS.labels(path="lexical").inc()
+            return hits, self._chunk_hits(hits[:self._depth()])
+
+        runner_up = hits[1][1] if len(hits) > 1 else 0.0
+        decisive = (
+            self.fast_path_coverage is not None
+            and len(hits) > 0
+            and hits[0][1] >= self.fast_path_margin * runner_up
+            and self.bm25.coverage(query, hits[0][0]) >= self.fast_path_coverage
+        )
+        if decisive:
+            metrics.RETRIEVALS.labels(path="lexical_fast_path").inc()
+            return hits, self._chunk_hits(hits[:self._depth()])
+        return hits, None
+
+    def _dense_k(self) -> int:
+        """Hits taken from FAISS: enough for fusion, MMR and the reranker"""
+        depth = self._depth()
+        k = depth if self.mode == "vector" else max(depth, self.fetch_k)
+        return max(k, max(depth, self.mmr_fetch_k) if self.mmr else depth)
+
+    def _search(
+        self,
+        embedding: Sequence[float],
+        lexical_hits: Optional[List[Tuple[int, float]]] = None,
+        dense: Optional[List[Tuple[Document, float]]] = None
+    ) -> Hits:
+        depth = self._depth()
+        candidates = max(depth, self.mmr_fetch_k) if self.mmr else depth
+        if dense is None:
+            ranges = self._ranges()
+            if ranges is None:
+                dense = self.vectorstore.similarity_search_with_score_by_vector(embedding, k=self._dense_k())
+            else:
+                dense = search_ranges(self.vectorstore, embedding, self._dense_k(), ranges)
+        dense_hits = [(doc.id, float(score)) for doc, score in dense]
+        if self.mode == "vector":
+            metrics.RETRIEVALS.labels(path="vector").inc()
+            hits = dense_hits
+        else:
+            metrics.RETRIEVALS.labels(path="hybrid").inc()
+            with time_stage("fusion"):
+                rankings = [[doc_id for doc_id, _ in hits] for hits in (self._chunk_hits(lexical_hits), dense_hits)]
+                hits = reciprocal_rank_fusion(rankings, k=self.rrf_k)[:candidates]
+        return self._diversify(embedding, hits, depth) if self.mmr else hits[:depth]
+
+    def _get_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        query = split_directive(query)[1]
+        docs = self._cached(query)
+        if docs is not None:
+            return docs
+        lexical_hits, hits = None, None
+        if self.mode != "vector":
+            lexical_hits, hits = self._lexical(query)
+        if hits is None:
+            with time_stage("embed"):
+                embedding = self.vectorstore.embedding_function.embed_query(query)
+            with time_stage("search"):
+                hits = self._search(embedding, lexical_hits)
+        hits, cacheable = self._rerank(query, hits)
+        return self._store(query, hits, cache=cacheable)
+
+    def batch_retrieve(self, queries: Sequence[str], embeddings: Sequence[Sequence[float]]) -> List[List[Document]]:
+        """
+        Retrieve for many questions whose embeddings were computed together.
+
+        Each question goes through the same pipeline as invoke() (retrieval
+        cache, BM25 fusion or fast path, MMR, reranker); only the dense
+        searches of an unscoped retriever are run as one FAISS call.
+
+        Args:
+            queries: Questions (a language directive is ignored)
+            embeddings: Embedding of each question without its directive
+
+        Returns:
+            Documents for each question, in input order
+        """
+        queries = [split_directive(query)[1] for query in queries]
+        results: List[Optional[List[Document]]] = [self._cached(query) for query in queries]
+        pending = [i for i, docs in enumerate(results) if docs is None]
+        first_stage = {
+            i: self._lexical(queries[i]) if self.mode != "vector" else (None, None)
+            for i in pending
+        }
+
+        dense = {}
+        unanswered = [i for i in pending if first_stage[i][1] is None]
+        if unanswered and self._ranges() is None:
+            with time_stage("search"):
+                found = batch_search(self.vectorstore, [embeddings[i] for i in unanswered], self._dense_k())
+            dense = dict(zip(unanswered, found))
+
+        for i in pending:
+            lexical_hits, hits = first_stage[i]
+            if hits is None:
+                if i in dense:
+                    hits = self._search(embeddings[i], lexical_hits, dense[i])
+                else:
+                    with time_stage("search"):
+                        hits = self._search(embeddings[i], lexical_hits)
+            hits, cacheable = self._rerank(queries[i], hits)
+            results[i] = self._store(queries[i], hits, cache=cacheable)
+        return results
+
+    async def _aget_relevant_documents(
+        self,
+        query: str,
+        *,
+        run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        query = split_directive(query)[1]
+        docs = self._cached(query)
+        if docs is not None:
+            return docs
+        lexical_hits, hits = None, None
+        if self.mode != "vector":
+            # BM25 and the FAISS search are CPU-bound; keep them off the event loop
+            lexical_hits, hits = await run_in_executor(None, self._lexical, query)
+        if hits is None:
+            with time_stage("embed"):
+                embedding = await self.vectorstore.embedding_function.aembed_query(query)
+            with time_stage("search"):
+                hits = await run_in_executor(None, self._search, embedding, lexical_hits)
+        if self._reranking():
+            # So is a cross-encoder
+            hits, cacheable = await run_in_executor(None, self._rerank, query, hits)
+        else:
+            hits, cacheable = self._rerank(query, hits)
+        return self._store(query, hits, cache=cacheable)
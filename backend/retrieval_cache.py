@@ -0,0 +1,132 @@
+"""
+Retrieval result cache.
+
+Maps a normalized question to the chunks retrieved for it, so a repeated
+question skips the BM25 lookup, the query embedding and the FAISS search
+even when its answer can't be served from the answer cache (a different
+language directive, answer cache disabled or expired, ...).
+
+Entries store chunk ids and scores rather than Documents; the retriever
+resolves them against its own docstore. Like the answer cache, the whole
+cache is dropped when a new index version is set, and calls carrying an
+older version are ignored.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from answer_cache import normalize_question, split_directive
+
+# (chunk id, retrieval score) pairs, best first
+Hits = List[Tuple[str, float]]
+
+
+def retrieval_key(question: str) -> str:
+    """
+    Normalize a question for retrieval lookups.
+
+    Unlike answer cache keys, the language directive is dropped: it changes
+    the answer but not which chunks are relevant.
+
+    Args:
+        question: Raw question text
+
+    Returns:
+        Normalized question without directive
+    """
+    return normalize_question(split_directive(question)[1])
+
+
+class RetrievalCache:
+    """LRU cache of retrieval results, scoped to one index version."""
+
+    def __init__(self, max_entries: int = 5000):
+        """
+        Args:
+            max_entries: Maximum number of cached retrievals
+        """
+        self.max_entries = max_entries
+        self.version: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, Hits]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def set_version(self, version: str) -> None:
+        """
+        Switch to a newly loaded index version, dropping every entry.
+
+        Args:
+            version: Version of the index now serving requests
+        """
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+
+    def _current(self, version: str) -> bool:
+        """
+        Whether a call is for the current index version.
+
+        The first version seen is adopted; after that only set_version()
+        moves on, so requests still running on an older index neither read
+        nor store entries.
+        """
+        if self.version is None:
+            self.version = version
+        return version == self.version
+
+    def get(self, key: Hashable, version: str) -> Optional[Hits]:
+        """
+        Look up cached retrieval results.
+
+        Args:
+            key: Lookup key (see LessonRetriever, built from retrieval_key())
+            version: Index version the request runs on
+
+        Returns:
+            Cached (chunk id, score) pairs, or None on a miss (always for
+            an outdated version)
+        """
+        with self._lock:
+            hits = self._entries.get(key) if self._current(version) else None
+            if hits is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return hits
+
+    def put(self, key: Hashable, hits: Hits, version: str) -> None:
+        """
+        Store retrieval results.
+
+        Args:
+            key: Lookup key
+            hits: (chunk id, score) pairs, best first
+            version: Index version the results were retrieved from
+                (results from an outdated version are not stored)
+        """
+        with self._lock:
+            if not self._current(version):
+                return
+            self._entries[key] = list(hits)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Report cache counters.
+
+        Returns:
+            Dictionary with hits, misses and entry count
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
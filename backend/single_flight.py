@@ -0,0 +1,134 @@
+"""
+Single-flight coalescing of identical in-flight requests.
+
+When several users ask the same question at the same moment, only the first
+request (the leader) runs the chain; the others attach to its execution and
+receive the same result. Streamed executions are shared the same way: every
+subscriber receives all items from the start, including those produced
+before it attached.
+
+Entries only live while their execution runs, so nothing is served after it
+finishes; later requests go through the answer cache as usual. Executions
+run in their own task, so a leader whose client disconnects does not cancel
+the result the followers are waiting for.
+"""
+
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, TypeVar
+
+import metrics
+
+T = TypeVar("T")
+
+
+class _Broadcast:
+    """Items of one streamed execution, replayed to every subscriber."""
+
+    def __init__(self):
+        self.items: List = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self._changed = asyncio.Condition()
+
+    async def produce(self, items: AsyncIterator) -> None:
+        """Collect the items of the execution and wake up subscribers"""
+        try:
+            async for item in items:
+                async with self._changed:
+                    self.items.append(item)
+                    self._changed.notify_all()
+        except BaseException as e:
+            self.error = e
+            if isinstance(e, asyncio.CancelledError):
+                raise
+        finally:
+            async with self._changed:
+                self.done = True
+                self._changed.notify_all()
+
+    async def subscribe(self) -> AsyncIterator:
+        """Yield every item from the first, then re-raise the execution's error if any"""
+        position = 0
+        while True:
+            async with self._changed:
+                await self._changed.wait_for(lambda position=position: position < len(self.items) or self.done)
+                new_items = self.items[position:]
+            if not new_items:
+                if self.error is not None:
+                    raise self.error
+                return
+            for item in new_items:
+                yield item
+            position += len(new_items)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one execution."""
+
+    def __init__(self):
+        self._calls: Dict[Tuple[str, Hashable], asyncio.Future] = {}
+        self._streams: Dict[Tuple[str, Hashable], _Broadcast] = {}
+
+    def in_flight(self) -> int:
+        """Number of executions currently running"""
+        return len(self._calls) + len(self._streams)
+
+    async def do(self, kind: str, key: Hashable, run: Callable[[], Awaitable[T]]) -> T:
+        """
+        Run an execution, or wait for the identical one already running.
+
+        Args:
+            kind: What is executed (metrics label; part of the key)
+            key: Identity of the execution, e.g. normalized question and scope
+            run: Starts the execution
+
+        Returns:
+            The result of the (possibly shared) execution
+
+        Raises:
+            Whatever the execution raised, in every caller
+        """
+        flight_key = (kind, key)
+        task = self._calls.get(flight_key)
+        if task is None:
+            metrics.COALESCE_LEADERS.labels(kind=kind).inc()
+            task = asyncio.ensure_future(run())
+            self._calls[flight_key] = task
+            task.add_done_callback(lambda done: self._forget(self._calls, flight_key, done))
+        else:
+            metrics.COALESCED_REQUESTS.labels(kind=kind).inc()
+        return await asyncio.shield(task)
+
+    def stream(self, kind: str, key: Hashable, run: Callable[[], AsyncIterator[T]]) -> AsyncIterator[T]:
+        """
+        Stream an execution, or attach to the identical stream already running.
+
+        Args:
+            kind: What is executed (metrics label; part of the key)
+            key: Identity of the execution
+            run: Starts the streamed execution
+
+        Returns:
+            Async iterator over all items of the (possibly shared) execution;
+            raises the execution's error after the items produced before it
+        """
+        flight_key = (kind, key)
+        broadcast = self._streams.get(flight_key)
+        if broadcast is None:
+            metrics.COALESCE_LEADERS.labels(kind=kind).inc()
+            broadcast = _Broadcast()
+            self._streams[flight_key] = broadcast
+            task = asyncio.ensure_future(broadcast.produce(run()))
+            task.add_done_callback(lambda done: self._forget(self._streams, flight_key, done, broadcast))
+        else:
+            metrics.COALESCED_REQUESTS.labels(kind=kind).inc()
+        return broadcast.subscribe()
+
+    @staticmethod
+    def _forget(flights: dict, flight_key: Tuple[str, Hashable], task: asyncio.Future, entry=None) -> None:
+        """Remove a finished execution so later calls start a new one"""
+        if flights.get(flight_key) is (entry if entry is not None else task):
+            del flights[flight_key]
+        if not task.cancelled():
+            # Mark the error as retrieved even if every caller went away
+            task.exception()
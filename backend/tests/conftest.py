@@ -10,16 +10,39 @@ import pytest
 from pathlib import Path
 from fastapi.testclient import TestClient
 from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models import FakeListChatModel
 
 # Set test environment variables before importing the app
 # Use a placeholder key for CI/CD environments without actual API keys
 if not os.getenv("OPENAI_API_KEY"):
     os.environ["OPENAI_API_KEY"] = "sk-test-key-for-testing"
+# tiktoken would download its encoding on first use; tests estimate token counts
+os.environ.setdefault("CONTEXT_TOKENIZER", "estimate")
 
 # Import after setting env vars
+import main
+from answer_cache import AnswerCache
+from retrieval_cache import RetrievalCache
 from main import app, Config, initialize_app
 
 
+@pytest.fixture(autouse=True)
+def embedding_cache_path(monkeypatch, tmp_path):
+    """
+    Keep every test's embedding cache in its temporary directory.
+
+    Without this, a test reaching the real get_embeddings() would write
+    backend/embedding_cache.sqlite and share vectors with later runs.
+
+    Returns:
+        Path of the test's cache file
+    """
+    path = tmp_path / "embedding_cache.sqlite"
+    monkeypatch.setattr(Config, "EMBEDDING_CACHE_PATH", path)
+    return path
+
+
 @pytest.fixture
 def client():
     """
@@ -143,6 +166,47 @@ def temp_data_dir(tmp_path):
     return data_dir
 
 
+@pytest.fixture
+def offline_env(monkeypatch, tmp_path, temp_data_dir):
+    """
+    Prepare the application to initialize without any OpenAI calls.
+
+    Embeddings and the chat model are replaced with deterministic fakes and
+    the app indexes the temporary lessons in temp_data_dir. The module
+    globals start out uninitialized and are restored after the test.
+
+    Returns:
+        The main module, not yet initialized
+    """
+    embeddings = DeterministicFakeEmbedding(size=32)
+    fake_llm = FakeListChatModel(responses=["This is a fake tutor answer."])
+
+    monkeypatch.setattr(main, "get_embeddings", lambda api_key: embeddings)
+    monkeypatch.setattr(main, "get_llm", lambda api_key: fake_llm)
+    monkeypatch.setattr(main.Config, "DATA_PATH", temp_data_dir)
+    monkeypatch.setattr(main.Config, "INDEX_PATH", tmp_path / "index")
+    for name in (
+        "api_key", "documents", "vectorstore", "retriever",
+        "llm", "qa_chain", "answer_chain", "index_manifest", "index_version", "init_error",
+    ):
+        monkeypatch.setattr(main, name, None)
+    monkeypatch.setattr(main, "answer_cache", AnswerCache())
+    monkeypatch.setattr(main, "retrieval_cache", RetrievalCache())
+    return main
+
+
+@pytest.fixture
+def offline_app(offline_env):
+    """
+    Initialize the application without any OpenAI calls (see offline_env).
+
+    Returns:
+        The initialized main module
+    """
+    offline_env.initialize_app()
+    return offline_env
+
+
 @pytest.fixture
 def mock_openai_response():
     """
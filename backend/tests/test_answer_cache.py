@@ -0,0 +1,209 @@
+"""
+Tests for the semantic answer cache.
+
+Unit tests drive AnswerCache directly with hand-made embeddings; the
+endpoint tests check that /query serves repeats without calling the LLM.
+"""
+
+import pytest
+
+from answer_cache import AnswerCache, normalize_question, split_directive
+
+
+@pytest.fixture
+def cache():
+    """Cache with a low threshold so hand-made vectors are easy to reason about"""
+    return AnswerCache(max_entries=3, ttl_seconds=60, similarity_threshold=0.9)
+
+
+class TestNormalizeQuestion:
+    """Tests for question normalization"""
+
+    @pytest.mark.parametrize("question", [
+        "What is RAG?",
+        "what is rag",
+        "  What   is RAG ?? ",
+        "WHAT IS RAG.",
+    ])
+    def test_equivalent_questions_normalize_equal(self, question):
+        """
+        Case, whitespace and trailing punctuation are ignored.
+        """
+        assert normalize_question(question) == "what is rag"
+
+    def test_language_directive_is_kept(self):
+        """
+        The directive changes the answer language, so it stays in the key.
+        """
+        assert normalize_question("[Rispondi in italiano] What is RAG?") != normalize_question("What is RAG?")
+        assert split_directive("[Respond in English] Hi") == ("[respond in english]", "Hi")
+
+
+class TestAnswerCache:
+    """Tests for AnswerCache"""
+
+    def test_exact_hit(self, cache):
+        """
+        A normalized repeat is an exact hit.
+        """
+        cache.put("What is RAG?", None, {"answer": "RAG is..."}, "v1")
+
+        assert cache.get_exact("what is rag", "v1") == {"answer": "RAG is..."}
+        assert cache.stats()["exact_hits"] == 1
+
+    def test_semantic_hit_above_threshold(self, cache):
+        """
+        A near-duplicate embedding returns the cached answer.
+        """
+        cache.put("What is RAG?", [1.0, 0.0, 0.0], {"answer": "RAG is..."}, "v1")
+
+        assert cache.get_similar("Explain RAG", [0.95, 0.1, 0.0], "v1") == {"answer": "RAG is..."}
+        assert cache.get_similar("What is Docker?", [0.0, 1.0, 0.0], "v1") is None
+        stats = cache.stats()
+        assert stats["semantic_hits"] == 1
+        assert stats["misses"] == 1
+
+    def test_semantic_match_requires_same_directive(self, cache):
+        """
+        An English answer must never be served for an Italian request.
+        """
+        cache.put("[Respond in English] What is RAG?", [1.0, 0.0], {"answer": "English"}, "v1")
+
+        assert cache.get_similar("[Rispondi in italiano] What is RAG?", [1.0, 0.0], "v1") is None
+        assert cache.get_similar("[Respond in English] Explain RAG", [1.0, 0.0], "v1") == {"answer": "English"}
+
+    def test_scoped_answers_are_kept_apart(self, cache):
+        """
+        An answer restricted to some lessons is only served for that scope.
+        """
+        cache.put("What is RAG?", [1.0, 0.0], {"answer": "lesson 03 only"}, "v1", scope="03_rag")
+
+        assert cache.get_exact("What is RAG?", "v1") is None
+        assert cache.get_similar("What is RAG?", [1.0, 0.0], "v1") is None
+        assert cache.get_exact("What is RAG?", "v1", scope="03_rag") == {"answer": "lesson 03 only"}
+
+    def test_ttl_expiry(self, cache, monkeypatch):
+        """
+        Entries older than the TTL are not served.
+        """
+        import answer_cache
+
+        now = [1000.0]
+        monkeypatch.setattr(answer_cache.time, "time", lambda: now[0])
+        cache.put("What is RAG?", [1.0, 0.0], {"answer": "old"}, "v1")
+
+        now[0] += 61
+
+        assert cache.get_exact("What is RAG?", "v1") is None
+        assert cache.get_similar("What is RAG?", [1.0, 0.0], "v1") is None
+
+    def test_lru_eviction(self, cache):
+        """
+        Beyond max_entries the least recently used entry is evicted.
+        """
+        for i in range(3):
+            cache.put(f"question {i}", None, {"answer": str(i)}, "v1")
+        cache.get_exact("question 0", "v1")  # Touch 0 so 1 becomes the oldest
+        cache.put("question 3", None, {"answer": "3"}, "v1")
+
+        assert cache.get_exact("question 1", "v1") is None
+        assert cache.get_exact("question 0", "v1") == {"answer": "0"}
+        assert cache.stats()["entries"] == 3
+
+    def test_index_version_change_invalidates(self, cache):
+        """
+        Answers from a previous index version are dropped.
+        """
+        cache.put("What is RAG?", [1.0, 0.0], {"answer": "old"}, "v1")
+
+        cache.set_version("v2")
+
+        assert cache.get_exact("What is RAG?", "v2") is None
+        assert cache.stats()["entries"] == 0
+
+    def test_outdated_version_is_ignored(self, cache):
+        """
+        Late answers of requests on the previous index neither wipe nor join the new version's cache.
+        """
+        cache.set_version("v2")
+        cache.put("What is RAG?", [1.0, 0.0], {"answer": "new"}, "v2")
+
+        cache.put("What is FAISS?", [0.0, 1.0], {"answer": "old"}, "v1")
+
+        assert cache.get_exact("What is RAG?", "v1") is None
+        assert cache.get_similar("What is FAISS?", [0.0, 1.0], "v1") is None
+        assert cache.get_exact("What is RAG?", "v2") == {"answer": "new"}
+        assert cache.stats()["entries"] == 1
+
+
+class TestQueryUsesAnswerCache:
+    """Tests for the answer cache in front of the QA chain"""
+
+    @pytest.fixture
+    def llm_calls(self, offline_app, monkeypatch):
+        """Count calls reaching the QA chain"""
+        calls = []
+        chain = offline_app.qa_chain
+
+        class CountingChain:
+            async def ainvoke(self, question, config=None):
+                calls.append(question)
+                return await chain.ainvoke(question, config=config)
+
+        monkeypatch.setattr(offline_app, "qa_chain", CountingChain())
+        return calls
+
+    def test_repeated_question_skips_chain(self, client, llm_calls):
+        """
+        The second identical (normalized) question is served from cache.
+        """
+        first = client.post("/query", json={"question": "What is AI?"})
+        second = client.post("/query", json={"question": "what is ai"})
+
+        assert first.status_code == second.status_code == 200
+        assert second.json()["answer"] == first.json()["answer"]
+        assert len(llm_calls) == 1
+
+    def test_reload_invalidates_cached_answers(self, client, llm_calls, offline_app, temp_data_dir):
+        """
+        A lesson change bumps the index version and drops cached answers.
+        """
+        client.post("/query", json={"question": "What is AI?"})
+        old_version = offline_app.index_version
+        assert offline_app.answer_cache.get_exact("What is AI?", old_version) is not None
+
+        (temp_data_dir / "doc1.txt").write_text("AI lesson rewritten.")
+        offline_app.reload_lessons()
+
+        assert offline_app.index_version != old_version
+        assert offline_app.answer_cache.get_exact("What is AI?", offline_app.index_version) is None
+
+    def test_cache_can_be_disabled(self, client, llm_calls, monkeypatch, offline_app):
+        """
+        With the cache disabled every request runs the chain.
+        """
+        monkeypatch.setattr(offline_app.Config, "ANSWER_CACHE_ENABLED", False)
+
+        client.post("/query", json={"question": "What is AI?"})
+        client.post("/query", json={"question": "What is AI?"})
+
+        assert len(llm_calls) == 2
+
+    async def test_lookup_embeds_with_the_request_embeddings(self, offline_app, monkeypatch):
+        """
+        The question is embedded with the embeddings the request captured, not the live vector store's.
+        """
+        captured = offline_app.vectorstore.embedding_function
+
+        class ReloadedEmbeddings:
+            async def aembed_query(self, text):
+                raise AssertionError("embedded with the reloaded store")
+
+        monkeypatch.setattr(offline_app.vectorstore, "embedding_function", ReloadedEmbeddings())
+
+        cached, embedding = await offline_app.lookup_cached_answer(
+            "What is AI?", captured, offline_app.index_version
+        )
+
+        assert cached is None
+        assert embedding == await captured.aembed_query("What is AI?")
@@ -5,8 +5,21 @@ These tests verify that the FastAPI endpoints work correctly,
 handle valid/invalid inputs properly, and return expected responses.
 """
 
+import json
+import threading
+
 import pytest
 from fastapi import status
+from fastapi.testclient import TestClient
+
+
+def parse_sse(body: str):
+    """Split an SSE response body into (event, data) tuples"""
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
 
 
 class TestHealthEndpoints:
@@ -89,6 +102,95 @@ class TestHealthEndpoints:
         assert data["status"] == "healthy"
 
 
+class TestReadiness:
+    """Tests for background initialization and the /ready endpoint"""
+
+    @pytest.fixture
+    def blocked_startup(self, offline_env, monkeypatch):
+        """
+        Make startup initialization wait until the returned event is set.
+        """
+        release, finished = threading.Event(), threading.Event()
+        original = offline_env.initialize_app
+
+        def initialize_app():
+            release.wait(10)
+            try:
+                original()
+            finally:
+                finished.set()
+
+        monkeypatch.setattr(offline_env, "initialize_app", initialize_app)
+        monkeypatch.setattr(offline_env.app.state, "initialization", None, raising=False)
+        yield release
+        # Don't let the initialization thread outlive the patched globals
+        release.set()
+        finished.wait(10)
+
+    def test_not_ready_before_initialization(self, offline_env, client):
+        response = client.get("/ready")
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.headers["Retry-After"] == str(offline_env.Config.READY_RETRY_AFTER_SECONDS)
+        assert response.json()["status"] == "starting"
+        assert not response.json()["index_loaded"]
+        assert "initializing" in client.get("/health").json()["message"].lower()
+
+    def test_ready_reports_index_version(self, offline_app, client):
+        response = client.get("/ready")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {
+            "status": "ready",
+            "index_loaded": True,
+            "chain_built": True,
+            "index_version": offline_app.index_version,
+            "documents_loaded": len(offline_app.documents),
+            "error": None,
+        }
+
+    def test_server_answers_while_initializing(self, offline_env, blocked_startup):
+        """
+        Liveness answers during startup; a query arriving early waits for the index.
+        """
+        with TestClient(offline_env.app) as client:
+            assert client.get("/health").status_code == status.HTTP_200_OK
+            assert client.get("/ready").status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+
+            blocked_startup.set()
+            response = client.post("/query", json={"question": "Which topics are covered?"})
+
+            assert response.status_code == status.HTTP_200_OK
+            assert client.get("/ready").status_code == status.HTTP_200_OK
+
+    def test_early_query_wait_is_bounded(self, offline_env, blocked_startup, monkeypatch):
+        monkeypatch.setattr(offline_env.Config, "READY_WAIT_SECONDS", 0.05)
+
+        with TestClient(offline_env.app) as client:
+            response = client.post("/query", json={"question": "Which topics are covered?"})
+            blocked_startup.set()
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert "Retry-After" in response.headers
+
+    def test_failed_initialization_is_reported(self, offline_env, monkeypatch):
+        def fail():
+            raise ValueError("OPENAI_API_KEY not found")
+
+        monkeypatch.setattr(offline_env, "initialize_app", fail)
+        monkeypatch.setattr(offline_env.app.state, "initialization", None, raising=False)
+
+        with TestClient(offline_env.app) as client:
+            # Waits for the initialization to finish (and fail)
+            query = client.post("/query", json={"question": "Which topics are covered?"})
+            response = client.get("/ready")
+
+        assert query.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.json()["status"] == "failed"
+        assert "OPENAI_API_KEY" in response.json()["error"]
+
+
 class TestQueryEndpoint:
     """Tests for the /query endpoint"""
 
@@ -173,10 +275,12 @@ class TestQueryEndpoint:
         response = client.post("/query", json={"question": max_length_question})
 
         # Should accept it (might fail at LLM level, but validation should pass)
-        # We accept either 200 (success) or 500 (LLM error) but not 422 (validation error)
+        # We accept 200 (success), 500 (LLM error) or 503 (index not loaded)
+        # but not 422 (validation error)
         assert response.status_code in [
             status.HTTP_200_OK,
-            status.HTTP_500_INTERNAL_SERVER_ERROR
+            status.HTTP_500_INTERNAL_SERVER_ERROR,
+            status.HTTP_503_SERVICE_UNAVAILABLE
         ]
 
     @pytest.mark.integration
@@ -220,7 +324,8 @@ class TestQueryEndpoint:
         # Should not be rejected for validation (might fail if no API key in CI)
         assert response.status_code in [
             status.HTTP_200_OK,
-            status.HTTP_500_INTERNAL_SERVER_ERROR
+            status.HTTP_500_INTERNAL_SERVER_ERROR,
+            status.HTTP_503_SERVICE_UNAVAILABLE
         ]
 
     def test_query_with_special_characters(self, client):
@@ -241,9 +346,255 @@ class TestQueryEndpoint:
             assert response.status_code in [
                 status.HTTP_200_OK,
                 status.HTTP_500_INTERNAL_SERVER_ERROR,
+                status.HTTP_503_SERVICE_UNAVAILABLE,
             ]
 
 
+class TestQueryStreamEndpoint:
+    """Tests for the /query/stream SSE endpoint"""
+
+    def test_stream_returns_event_stream(self, offline_app, client, sample_query):
+        """
+        The endpoint should answer with text/event-stream.
+        """
+        response = client.post("/query/stream", json=sample_query)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/event-stream")
+
+    def test_first_event_carries_context(self, offline_app, client, sample_query):
+        """
+        The context metadata must arrive before any token.
+        """
+        response = client.post("/query/stream", json=sample_query)
+        events = parse_sse(response.text)
+
+        event, data = events[0]
+        assert event == "context"
+        assert data["question"] == sample_query["question"]
+        assert len(data["sources"]) > 0
+        assert all("source" in source for source in data["sources"])
+
+    def test_tokens_reassemble_the_answer(self, offline_app, client, sample_query):
+        """
+        Concatenated token events should equal the full answer.
+        """
+        response = client.post("/query/stream", json=sample_query)
+        events = parse_sse(response.text)
+
+        tokens = [data["text"] for event, data in events if event == "token"]
+        assert len(tokens) > 1
+        assert "".join(tokens) == "This is a fake tutor answer."
+        assert events[-1] == ("done", {"answer_length": len("This is a fake tutor answer.")})
+
+    def test_stream_reports_llm_errors_as_events(self, offline_app, client, sample_query, monkeypatch):
+        """
+        A failure mid-generation becomes an error event, not a broken stream.
+        """
+        from langchain_core.language_models import FakeListChatModel
+
+        failing_llm = FakeListChatModel(responses=["partial answer"], error_on_chunk_number=3)
+        monkeypatch.setattr(offline_app, "answer_chain", offline_app.build_answer_chain(failing_llm))
+
+        response = client.post("/query/stream", json=sample_query)
+        events = parse_sse(response.text)
+
+        assert events[0][0] == "context"
+        assert events[-1][0] == "error"
+
+    def test_stream_validates_question(self, client):
+        """
+        Validation is shared with /query.
+        """
+        response = client.post("/query/stream", json={"question": "   "})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+class TestLessonScopedQueries:
+    """Tests for lesson_ids/level filters on /query and /query/stream"""
+
+    def test_stream_searches_only_requested_lessons(self, offline_app, client):
+        """
+        Every retrieved chunk comes from the requested lesson.
+        """
+        response = client.post(
+            "/query/stream",
+            json={"question": "Artificial Intelligence is transforming technology.", "lesson_ids": ["doc2"]}
+        )
+
+        context = parse_sse(response.text)[0][1]
+        assert {source["lesson_id"] for source in context["sources"]} == {"doc2"}
+
+    def test_level_filter(self, offline_app, client, monkeypatch):
+        """
+        A level resolves to its lessons through Config.LESSON_LEVELS.
+        """
+        monkeypatch.setattr(offline_app.Config, "LESSON_LEVELS", {"beginner": ["doc1", "doc3"]})
+
+        response = client.post("/query/stream", json={"question": "Which topics?", "level": "Beginner"})
+
+        context = parse_sse(response.text)[0][1]
+        assert {source["lesson_id"] for source in context["sources"]} == {"doc1", "doc3"}
+
+    def test_query_accepts_filters(self, offline_app, client):
+        """
+        /query answers scoped questions too.
+        """
+        response = client.post("/query", json={"question": "What is AI?", "lesson_ids": ["doc1"]})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json()["answer"] == "This is a fake tutor answer."
+
+    def test_unknown_lesson_is_rejected(self, offline_app, client):
+        """
+        Filters matching no indexed lesson are a client error.
+        """
+        response = client.post("/query", json={"question": "What is AI?", "lesson_ids": ["99"]})
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_unknown_level_fails_validation(self, client):
+        """
+        Levels are validated against Config.LESSON_LEVELS.
+        """
+        response = client.post("/query", json={"question": "What is AI?", "level": "expert"})
+
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+    def test_lesson_number_and_level_resolution(self, offline_app):
+        """
+        Lessons match by full id or number; level and ids intersect.
+        """
+        available = ["03_rag_architecture", "04_vector_databases", "12_apis_explained_simply", "intro-ai"]
+
+        resolve = offline_app.resolve_lesson_scope
+        assert resolve(None, None, available) is None
+        assert resolve(["03", "intro-ai"], None, available) == ["03_rag_architecture", "intro-ai"]
+        assert resolve(None, "intermediate", available) == ["03_rag_architecture", "04_vector_databases"]
+        assert resolve(["03", "12"], "beginner", available) == ["12_apis_explained_simply"]
+
+
+class TestQueryBatchEndpoint:
+    """Tests for the /query/batch endpoint"""
+
+    def test_batch_returns_results_in_order(self, offline_app, client):
+        """
+        Each question gets an answer, in input order.
+        """
+        questions = ["What is AI?", "What is ML?", "What is deep learning?"]
+
+        response = client.post("/query/batch", json={"questions": questions})
+
+        assert response.status_code == status.HTTP_200_OK
+        results = response.json()["results"]
+        assert [r["question"] for r in results] == questions
+        assert all(r["answer"] == "This is a fake tutor answer." for r in results)
+        assert all(r["error"] is None for r in results)
+
+    def test_batch_embeds_questions_in_one_request(self, offline_app, client, monkeypatch):
+        """
+        All questions should be embedded with a single embeddings call.
+        """
+        embeddings = offline_app.vectorstore.embedding_function
+        calls = []
+        original = type(embeddings).aembed_documents
+
+        async def counting_aembed_documents(self, texts):
+            calls.append(list(texts))
+            return await original(self, texts)
+
+        monkeypatch.setattr(type(embeddings), "aembed_documents", counting_aembed_documents)
+        questions = [f"Question number {i}" for i in range(10)]
+
+        client.post("/query/batch", json={"questions": questions})
+
+        assert calls == [questions]
+
+    @pytest.mark.parametrize("mode", ["vector", "hybrid"])
+    def test_batch_retrieves_like_query(self, offline_env, client, monkeypatch, mode):
+        """
+        Batch items get the same context as /query (same retriever pipeline).
+        """
+        monkeypatch.setattr(offline_env.Config, "RETRIEVAL_MODE", mode)
+        monkeypatch.setattr(offline_env.Config, "RERANKER", "lexical")
+        monkeypatch.setattr(offline_env.Config, "RETRIEVAL_CACHE_ENABLED", False)
+        offline_env.initialize_app()
+        contexts = {}
+
+        class RecordingChain:
+            async def ainvoke(self, inputs):
+                contexts[inputs["question"]] = inputs["context"]
+                return "answer"
+
+        monkeypatch.setattr(offline_env, "answer_chain", RecordingChain())
+        questions = ["[Respond in English] What is deep learning?", "Which topics are covered?"]
+
+        client.post("/query/batch", json={"questions": questions})
+
+        for question in questions:
+            assert contexts[question] == offline_env.format_docs(offline_env.retriever.invoke(question))
+
+    def test_batch_reports_per_item_errors(self, offline_app, client, monkeypatch):
+        """
+        One failing question must not fail the whole batch.
+        """
+        chain = offline_app.answer_chain
+
+        class FlakyChain:
+            async def ainvoke(self, inputs):
+                if "fail" in inputs["question"]:
+                    raise RuntimeError("LLM unavailable")
+                return await chain.ainvoke(inputs)
+
+        monkeypatch.setattr(offline_app, "answer_chain", FlakyChain())
+
+        response = client.post("/query/batch", json={"questions": ["ok one", "please fail", "ok two"]})
+
+        results = response.json()["results"]
+        assert response.status_code == status.HTTP_200_OK
+        assert results[0]["answer"] and results[2]["answer"]
+        assert results[1]["answer"] is None
+        assert "LLM unavailable" in results[1]["error"]
+
+    def test_batch_bounds_llm_concurrency(self, offline_app, client, monkeypatch):
+        """
+        No more than BATCH_MAX_CONCURRENCY LLM calls run at once.
+        """
+        import asyncio
+
+        in_flight = []
+        peak = []
+
+        class SlowChain:
+            async def ainvoke(self, inputs):
+                in_flight.append(1)
+                peak.append(len(in_flight))
+                await asyncio.sleep(0.01)
+                in_flight.pop()
+                return "answer"
+
+        monkeypatch.setattr(offline_app, "answer_chain", SlowChain())
+        monkeypatch.setattr(offline_app.Config, "BATCH_MAX_CONCURRENCY", 3)
+
+        client.post("/query/batch", json={"questions": [f"q{i}" for i in range(12)]})
+
+        assert max(peak) == 3
+
+    @pytest.mark.parametrize("payload", [
+        {"questions": []},
+        {"questions": ["fine", "   "]},
+        {"questions": ["x" * 1001]},
+        {"questions": ["q"] * 101},
+        {},
+    ])
+    def test_batch_validation(self, client, payload):
+        """
+        Invalid batches are rejected before any work is done.
+        """
+        response = client.post("/query/batch", json=payload)
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
 class TestAPIDocumentation:
     """Tests for API documentation endpoints"""
 
@@ -0,0 +1,58 @@
+"""
+Smoke test for the offline benchmark suite.
+
+Runs every suite on a tiny corpus so the benchmarks keep working as the code
+they measure changes.
+"""
+
+import json
+
+import pytest
+
+from benchmarks.__main__ import main as run_benchmarks
+from benchmarks.fakes import HashEmbeddings
+
+
+def test_hash_embeddings_are_deterministic():
+    """
+    The same text always maps to the same unit vector.
+    """
+    embeddings = HashEmbeddings(size=16)
+
+    first, other = embeddings.embed_documents(["What is RAG?", "What is Docker?"])
+
+    assert embeddings.embed_query("What is RAG?") == first
+    assert first != other
+    assert sum(x * x for x in first) == pytest.approx(1.0, rel=1e-5)
+
+
+@pytest.mark.slow
+def test_suite_writes_json_report(tmp_path):
+    """
+    A tiny run produces a JSON report with every component measured.
+    """
+    out = tmp_path / "results.json"
+
+    run_benchmarks(["--sizes", "50", "--queries", "5", "--chain-queries", "2", "--dim", "16", "--workers", "2", "--out", str(out)])
+
+    report = json.loads(out.read_text())
+    assert report["meta"]["options"]["sizes"] == [50]
+    results = report["results"]["components"]["50"]
+    assert set(results) == {"load", "build", "retrieval", "format_docs", "startup", "query"}
+    assert results["load"]["chunks"] == results["build"]["vectors"] == 50
+    modes = report["results"]["retrieval_modes"]
+    assert set(modes["quality"]) == set(modes["latency"]["50"]) == {"vector", "lexical", "hybrid", "hybrid_fast_path"}
+    indexes = report["results"]["ann"]["50"]
+    assert set(indexes) == {"flat", "ivf_flat", "hnsw", "ivf_pq"}
+    assert indexes["flat"]["searches"]["exact"]["recall_at_4"] == 1.0
+    memory = report["results"]["memory"]["50"]
+    assert set(memory) == {"in_memory", "mmap"}
+    assert len(memory["mmap"]["workers"]) == 2
+    assert set(memory["mmap"]["mean"]) == {"rss_mb", "pss_mb", "private_mb", "init_private_mb"}
+    mmr = report["results"]["mmr"]
+    assert set(mmr["quality"]) == {"search", "mmr_fetch_k=10", "mmr_fetch_k=20", "mmr_fetch_k=50"}
+    assert "added_ms" in mmr["latency"]["50"]["mmr_fetch_k=20"]
+    assert set(mmr["latency"]["50"]["rerank"]) == {"fetch_k=10", "fetch_k=20", "fetch_k=50"}
+    splitters = report["results"]["splitters"]
+    assert set(splitters) == {"character", "structured"}
+    assert set(splitters["structured"]) == {"chunks", "index", "prompt", "quality"}
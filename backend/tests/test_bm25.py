@@ -0,0 +1,178 @@
+"""
+Tests for BM25 retrieval and the hybrid retriever modes.
+"""
+
+import threading
+
+import pytest
+
+from bm25 import BM25Index, reciprocal_rank_fusion, tokenize
+
+TEXTS = [
+    "FAISS is a library for efficient similarity search of dense vectors.",
+    "Pinecone is a managed vector database service.",
+    "Docker images are built from a Dockerfile with multi-stage builds.",
+    "HTTP methods include GET, POST, PUT and DELETE.",
+]
+
+
+@pytest.fixture
+def index():
+    return BM25Index(TEXTS)
+
+
+class TestBM25Index:
+    """Tests for the inverted index"""
+
+    def test_tokenize_is_case_insensitive(self):
+        assert tokenize("FAISS vs Pinecone!") == ["faiss", "vs", "pinecone"]
+
+    def test_rare_term_ranks_its_chunk_first(self, index):
+        """
+        A chunk containing the query's distinctive term wins.
+        """
+        hits = index.search("Dockerfile multi-stage", k=4)
+
+        assert hits[0][0] == 2
+        assert all(score > 0 for _, score in hits)
+
+    def test_chunks_without_query_terms_are_not_returned(self, index):
+        """
+        Only chunks sharing a term with the query are candidates.
+        """
+        hits = index.search("Pinecone", k=4)
+
+        assert [i for i, _ in hits] == [1]
+        assert index.search("transformers", k=4) == []
+
+    def test_ranges_restrict_candidates(self, index):
+        """
+        Scoped search only considers the given FAISS id ranges.
+        """
+        hits = index.search("vector database search", k=4, ranges=[(0, 1), (3, 4)])
+
+        assert {i for i, _ in hits} <= {0, 3}
+        assert hits[0][0] == 0
+
+    def test_coverage_separates_keyword_queries(self, index):
+        """
+        A chunk matching every query term has high coverage; unknown words lower it.
+        """
+        keyword = index.search("Dockerfile multi-stage", k=1)[0][0]
+        mixed = index.search("how to containerize apps with a Dockerfile", k=1)[0][0]
+
+        assert index.coverage("Dockerfile multi-stage", keyword) >= 0.8
+        assert index.coverage("how to containerize apps with a Dockerfile", mixed) < 0.8
+
+    def test_stop_words_dont_count_as_coverage(self, index):
+        """
+        A generic question is judged by its topic words only.
+        """
+        assert index.coverage("What is a library?", 0) == index.coverage("library", 0)
+        assert index.coverage("What is it?", 0) == 0.0
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    """
+    An item ranked by both lists beats items ranked first by only one.
+    """
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["d", "b", "e"]])
+
+    assert fused[0] == ("b", pytest.approx(2 / 62))
+    assert {item for item, _ in fused} == {"a", "b", "c", "d", "e"}
+
+
+class TestRetrieverModes:
+    """Tests for vector, lexical and hybrid retrieval in the app retriever"""
+
+    @pytest.fixture
+    def embed_calls(self, offline_app, monkeypatch):
+        """Count query embeddings"""
+        calls = []
+        embeddings = offline_app.vectorstore.embedding_function
+        original = embeddings.embed_query
+        monkeypatch.setattr(
+            type(embeddings), "embed_query",
+            lambda self, text: calls.append(text) or original(text)
+        )
+        return calls
+
+    @pytest.fixture
+    def fast_path_retriever(self, offline_app, monkeypatch):
+        """Hybrid retriever with the opt-in lexical fast path (answer cache off)"""
+        monkeypatch.setattr(offline_app.Config, "ANSWER_CACHE_ENABLED", False)
+        monkeypatch.setattr(offline_app.Config, "LEXICAL_FAST_PATH_COVERAGE", 0.8)
+        return offline_app.build_retriever(offline_app.vectorstore)
+
+    def test_keyword_question_skips_embedding(self, fast_path_retriever, embed_calls):
+        """
+        With the fast path on, a decisive BM25 match is served without embedding.
+        """
+        docs = fast_path_retriever.invoke("deep learning neural networks layers")
+
+        assert embed_calls == []
+        assert docs[0].metadata["source"] == "doc3.txt"
+
+    def test_generic_question_is_not_decisive(self, fast_path_retriever, embed_calls):
+        """
+        Stop words and a partly matched topic don't make a match decisive.
+        """
+        fast_path_retriever.invoke("How does learning from neural networks or from data work?")
+
+        assert len(embed_calls) == 1
+
+    def test_runner_up_margin(self, fast_path_retriever, embed_calls):
+        """
+        A best match that doesn't beat the runner-up by the margin goes through fusion.
+        """
+        fast_path_retriever.default.fast_path_margin = 100.0
+
+        fast_path_retriever.invoke("deep learning neural networks layers")
+
+        assert embed_calls == ["deep learning neural networks layers"]
+
+    def test_fast_path_is_off_by_default(self, offline_app, embed_calls):
+        offline_app.retriever.invoke("deep learning neural networks layers")
+
+        assert embed_calls == ["deep learning neural networks layers"]
+
+    def test_answer_cache_disables_the_fast_path(self, offline_app, monkeypatch):
+        monkeypatch.setattr(offline_app.Config, "LEXICAL_FAST_PATH_COVERAGE", 0.8)
+
+        retriever = offline_app.build_retriever(offline_app.vectorstore)
+
+        assert retriever.default.fast_path_coverage is None
+
+    def test_paraphrase_falls_back_to_fusion(self, offline_app, embed_calls):
+        """
+        Without a decisive lexical match the question is embedded and fused.
+        """
+        docs = offline_app.retriever.invoke("Which topics are covered?")
+
+        assert embed_calls == ["Which topics are covered?"]
+        assert len(docs) == 3
+
+    def test_lexical_mode_never_embeds(self, offline_app, embed_calls):
+        config = {"configurable": {"retrieval_mode": "lexical"}}
+
+        docs = offline_app.retriever.invoke("What is machine learning?", config=config)
+
+        assert embed_calls == []
+        assert docs[0].metadata["source"] == "doc2.txt"
+
+    async def test_async_bm25_runs_off_the_event_loop(self, offline_app, monkeypatch):
+        bm25 = offline_app.retriever.default.bm25
+        search = bm25.search
+        threads = []
+        monkeypatch.setattr(bm25, "search", lambda *args: threads.append(threading.get_ident()) or search(*args))
+
+        await offline_app.retriever.ainvoke("What is machine learning?")
+
+        assert threads and threading.get_ident() not in threads
+
+    def test_vector_mode_always_embeds(self, offline_app, embed_calls):
+        config = {"configurable": {"retrieval_mode": "vector"}}
+
+        offline_app.retriever.invoke("deep learning neural networks layers", config=config)
+
+        assert embed_calls == ["deep learning neural networks layers"]
@@ -0,0 +1,89 @@
+"""
+Tests that /query does not block the event loop.
+
+The fake chat model below sleeps with time.sleep() on the sync path and
+asyncio.sleep() on the async path. If the endpoint ever went back to the
+synchronous chain, concurrent requests would serialize and these tests
+would fail.
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+LLM_LATENCY = 0.3
+
+
+class SlowFakeChatModel(BaseChatModel):
+    """Fake chat model with artificial latency"""
+
+    latency: float = LLM_LATENCY
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake-chat-model"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="Slow answer."))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="Slow answer."))])
+
+
+@pytest.fixture
+def slow_app(offline_app, monkeypatch):
+    """Offline app whose QA chain uses the slow fake LLM"""
+    slow_llm = SlowFakeChatModel()
+    monkeypatch.setattr(offline_app, "llm", slow_llm)
+    monkeypatch.setattr(offline_app, "qa_chain", offline_app.build_qa_chain(offline_app.retriever, slow_llm))
+    return offline_app
+
+
+@pytest.fixture
+async def async_client(slow_app):
+    """Async HTTP client talking to the app in-process"""
+    transport = httpx.ASGITransport(app=slow_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        yield client
+
+
+async def test_concurrent_queries_run_in_parallel(async_client):
+    """
+    N concurrent queries should take about one LLM latency, not N of them.
+    """
+    n_requests = 8
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[
+        async_client.post("/query", json={"question": f"What is AI? ({i})"})
+        for i in range(n_requests)
+    ])
+    elapsed = time.perf_counter() - start
+
+    assert all(r.status_code == 200 for r in responses)
+    assert all(r.json()["answer"] == "Slow answer." for r in responses)
+    # Serialized execution would take n_requests * LLM_LATENCY
+    assert elapsed < n_requests * LLM_LATENCY / 2
+
+
+async def test_health_stays_responsive_during_query(async_client):
+    """
+    /health must answer while a slow query is in flight.
+    """
+    query = asyncio.create_task(async_client.post("/query", json={"question": "What is RAG?"}))
+    await asyncio.sleep(LLM_LATENCY / 4)
+
+    start = time.perf_counter()
+    health = await async_client.get("/health")
+    health_latency = time.perf_counter() - start
+
+    assert health.status_code == 200
+    assert not query.done()
+    assert health_latency < LLM_LATENCY / 2
+    assert (await query).status_code == 200
@@ -0,0 +1,155 @@
+"""
+Tests for assembling retrieved chunks into the prompt context.
+"""
+
+import sys
+import types
+
+import pytest
+from langchain_core.documents import Document
+
+import context_assembly
+import main
+from context_assembly import assemble_context, count_tokens, merge_chunks
+
+LESSON = (
+    "Retrieval-augmented generation grounds answers in documents. "
+    "The retriever finds relevant chunks for every question. "
+    "The chunks are added to the prompt as context. "
+    "The model then answers using only that context."
+)
+
+
+def chunk(source: str, index: int, start: int, end: int, text: str = LESSON) -> Document:
+    """A chunk of text[start:end] with the metadata split_lesson() records"""
+    return Document(
+        id=f"{source}:{index}",
+        page_content=text[start:end],
+        metadata={
+            "source": source,
+            "chunk": index,
+            "start_index": start,
+            "end_index": end,
+            "tokens": count_tokens(text[start:end]),
+        }
+    )
+
+
+class TestMergeChunks:
+    """Tests for merging chunks of the same lesson"""
+
+    def test_overlapping_chunks_are_merged_in_lesson_order(self):
+        first, second = chunk("rag.txt", 0, 0, 120), chunk("rag.txt", 1, 100, len(LESSON))
+
+        passages, overlap = merge_chunks([second, first])
+
+        assert [p.text for p in passages] == [LESSON]
+        assert passages[0].rank == 0
+        assert overlap > 0
+        assert passages[0].tokens == first.metadata["tokens"] + second.metadata["tokens"] - overlap
+
+    def test_consecutive_chunks_are_joined_across_the_separator(self):
+        text = "First paragraph of the lesson.\n\nSecond paragraph of the lesson."
+        passages, _ = merge_chunks([chunk("a.txt", 0, 0, 30, text), chunk("a.txt", 1, 32, len(text), text)])
+
+        assert [p.text for p in passages] == [text]
+
+    def test_other_lessons_and_distant_chunks_stay_apart(self):
+        docs = [chunk("a.txt", 0, 0, 60), chunk("b.txt", 0, 0, 60), chunk("a.txt", 5, 150, len(LESSON))]
+
+        passages, overlap = merge_chunks(docs)
+
+        assert len(passages) == 3
+        assert overlap == 0
+
+    def test_contained_and_repeated_chunks_add_nothing(self):
+        passages, _ = merge_chunks([chunk("a.txt", 0, 0, 120), chunk("a.txt", 0, 0, 120), chunk("a.txt", 1, 20, 80)])
+
+        assert [p.text for p in passages] == [LESSON[:120]]
+
+
+class TestAssembleContext:
+    """Tests for assemble_context"""
+
+    def test_near_duplicate_passages_are_dropped(self):
+        copy = Document(page_content="Note: " + LESSON.lower(), metadata={"source": "copy.txt"})
+        other = Document(page_content="Embeddings map text to vectors.", metadata={"source": "emb.txt"})
+
+        context = assemble_context([chunk("rag.txt", 0, 0, len(LESSON)), copy, other])
+
+        assert context == LESSON + "\n\n" + other.page_content
+
+    def test_budget_skips_passages_that_do_not_fit(self):
+        long = chunk("rag.txt", 0, 0, len(LESSON))
+        short = Document(page_content="Short note.", metadata={"source": "note.txt"})
+        budget = long.metadata["tokens"] + 5
+
+        context = assemble_context(
+            [long, Document(page_content="x " * 100, metadata={"source": "big.txt"}), short],
+            token_budget=budget
+        )
+
+        assert context == LESSON + "\n\nShort note."
+
+    def test_best_passage_is_truncated_when_nothing_fits(self):
+        context = assemble_context([chunk("rag.txt", 0, 0, len(LESSON))], token_budget=10)
+
+        assert 0 < count_tokens(context) <= 10
+        assert LESSON.startswith(context)
+
+    def test_without_metadata_chunks_are_joined_as_before(self):
+        docs = [Document(page_content=text) for text in ("First document", "Second document")]
+
+        assert assemble_context(docs) == "First document\n\nSecond document"
+
+
+def test_lesson_chunks_carry_token_counts(monkeypatch):
+    monkeypatch.setattr(main.Config, "CHUNK_SIZE", 60)
+    monkeypatch.setattr(main.Config, "CHUNK_OVERLAP", 20)
+    text = "\n\n".join(f"Paragraph {i} about vector search." for i in range(6))
+
+    docs = main.split_lesson(text, "search.txt")
+
+    assert all(doc.metadata["tokens"] == count_tokens(doc.page_content) for doc in docs)
+    # Retrieving every chunk reproduces the lesson without repeating the overlap
+    assert main.format_docs(list(reversed(docs))) == text
+
+
+class TestTokenizerLoading:
+    """Tests for loading the tokenizer up front"""
+
+    @pytest.fixture
+    def fake_tiktoken(self, monkeypatch):
+        """Install a tiktoken whose encodings must be downloaded (and can't be)"""
+        downloads = []
+
+        def get_encoding(name):
+            downloads.append(name)
+            raise ConnectionError("no network")
+
+        monkeypatch.setitem(sys.modules, "tiktoken", types.SimpleNamespace(get_encoding=get_encoding))
+        context_assembly._encoding.cache_clear()
+        yield downloads
+        context_assembly._encoding.cache_clear()
+
+    def test_unavailable_tokenizer_fails_startup(self, fake_tiktoken, monkeypatch, temp_data_dir):
+        monkeypatch.setattr(main.Config, "CONTEXT_TOKENIZER", "o200k_base")
+        monkeypatch.setattr(main.Config, "DATA_PATH", temp_data_dir)
+
+        with pytest.raises(RuntimeError, match="CONTEXT_TOKENIZER=estimate"):
+            main.current_manifest()
+
+    def test_loaders_dont_each_try_the_download(self, fake_tiktoken, monkeypatch, temp_data_dir):
+        monkeypatch.setattr(main.Config, "CONTEXT_TOKENIZER", "o200k_base")
+
+        with pytest.raises(RuntimeError):
+            main.load_lesson_files(sorted(temp_data_dir.glob("*.txt")))
+
+        assert fake_tiktoken == ["o200k_base"]
+
+    def test_estimate_needs_no_tiktoken(self, fake_tiktoken, monkeypatch, temp_data_dir):
+        monkeypatch.setattr(main.Config, "CONTEXT_TOKENIZER", "estimate")
+        monkeypatch.setattr(main.Config, "DATA_PATH", temp_data_dir)
+
+        assert main.current_manifest()["tokenizer"] == "estimate"
+        assert fake_tiktoken == []
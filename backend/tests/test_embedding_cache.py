@@ -0,0 +1,222 @@
+"""
+Tests for the persistent embedding cache.
+
+A counting fake embeddings client records which texts actually reach the
+"API", so we can check that only cache misses are embedded.
+"""
+
+import sqlite3
+
+import numpy as np
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from embedding_cache import CachedEmbeddings, text_hash
+
+
+class CountingEmbedding(DeterministicFakeEmbedding):
+    """Fake embeddings that remember every text sent for embedding"""
+
+    embedded: list = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def underlying():
+    """Fresh counting embeddings for each test"""
+    return CountingEmbedding(size=16, embedded=[])
+
+
+@pytest.fixture
+def cache(tmp_path, underlying):
+    """Cache backed by a temporary SQLite file"""
+    cached = CachedEmbeddings(underlying, tmp_path / "cache.sqlite", model="fake")
+    yield cached
+    cached.close()
+
+
+class TestCachedEmbeddings:
+    """Tests for CachedEmbeddings"""
+
+    def test_second_call_is_served_from_cache(self, cache, underlying):
+        """
+        Embedding the same texts twice should only hit the client once.
+        """
+        texts = ["alpha", "beta", "gamma"]
+        first = cache.embed_documents(texts)
+        second = cache.embed_documents(texts)
+
+        assert underlying.embedded == texts
+        assert np.allclose(second, first)
+        assert cache.stats()["hits"] == 3
+        assert cache.stats()["misses"] == 3
+
+    def test_only_changed_texts_are_embedded(self, cache, underlying):
+        """
+        After editing one chunk, only that chunk should be re-embedded.
+        """
+        cache.embed_documents(["alpha", "beta", "gamma"])
+        underlying.embedded.clear()
+
+        vectors = cache.embed_documents(["alpha", "beta edited", "gamma"])
+
+        assert underlying.embedded == ["beta edited"]
+        assert len(vectors) == 3
+
+    def test_preserves_order_and_duplicates(self, cache, underlying):
+        """
+        Results must line up with the input, including repeated texts.
+        """
+        vectors = cache.embed_documents(["a", "b", "a"])
+
+        assert underlying.embedded == ["a", "b"]
+        assert vectors[0] == vectors[2]
+        assert vectors[0] != vectors[1]
+
+    def test_cache_persists_across_instances(self, tmp_path, underlying):
+        """
+        A new process (new instance) should reuse vectors from disk.
+        """
+        path = tmp_path / "cache.sqlite"
+        first = CachedEmbeddings(underlying, path, model="fake")
+        first.embed_documents(["persisted"])
+        first.close()
+
+        underlying.embedded.clear()
+        second = CachedEmbeddings(underlying, path, model="fake")
+        second.embed_documents(["persisted"])
+        second.close()
+
+        assert underlying.embedded == []
+
+    def test_model_is_part_of_the_key(self, tmp_path, underlying):
+        """
+        Vectors from a different model must not be reused.
+        """
+        path = tmp_path / "cache.sqlite"
+        CachedEmbeddings(underlying, path, model="model-a").embed_documents(["text"])
+        underlying.embedded.clear()
+
+        CachedEmbeddings(underlying, path, model="model-b").embed_documents(["text"])
+
+        assert underlying.embedded == ["text"]
+
+    def test_evicts_least_recently_used(self, tmp_path, underlying):
+        """
+        Exceeding max_entries should evict the oldest entries.
+        """
+        cache = CachedEmbeddings(underlying, tmp_path / "cache.sqlite", model="fake", max_entries=2)
+        cache.embed_documents(["old"])
+        cache.embed_documents(["newer"])
+        cache.embed_documents(["newest"])
+
+        stats = cache.stats()
+        assert stats["entries"] == 2
+        assert stats["evictions"] == 1
+
+        underlying.embedded.clear()
+        cache.embed_documents(["old"])
+        assert underlying.embedded == ["old"]
+
+    def test_shared_file_runs_in_wal_mode(self, cache):
+        """
+        Workers reading the cache never wait for one that is writing.
+        """
+        assert cache._conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        assert cache._conn.execute("PRAGMA busy_timeout").fetchone() == (10_000,)
+
+    def test_hits_are_touched_in_batches(self, tmp_path, underlying):
+        """
+        Cache hits don't write until enough of them piled up (or the cache closes).
+        """
+        path = tmp_path / "cache.sqlite"
+        cache = CachedEmbeddings(underlying, path, model="fake", touch_flush_size=3)
+        cache.embed_documents(["a", "b", "c"])
+        statements = []
+        cache._conn.set_trace_callback(statements.append)
+
+        cache.embed_documents(["a", "b"])
+        assert not any(statement.startswith("UPDATE") for statement in statements)
+
+        cache.embed_documents(["c"])
+        assert sum(statement.startswith("UPDATE") for statement in statements) == 3
+
+        cache.embed_documents(["a"])
+        cache.close()
+        reopened = sqlite3.connect(str(path))
+        last_used = dict(reopened.execute("SELECT text_hash, last_used FROM embeddings").fetchall())
+        reopened.close()
+        assert last_used[text_hash("a")] > last_used[text_hash("b")]  # Written on close
+
+    def test_inserts_dont_count_the_table(self, tmp_path, underlying):
+        """
+        The entry count is only recomputed when the cache may be full.
+        """
+        cache = CachedEmbeddings(underlying, tmp_path / "cache.sqlite", model="fake", max_entries=5)
+        statements = []
+        cache._conn.set_trace_callback(statements.append)
+
+        for text in ["a", "b", "c", "d", "e"]:
+            cache.embed_documents([text])
+        assert not any("COUNT" in statement for statement in statements)
+
+        cache.embed_documents(["f"])
+        assert sum("COUNT" in statement for statement in statements) == 1
+        assert cache.stats()["entries"] == 5
+        cache.close()
+
+    def test_queries_are_not_cached_on_disk(self, cache, underlying):
+        """
+        Query embeddings never reach the persistent cache.
+        """
+        vector = cache.embed_query("what is rag?")
+
+        assert len(vector) == 16
+        assert cache.stats()["entries"] == 0
+
+    async def test_repeated_query_is_embedded_once(self, cache, monkeypatch):
+        """
+        The same question embedded twice in a request costs one call.
+        """
+        calls = []
+        original = CountingEmbedding.aembed_query
+
+        async def counting_aembed_query(self, text):
+            calls.append(text)
+            return await original(self, text)
+
+        monkeypatch.setattr(CountingEmbedding, "aembed_query", counting_aembed_query)
+
+        first = await cache.aembed_query("what is rag?")
+        second = await cache.aembed_query("what is rag?")
+
+        assert calls == ["what is rag?"]
+        assert first == second
+
+
+class TestQueryEmbeddingReuse:
+    """Tests for query embeddings shared by the answer cache and the retriever"""
+
+    def test_question_with_directive_is_embedded_once(self, offline_env, client, tmp_path, monkeypatch):
+        underlying = CountingEmbedding(size=32, embedded=[])
+        calls = []
+        original = CountingEmbedding.aembed_query
+
+        async def counting_aembed_query(self, text):
+            calls.append(text)
+            return await original(self, text)
+
+        monkeypatch.setattr(CountingEmbedding, "aembed_query", counting_aembed_query)
+        cache = CachedEmbeddings(underlying, tmp_path / "cache.sqlite", model="fake")
+        monkeypatch.setattr(offline_env, "get_embeddings", lambda api_key: cache)
+        monkeypatch.setattr(offline_env.Config, "RETRIEVAL_MODE", "vector")
+        offline_env.initialize_app()
+
+        response = client.post("/query", json={"question": "[Respond in English] How do neural networks learn?"})
+
+        assert response.status_code == 200
+        assert calls == ["How do neural networks learn?"]
+        cache.close()
@@ -0,0 +1,161 @@
+"""
+Tests for the selectable embedding providers.
+
+The local model provider is tested with a stand-in sentence_transformers
+module, so no model files or optional packages are needed.
+"""
+
+import json
+import subprocess
+import sys
+import types
+
+import numpy as np
+import pytest
+
+import main
+from embedding_cache import CachedEmbeddings
+from embedding_providers import HashingEmbeddings, LocalModelEmbeddings, model_fingerprint
+
+
+class TestHashingEmbeddings:
+    """Tests for the feature-hashing embedder"""
+
+    def test_vectors_are_normalized(self):
+        embeddings = HashingEmbeddings(size=64)
+
+        vectors = np.asarray(embeddings.embed_documents(["FAISS vector search", ""]))
+
+        assert vectors.shape == (2, 64)
+        assert np.linalg.norm(vectors[0]) == pytest.approx(1.0, abs=1e-6)
+        assert not vectors[1].any()
+
+    def test_shared_words_raise_similarity(self):
+        embeddings = HashingEmbeddings()
+        query = np.asarray(embeddings.embed_query("What is a vector database?"))
+        related = np.asarray(embeddings.embed_query("Vector databases store embeddings; a vector database indexes them."))
+        unrelated = np.asarray(embeddings.embed_query("Docker images are built from a Dockerfile."))
+
+        assert query @ related > query @ unrelated
+
+    def test_vectors_are_stable_across_processes(self):
+        """
+        Hashing must not depend on PYTHONHASHSEED, or saved indexes break on restart.
+        """
+        script = "from embedding_providers import HashingEmbeddings; print(HashingEmbeddings(size=32).embed_query('FAISS vs Pinecone'))"
+        outputs = {
+            subprocess.run(
+                [sys.executable, "-c", script],
+                env={"PYTHONHASHSEED": seed, "PYTHONPATH": "."},
+                capture_output=True, text=True, check=True
+            ).stdout
+            for seed in ("1", "2")
+        }
+
+        assert len(outputs) == 1
+        assert json.loads(outputs.pop()) == pytest.approx(HashingEmbeddings(size=32).embed_query("FAISS vs Pinecone"))
+
+
+class TestLocalModelEmbeddings:
+    """Tests for the local sentence-transformers provider"""
+
+    @pytest.fixture
+    def fake_sentence_transformers(self, monkeypatch):
+        """Install a stand-in sentence_transformers module"""
+        loaded = []
+
+        class SentenceTransformer:
+            def __init__(self, path, device):
+                loaded.append((path, device))
+
+            def encode(self, texts, batch_size, normalize_embeddings, **kwargs):
+                assert normalize_embeddings
+                return np.ones((len(texts), 8), dtype=np.float32) / np.sqrt(8)
+
+        module = types.ModuleType("sentence_transformers")
+        module.SentenceTransformer = SentenceTransformer
+        monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+        return loaded
+
+    def test_loads_model_from_directory_on_cpu(self, tmp_path, fake_sentence_transformers):
+        embeddings = LocalModelEmbeddings(tmp_path)
+
+        assert fake_sentence_transformers == [(str(tmp_path), "cpu")]
+        assert len(embeddings.embed_query("What is RAG?")) == 8
+        assert len(embeddings.embed_documents(["a", "b", "c"])) == 3
+
+    def test_missing_model_directory(self, tmp_path, fake_sentence_transformers):
+        with pytest.raises(FileNotFoundError):
+            LocalModelEmbeddings(tmp_path / "missing")
+
+    def test_missing_package_names_the_install(self, tmp_path, monkeypatch):
+        monkeypatch.setitem(sys.modules, "sentence_transformers", None)
+
+        with pytest.raises(ImportError, match="pip install sentence-transformers"):
+            LocalModelEmbeddings(tmp_path)
+
+    def test_selected_by_config_behind_the_cache(self, tmp_path, monkeypatch, fake_sentence_transformers):
+        monkeypatch.setattr(main.Config, "EMBEDDING_PROVIDER", "local")
+        monkeypatch.setattr(main.Config, "LOCAL_EMBEDDING_MODEL_PATH", tmp_path / "minilm")
+        monkeypatch.setattr(main.Config, "EMBEDDING_CACHE_PATH", tmp_path / "cache.sqlite")
+        (tmp_path / "minilm").mkdir()
+
+        embeddings = main.get_embeddings("unused")
+
+        assert isinstance(embeddings, CachedEmbeddings)
+        assert isinstance(embeddings.underlying, LocalModelEmbeddings)
+        assert embeddings.model == f"local:minilm:{model_fingerprint(tmp_path / 'minilm')}"
+        embeddings.close()
+
+    def test_fingerprint_follows_the_model_files(self, tmp_path):
+        (tmp_path / "config.json").write_text('{"hidden_size": 384}')
+        weights = tmp_path / "model.safetensors"
+        weights.write_bytes(b"\0" * 16)
+        (tmp_path / "README.md").write_text("notes")
+        original = model_fingerprint(tmp_path)
+
+        (tmp_path / "README.md").write_text("other notes")
+        assert model_fingerprint(tmp_path) == original
+
+        (tmp_path / "config.json").write_text('{"hidden_size": 768}')
+        changed_config = model_fingerprint(tmp_path)
+        assert changed_config != original
+
+        weights.write_bytes(b"\0" * 32)
+        assert model_fingerprint(tmp_path) != changed_config
+
+
+class TestProviderSelection:
+    """Tests for choosing the provider in Config"""
+
+    def test_unknown_provider(self, monkeypatch):
+        monkeypatch.setattr(main.Config, "EMBEDDING_PROVIDER", "word2vec")
+
+        with pytest.raises(ValueError, match="word2vec"):
+            main.get_embeddings("unused")
+
+    def test_index_records_its_provider(self, monkeypatch, tmp_path, temp_data_dir):
+        """
+        A hashing index builds offline, is reused as is, and rebuilt when the provider settings change.
+        """
+        monkeypatch.setattr(main.Config, "EMBEDDING_PROVIDER", "hashing")
+        monkeypatch.setattr(main.Config, "DATA_PATH", temp_data_dir)
+        monkeypatch.setattr(main.Config, "INDEX_PATH", tmp_path / "index")
+        loads = []
+        original_load = main.load_documents
+        monkeypatch.setattr(main, "load_documents", lambda path: loads.append(path) or original_load(path))
+
+        vectorstore, _ = main.load_or_create_vectorstore("unused")
+        main.load_or_create_vectorstore("unused")
+        manifest = json.loads((tmp_path / "index" / "manifest.json").read_text())
+
+        assert isinstance(vectorstore.embedding_function, HashingEmbeddings)
+        assert manifest["embedding_provider"] == "hashing"
+        assert manifest["embedding_model"] == "hashing-1024"
+        assert len(loads) == 1
+
+        monkeypatch.setattr(main.Config, "HASHING_EMBEDDING_DIM", 256)
+        vectorstore, _ = main.load_or_create_vectorstore("unused")
+
+        assert len(loads) == 2
+        assert vectorstore.index.d == 256
@@ -0,0 +1,263 @@
+"""
+Tests for concurrent, rate-limited bulk embedding.
+
+The rate limiter runs on a fake clock whose sleep advances time, so waits
+are checked exactly without sleeping. A slow fake embeddings client
+records how many batches overlap and can fail on a chosen batch.
+"""
+
+import threading
+import time
+
+import httpx
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+from prometheus_client import REGISTRY
+
+import main
+from embedding_cache import CachedEmbeddings
+from embedding_scheduler import RateLimiter, ScheduledEmbeddings, parse_duration
+from upstream import CircuitBreaker, ResilientTransport, RetryPolicy
+
+
+class FakeClock:
+    """Monotonic clock advanced by the limiter's sleeps"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class SlowEmbeddings(Embeddings):
+    """Embeds a text as [its number, 1]; tracks overlapping batches"""
+
+    def __init__(self, delay=0.02, fail_on=None):
+        self.delay = delay
+        self.fail_on = fail_on  # Text whose batch raises
+        self.batches = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            time.sleep(self.delay)
+            if self.fail_on in texts:
+                raise RuntimeError("injected failure")
+            with self._lock:
+                self.batches.append(list(texts))
+            return [[float(text.split()[-1]), 1.0] for text in texts]
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+    def embed_query(self, text):
+        return [0.0, 1.0]
+
+
+def chunks(count):
+    return [f"chunk {i}" for i in range(count)]
+
+
+def response(status=200, **headers):
+    return httpx.Response(status, headers=headers)
+
+
+class TestParseDuration:
+    """Tests for parse_duration"""
+
+    @pytest.mark.parametrize("value,expected", [
+        ("20ms", 0.02),
+        ("1s", 1.0),
+        ("6m0s", 360.0),
+        ("1h2m3.5s", 3723.5),
+        ("2.5", 2.5),
+        ("soon", None),
+        (None, None),
+    ])
+    def test_formats(self, value, expected):
+        assert parse_duration(value) == expected
+
+
+class TestRateLimiter:
+    """Tests for RateLimiter"""
+
+    def limiter(self, clock, requests_per_minute=60, tokens_per_minute=6000):
+        return RateLimiter(requests_per_minute, tokens_per_minute, clock=clock, sleep=clock.sleep)
+
+    def test_waits_once_the_burst_is_spent(self):
+        clock = FakeClock()
+        limiter = self.limiter(clock, requests_per_minute=2)
+
+        assert limiter.acquire(10) == 0
+        assert limiter.acquire(10) == 0
+        assert limiter.acquire(10) == pytest.approx(30.0)  # 2 per minute refill one every 30s
+
+    def test_token_budget(self):
+        clock = FakeClock()
+        limiter = self.limiter(clock, tokens_per_minute=600)
+
+        limiter.acquire(600)
+
+        assert limiter.acquire(300) == pytest.approx(30.0)
+
+    def test_headers_set_the_rate_and_remaining_budget(self):
+        clock = FakeClock()
+        limiter = self.limiter(clock)
+
+        limiter.observe(response(**{
+            "x-ratelimit-limit-requests": "120",
+            "x-ratelimit-remaining-requests": "0",
+            "x-ratelimit-remaining-tokens": "5000",
+        }))
+
+        assert limiter.buckets["requests"].rate == 2.0
+        assert limiter.buckets["tokens"].level == 5000
+        assert limiter.acquire(1) == pytest.approx(0.5)
+
+    def test_429_pauses_and_halves_the_rate(self):
+        clock = FakeClock()
+        limiter = self.limiter(clock)
+
+        limiter.observe(response(429, **{"retry-after-ms": "1500"}))
+
+        assert limiter.throttle == 0.5
+        assert limiter.acquire(1) == pytest.approx(1.5)
+
+    def test_429_without_retry_after_waits_for_the_reset(self):
+        clock = FakeClock()
+        limiter = self.limiter(clock)
+
+        limiter.observe(response(429, **{"x-ratelimit-reset-requests": "1s", "x-ratelimit-reset-tokens": "6m0s"}))
+
+        assert limiter.acquire(1) == pytest.approx(360.0)
+
+    def test_rate_recovers_after_successes(self):
+        limiter = self.limiter(FakeClock())
+        for _ in range(5):
+            limiter.observe(response(429))
+
+        assert limiter.throttle == pytest.approx(0.1)  # min_throttle
+        for _ in range(30):
+            limiter.observe(response())
+        assert limiter.throttle == 1.0
+
+    def test_transport_reports_every_attempt(self):
+        statuses = iter([429, 200])
+        limiter = self.limiter(FakeClock())
+        transport = ResilientTransport(
+            httpx.MockTransport(lambda request: httpx.Response(next(statuses), headers={"retry-after": "0"})),
+            RetryPolicy(max_retries=1),
+            CircuitBreaker(),
+            on_response=lambda request, response: limiter.observe(response)
+        )
+
+        with httpx.Client(transport=transport) as client:
+            assert client.post("https://api.test/v1/embeddings").status_code == 200
+        assert limiter.throttle == 0.55  # Halved by the 429, raised by the 200
+
+
+class TestScheduledEmbeddings:
+    """Tests for ScheduledEmbeddings"""
+
+    def test_keeps_input_order(self):
+        underlying = SlowEmbeddings()
+        scheduled = ScheduledEmbeddings(underlying, batch_size=3, max_concurrency=4)
+
+        vectors = scheduled.embed_documents(chunks(20))
+
+        assert [vector[0] for vector in vectors] == list(range(20))
+        assert sorted(len(batch) for batch in underlying.batches) == [2, 3, 3, 3, 3, 3, 3]
+
+    def test_bounded_concurrency(self):
+        underlying = SlowEmbeddings()
+
+        ScheduledEmbeddings(underlying, batch_size=1, max_concurrency=3).embed_documents(chunks(12))
+
+        assert underlying.max_in_flight == 3
+
+    def test_batches_take_from_the_limiter(self):
+        clock = FakeClock()
+        limiter = RateLimiter(2, 10_000, clock=clock, sleep=clock.sleep)
+        before = REGISTRY.get_sample_value("rag_embedding_throttle_seconds_total") or 0.0
+
+        ScheduledEmbeddings(SlowEmbeddings(delay=0), batch_size=2, max_concurrency=1, limiter=limiter).embed_documents(
+            chunks(6)
+        )
+
+        assert clock.sleeps == [pytest.approx(30.0)]
+        assert REGISTRY.get_sample_value("rag_embedding_throttle_seconds_total") - before == pytest.approx(30.0)
+
+    def test_failure_stops_new_batches(self):
+        underlying = SlowEmbeddings(fail_on="chunk 2")
+        finished = []
+
+        with pytest.raises(RuntimeError, match="injected failure"):
+            ScheduledEmbeddings(underlying, batch_size=1, max_concurrency=2).embed_documents(
+                chunks(20), on_batch=lambda texts, vectors: finished.extend(texts)
+            )
+
+        assert len(underlying.batches) < 19
+        assert sorted(finished) == sorted(text for batch in underlying.batches for text in batch)
+
+    def test_queries_pass_through(self):
+        scheduled = ScheduledEmbeddings(SlowEmbeddings())
+
+        assert scheduled.embed_query("q") == [0.0, 1.0]
+        assert scheduled.embed_documents([]) == []
+
+
+class TestResume:
+    """Tests for checkpointing into the embedding cache"""
+
+    def test_interrupted_build_resumes_from_the_cache(self, tmp_path):
+        path = tmp_path / "cache.sqlite"
+        failing = SlowEmbeddings(delay=0.005, fail_on="chunk 12")
+        cache = CachedEmbeddings(ScheduledEmbeddings(failing, batch_size=2, max_concurrency=2), path, model="fake")
+        with pytest.raises(RuntimeError):
+            cache.embed_documents(chunks(20))
+        cache.close()
+        checkpointed = {text for batch in failing.batches for text in batch}
+
+        healthy = SlowEmbeddings(delay=0)
+        cache = CachedEmbeddings(ScheduledEmbeddings(healthy, batch_size=2, max_concurrency=2), path, model="fake")
+        vectors = cache.embed_documents(chunks(20))
+        cache.close()
+
+        assert len(checkpointed) >= 12
+        assert {text for batch in healthy.batches for text in batch} == set(chunks(20)) - checkpointed
+        assert np.allclose([vector[0] for vector in vectors], range(20))
+
+
+class TestEmbeddingApp:
+    """Tests for the bulk embedding settings of the app"""
+
+    def test_openai_embeddings_are_scheduled(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(main.Config, "EMBEDDING_PROVIDER", "openai")
+        monkeypatch.setattr(main.Config, "EMBEDDING_CACHE_PATH", tmp_path / "cache.sqlite")
+
+        embeddings = main.get_embeddings("sk-test")
+
+        assert isinstance(embeddings.underlying, ScheduledEmbeddings)
+        assert embeddings.underlying.limiter is main.embedding_rate_limiter
+        embeddings.close()
+
+    def test_only_embeddings_responses_adjust_the_limiter(self, monkeypatch):
+        limiter = RateLimiter(60, 6000)
+        monkeypatch.setattr(main, "embedding_rate_limiter", limiter)
+
+        main.observe_upstream_response(httpx.Request("POST", "https://api.test/v1/chat/completions"), response(429))
+        assert limiter.throttle == 1.0
+        main.observe_upstream_response(httpx.Request("POST", "https://api.test/v1/embeddings"), response(429))
+        assert limiter.throttle == 0.5
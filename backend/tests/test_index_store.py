@@ -0,0 +1,660 @@
+"""
+Tests for index persistence.
+
+These tests use deterministic fake embeddings, so the vector store can be
+built, saved and reloaded without calling the OpenAI API.
+"""
+
+import asyncio
+import json
+import os
+import shutil
+from pathlib import Path
+
+import faiss
+import numpy as np
+import pytest
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+import main
+from index_store import (
+    CHECKSUMS_FILENAME,
+    CHUNKS_FILENAME,
+    MANIFEST_FILENAME,
+    batch_search,
+    build_ann_index,
+    build_manifest,
+    clone_vectorstore,
+    compute_file_hashes,
+    documents_from_vectorstore,
+    lesson_ranges,
+    MmapDocstore,
+    load_index,
+    reconstruct_vectors,
+    range_nprobe,
+    save_index,
+    search_ranges,
+    tune_index,
+    verify_checksums,
+)
+
+
+@pytest.fixture
+def fake_embeddings():
+    """Deterministic embeddings that need no network access"""
+    return DeterministicFakeEmbedding(size=32)
+
+
+@pytest.fixture
+def manifest(temp_data_dir):
+    """Manifest for the temporary lessons directory"""
+    return build_manifest(
+        temp_data_dir,
+        chunk_size=500,
+        chunk_overlap=50,
+        embedding_provider="fake",
+        embedding_model="fake-model",
+        index_params={"index_type": "flat"},
+        index_version=1
+    )
+
+
+@pytest.fixture
+def counting_embeddings(monkeypatch):
+    """Patch main to use fake embeddings and count document embeddings"""
+    calls = []
+
+    class CountingEmbedding(DeterministicFakeEmbedding):
+        def embed_documents(self, texts):
+            calls.append(len(texts))
+            return super().embed_documents(texts)
+
+    embeddings = CountingEmbedding(size=32)
+    monkeypatch.setattr(main, "get_embeddings", lambda api_key: embeddings)
+    return calls
+
+
+class TestManifest:
+    """Tests for manifest construction"""
+
+    def test_compute_file_hashes_covers_all_txt_files(self, temp_data_dir):
+        """
+        Every .txt lesson should get a hash entry.
+        """
+        hashes = compute_file_hashes(temp_data_dir)
+
+        assert sorted(hashes) == ["doc1.txt", "doc2.txt", "doc3.txt"]
+        assert all(len(digest) == 64 for digest in hashes.values())
+
+    def test_manifest_changes_when_lesson_changes(self, temp_data_dir, manifest):
+        """
+        Editing a lesson must produce a different manifest.
+        """
+        (temp_data_dir / "doc1.txt").write_text("Edited lesson content.")
+        updated = build_manifest(
+            temp_data_dir,
+            chunk_size=500,
+            chunk_overlap=50,
+            embedding_provider="fake",
+            embedding_model="fake-model",
+            index_params={"index_type": "flat"},
+            index_version=1
+        )
+
+        assert updated["files"]["doc1.txt"] != manifest["files"]["doc1.txt"]
+        assert updated["files"]["doc2.txt"] == manifest["files"]["doc2.txt"]
+
+
+class TestSaveAndLoad:
+    """Tests for saving and loading the persisted index"""
+
+    def test_round_trip(self, tmp_path, sample_documents, fake_embeddings, manifest):
+        """
+        A saved index should load back with the same documents.
+        """
+        index_path = tmp_path / "index"
+        vectorstore = FAISS.from_documents(sample_documents, fake_embeddings)
+        save_index(vectorstore, index_path, manifest)
+
+        loaded = load_index(index_path, manifest, fake_embeddings)
+
+        assert loaded is not None
+        assert loaded.index.ntotal == len(sample_documents)
+        assert [doc.page_content for doc in documents_from_vectorstore(loaded)] == [
+            doc.page_content for doc in sample_documents
+        ]
+        with open(index_path / MANIFEST_FILENAME) as f:
+            assert json.load(f) == manifest
+
+    def test_load_returns_none_when_missing(self, tmp_path, fake_embeddings, manifest):
+        """
+        No persisted index means the caller has to build one.
+        """
+        assert load_index(tmp_path / "missing", manifest, fake_embeddings) is None
+
+    @pytest.mark.parametrize("key,value", [
+        ("chunk_size", 1000),
+        ("chunk_overlap", 0),
+        ("embedding_model", "other-model"),
+        ("index_version", 2),
+    ])
+    def test_load_returns_none_on_manifest_mismatch(
+        self, tmp_path, sample_documents, fake_embeddings, manifest, key, value
+    ):
+        """
+        Any change in settings invalidates the persisted index.
+        """
+        index_path = tmp_path / "index"
+        vectorstore = FAISS.from_documents(sample_documents, fake_embeddings)
+        save_index(vectorstore, index_path, manifest)
+
+        expected = dict(manifest, **{key: value})
+
+        assert load_index(index_path, expected, fake_embeddings) is None
+
+    def test_save_replaces_existing_index(self, tmp_path, sample_documents, fake_embeddings, manifest):
+        """
+        Saving over an existing index should leave only the new one.
+        """
+        index_path = tmp_path / "index"
+        save_index(FAISS.from_documents(sample_documents, fake_embeddings), index_path, manifest)
+        save_index(FAISS.from_documents(sample_documents[:1], fake_embeddings), index_path, manifest)
+
+        loaded = load_index(index_path, manifest, fake_embeddings)
+
+        assert loaded.index.ntotal == 1
+        assert list(tmp_path.glob("index.*")) == []
+
+    def test_old_index_is_deleted_after_the_swap(
+        self, tmp_path, sample_documents, fake_embeddings, manifest, monkeypatch
+    ):
+        """
+        The new index is in place before the old one is removed.
+        """
+        index_path = tmp_path / "index"
+        save_index(FAISS.from_documents(sample_documents, fake_embeddings), index_path, manifest)
+        deleted = []
+        original_rmtree = shutil.rmtree
+
+        def rmtree(path, **kwargs):
+            deleted.append((Path(path).name, load_index(index_path, manifest, fake_embeddings).index.ntotal))
+            original_rmtree(path, **kwargs)
+
+        monkeypatch.setattr(shutil, "rmtree", rmtree)
+        save_index(FAISS.from_documents(sample_documents[:1], fake_embeddings), index_path, manifest)
+
+        assert deleted == [(f"index.old{os.getpid()}", 1)]
+
+    def test_corrupted_file_fails_checksum(self, tmp_path, sample_documents, fake_embeddings, manifest):
+        """
+        A damaged artifact is rejected instead of served.
+        """
+        index_path = tmp_path / "index"
+        save_index(FAISS.from_documents(sample_documents, fake_embeddings), index_path, manifest)
+        assert verify_checksums(index_path) == []
+
+        chunks = index_path / CHUNKS_FILENAME
+        chunks.write_bytes(chunks.read_bytes() + b"\n")
+
+        assert verify_checksums(index_path) == [CHUNKS_FILENAME]
+        assert load_index(index_path, manifest, fake_embeddings) is None
+        assert load_index(index_path, manifest, fake_embeddings, verify=False) is not None
+
+        (index_path / CHECKSUMS_FILENAME).unlink()
+        assert verify_checksums(index_path) == [CHECKSUMS_FILENAME]
+
+
+class TestBatchSearch:
+    """Tests for multi-query FAISS search"""
+
+    def test_matches_individual_searches(self, sample_documents, fake_embeddings):
+        """
+        One batched search must return what per-query searches return.
+        """
+        vectorstore = FAISS.from_documents(sample_documents, fake_embeddings)
+        questions = ["What is AI?", "What is LangChain?", "Vector databases"]
+        vectors = [fake_embeddings.embed_query(q) for q in questions]
+
+        batched = batch_search(vectorstore, vectors, k=2)
+
+        for vector, results in zip(vectors, batched):
+            expected = vectorstore.similarity_search_with_score_by_vector(vector, k=2)
+            assert [doc.page_content for doc, _ in results] == [doc.page_content for doc, _ in expected]
+            assert [score for _, score in results] == pytest.approx([float(s) for _, s in expected])
+
+    def test_k_larger_than_index(self, sample_documents, fake_embeddings):
+        """
+        Asking for more results than vectors returns what exists.
+        """
+        vectorstore = FAISS.from_documents(sample_documents[:2], fake_embeddings)
+
+        results = batch_search(vectorstore, [fake_embeddings.embed_query("AI")], k=5)
+
+        assert len(results[0]) == 2
+
+
+class TestMemoryMappedIndex:
+    """Tests for opening the persisted index memory-mapped"""
+
+    @pytest.fixture
+    def saved(self, tmp_path, sample_documents, fake_embeddings, manifest):
+        """Save an index with non-ASCII text and return (store, path)"""
+        docs = sample_documents + [Document(page_content="Cos'è il machine learning? Perché è utile… 🚀")]
+        for i, doc in enumerate(docs):
+            doc.id = f"doc{i}.txt:0"
+            doc.metadata = {"source": f"doc{i}.txt", "chunk": 0}
+        vectorstore = FAISS.from_documents(docs, fake_embeddings)
+        save_index(vectorstore, tmp_path / "index", manifest)
+        return vectorstore, tmp_path / "index"
+
+    def test_same_documents_and_results(self, saved, fake_embeddings, manifest):
+        vectorstore, index_path = saved
+
+        mapped = load_index(index_path, manifest, fake_embeddings, memory_map=True)
+
+        assert isinstance(mapped.docstore, MmapDocstore)
+        assert list(documents_from_vectorstore(mapped)) == documents_from_vectorstore(vectorstore)
+        query = fake_embeddings.embed_query("vector databases")
+        assert mapped.similarity_search_with_score_by_vector(query, k=3) == \
+            vectorstore.similarity_search_with_score_by_vector(query, k=3)
+
+    def test_docstore_lookups(self, saved, fake_embeddings, manifest):
+        _, index_path = saved
+        docstore = MmapDocstore(index_path)
+
+        assert len(docstore) == 5
+        assert docstore.search("doc4.txt:0").page_content.startswith("Cos'è")
+        assert docstore[-1].id == "doc4.txt:0"
+        assert docstore.search("missing:0") == "ID missing:0 not found."
+        with pytest.raises(IndexError):
+            docstore[5]
+
+    def test_clone_of_mapped_store_is_editable(self, saved, fake_embeddings, manifest):
+        """
+        Mapped vectors are read-only; edits go through an in-memory copy.
+        """
+        _, index_path = saved
+        mapped = load_index(index_path, manifest, fake_embeddings, memory_map=True)
+
+        copy = clone_vectorstore(mapped)
+        copy.delete(["doc0.txt:0"])
+        copy.add_documents([Document(id="doc9.txt:0", page_content="New lesson.")], ids=["doc9.txt:0"])
+
+        assert mapped.index.ntotal == 5
+        assert copy.index.ntotal == 5
+        assert copy.docstore.search("doc9.txt:0").page_content == "New lesson."
+
+    def test_app_serves_mapped_index_unless_disabled(self, offline_app, monkeypatch):
+        assert isinstance(offline_app.vectorstore.docstore, MmapDocstore)
+
+        monkeypatch.setattr(offline_app.Config, "INDEX_MMAP", False)
+        offline_app.initialize_app()
+
+        assert isinstance(offline_app.vectorstore.docstore, InMemoryDocstore)
+
+
+class TestLessonPartitions:
+    """Tests for lesson-scoped search over id ranges"""
+
+    def test_each_lesson_is_one_range(self, offline_app):
+        """
+        Lessons are indexed one after another, so each has a single range.
+        """
+        ranges = lesson_ranges(offline_app.vectorstore)
+
+        assert ranges == {"doc1": [(0, 1)], "doc2": [(1, 2)], "doc3": [(2, 3)]}
+
+    def test_ranges_stay_contiguous_after_reload(self, offline_app, temp_data_dir):
+        """
+        A modified lesson moves to the end of the index as one block.
+        """
+        (temp_data_dir / "doc1.txt").write_text("First part.\n\n" + "Second part. " * 60)
+        offline_app.reload_lessons()
+
+        ranges = lesson_ranges(offline_app.vectorstore)
+
+        assert ranges["doc2"] == [(0, 1)]
+        assert ranges["doc3"] == [(1, 2)]
+        assert ranges["doc1"] == [(2, offline_app.vectorstore.index.ntotal)]
+
+    def test_search_only_returns_selected_lessons(self, offline_app, fake_embeddings):
+        """
+        Even an exact match outside the scope is never returned.
+        """
+        vectorstore = offline_app.vectorstore
+        ranges = lesson_ranges(vectorstore)
+        query = fake_embeddings.embed_query("Artificial Intelligence is transforming technology.")
+
+        results = search_ranges(vectorstore, query, 4, ranges["doc2"] + ranges["doc3"])
+
+        assert {doc.metadata["lesson_id"] for doc, _ in results} == {"doc2", "doc3"}
+        assert [score for _, score in results] == sorted(score for _, score in results)
+
+    def test_full_range_matches_global_search(self, offline_app, fake_embeddings):
+        """
+        Searching every range gives the same ranking as an unscoped search.
+        """
+        vectorstore = offline_app.vectorstore
+        query = fake_embeddings.embed_query("What is deep learning?")
+
+        scoped = search_ranges(vectorstore, query, 2, [r for rs in lesson_ranges(vectorstore).values() for r in rs])
+        expected = vectorstore.similarity_search_with_score_by_vector(query, k=2)
+
+        assert [doc.id for doc, _ in scoped] == [doc.id for doc, _ in expected]
+
+
+class TestAnnIndexes:
+    """Tests for the approximate index types"""
+
+    @pytest.fixture(scope="class")
+    def vectors(self):
+        """Clustered vectors, so approximate search has structure to exploit"""
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(20, 32))
+        return (centers[rng.integers(0, 20, 2000)] + 0.3 * rng.normal(size=(2000, 32))).astype(np.float32)
+
+    @pytest.mark.parametrize("index_type,min_recall", [
+        ("ivf_flat", 0.9), ("hnsw", 0.9), ("ivf_pq", 0.5),
+    ])
+    def test_recall_against_flat(self, vectors, index_type, min_recall):
+        queries = vectors[:50] + 0.05
+        _, expected = build_ann_index(vectors, "flat").search(queries, 4)
+
+        index = build_ann_index(vectors, index_type, nlist=32, pq_m=8)
+        tune_index(index, nprobe=8, ef_search=64)
+        _, found = index.search(queries, 4)
+
+        recall = np.mean([len(set(f) & set(e)) / 4 for f, e in zip(found, expected)])
+        assert index.ntotal == len(vectors)
+        assert recall >= min_recall
+
+    def test_small_corpus_reduces_parameters(self, vectors):
+        """
+        A corpus too small for the configured nlist / PQ size still trains.
+        """
+        index = build_ann_index(vectors[:100], "ivf_pq", nlist=256, pq_m=12, pq_nbits=8)
+
+        assert index.nlist == 2
+        assert index.pq.M == 8  # Largest divisor of 32 not above 12
+        assert index.pq.nbits == 6
+
+    @pytest.mark.parametrize("index_type,tolerance", [
+        ("flat", 0), ("ivf_flat", 0), ("hnsw", 0), ("ivf_pq", 1.0),
+    ])
+    def test_vectors_can_be_reconstructed(self, vectors, index_type, tolerance, tmp_path):
+        """
+        MMR reads candidate vectors back, also from memory-mapped indexes.
+        """
+        faiss.write_index(build_ann_index(vectors, index_type, nlist=32, pq_m=8), str(tmp_path / "index.faiss"))
+        index = faiss.read_index(str(tmp_path / "index.faiss"), faiss.IO_FLAG_MMAP_IFC)
+
+        rows = reconstruct_vectors(index, [3, 1999, 700])
+
+        assert rows.shape == (3, 32)
+        assert np.abs(rows - vectors[[3, 1999, 700]]).max() <= tolerance
+
+    def test_unknown_type(self, vectors):
+        with pytest.raises(ValueError, match="annoy"):
+            build_ann_index(vectors, "annoy")
+
+    @pytest.mark.parametrize("index_type", ["ivf_flat", "hnsw"])
+    def test_range_search_is_exact(self, offline_app, vectors, index_type):
+        """
+        Scoped search on an ANN index returns the exact top-k of the range.
+        """
+        vectorstore = offline_app.vectorstore
+        vectorstore.index = build_ann_index(vectors, index_type, nlist=32)
+        tune_index(vectorstore.index, nprobe=1, ef_search=4)
+        vectorstore.index_to_docstore_id = {i: vectorstore.index_to_docstore_id[i % 3] for i in range(len(vectors))}
+        query = vectors[700] + 0.05
+
+        results = search_ranges(vectorstore, query, 4, [(500, 900)])
+
+        range_distances = np.sort(((vectors[500:900] - query) ** 2).sum(axis=1))[:4]
+        assert [score for _, score in results] == pytest.approx(range_distances.tolist(), rel=1e-4)
+
+    def test_range_search_probes_only_the_lists_it_needs(self):
+        """
+        A lesson clustered near the query keeps the tuned nprobe instead of scanning every list.
+        """
+        rng = np.random.default_rng(0)
+        lessons = np.repeat(rng.normal(size=(20, 32)), 100, axis=0) + 0.3 * rng.normal(size=(2000, 32))
+        index = build_ann_index(lessons.astype(np.float32), "ivf_flat", nlist=32)
+        tune_index(index, nprobe=4, ef_search=16)
+        near = lessons[550:551].astype(np.float32)
+        far = lessons[10:11].astype(np.float32)
+
+        assert range_nprobe(index, near, 500, 600) == 4
+        assert 4 < range_nprobe(index, far, 500, 600) <= index.nlist
+
+    def test_app_builds_reloads_and_persists_ann_index(self, offline_app, temp_data_dir, monkeypatch):
+        """
+        Switching INDEX_TYPE rebuilds the index; a reload rebuilds it with the new lessons.
+        """
+        monkeypatch.setattr(offline_app.Config, "INDEX_TYPE", "hnsw")
+        offline_app.initialize_app()
+
+        assert isinstance(offline_app.vectorstore.index, faiss.IndexHNSWFlat)
+        assert offline_app.index_manifest["index"] == {"index_type": "hnsw", "hnsw_m": 32, "ef_construction": 40}
+
+        (temp_data_dir / "doc4.txt").write_text("Embeddings map text to vectors.")
+        (temp_data_dir / "doc1.txt").unlink()
+        offline_app.reload_lessons()
+        vectorstore, _ = offline_app.load_or_create_vectorstore("sk-test")
+
+        assert isinstance(vectorstore.index, faiss.IndexHNSWFlat)
+        assert vectorstore.index.hnsw.efSearch == offline_app.Config.HNSW_EF_SEARCH
+        assert sorted(doc.metadata["source"] for doc in offline_app.documents) == ["doc2.txt", "doc3.txt", "doc4.txt"]
+        assert offline_app.retriever.invoke("Embeddings map text to vectors.")[0].metadata["source"] == "doc4.txt"
+
+
+class TestLoadOrCreateVectorstore:
+    """Tests for startup reuse of the persisted index"""
+
+    def test_second_startup_skips_embedding(self, monkeypatch, tmp_path, temp_data_dir, counting_embeddings):
+        """
+        With unchanged lessons the second startup should not embed anything.
+        """
+        monkeypatch.setattr(main.Config, "DATA_PATH", temp_data_dir)
+        monkeypatch.setattr(main.Config, "INDEX_PATH", tmp_path / "index")
+
+        _, first_docs = main.load_or_create_vectorstore("sk-test")
+        assert len(counting_embeddings) == 1
+
+        vectorstore, second_docs = main.load_or_create_vectorstore("sk-test")
+
+        assert len(counting_embeddings) == 1
+        assert vectorstore.index.ntotal == len(first_docs)
+        assert [d.page_content for d in second_docs] == [d.page_content for d in first_docs]
+
+    def test_changed_lesson_triggers_rebuild(self, monkeypatch, tmp_path, temp_data_dir, counting_embeddings):
+        """
+        Editing a lesson should rebuild the index on the next startup.
+        """
+        monkeypatch.setattr(main.Config, "DATA_PATH", temp_data_dir)
+        monkeypatch.setattr(main.Config, "INDEX_PATH", tmp_path / "index")
+
+        main.load_or_create_vectorstore("sk-test")
+        (temp_data_dir / "doc2.txt").write_text("Completely new lesson text.")
+        _, documents = main.load_or_create_vectorstore("sk-test")
+
+        assert len(counting_embeddings) == 2
+        assert any("Completely new" in d.page_content for d in documents)
+
+
+class TestBuildIndexCommand:
+    """Tests for `python -m main build-index`"""
+
+    def test_bundled_artifact_boots_without_embedding(self, monkeypatch, tmp_path, temp_data_dir, counting_embeddings):
+        """
+        An index built offline is served at startup with no embedding calls.
+        """
+        artifact = tmp_path / "artifact"
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+        monkeypatch.setattr(main.Config, "DATA_PATH", temp_data_dir)
+        monkeypatch.setattr(main.Config, "INDEX_PATH", tmp_path / "index")
+        monkeypatch.setattr(main.Config, "BUNDLED_INDEX_PATH", artifact)
+
+        main.cli(["build-index", "--out", str(artifact)])
+
+        assert len(counting_embeddings) == 1
+        assert verify_checksums(artifact) == []
+        assert json.loads((artifact / MANIFEST_FILENAME).read_text()) == main.current_manifest()
+
+        vectorstore, documents = main.load_or_create_vectorstore("sk-test")
+
+        assert len(counting_embeddings) == 1
+        assert vectorstore.index.ntotal == len(documents) > 0
+        assert not (tmp_path / "index").exists()
+
+    def test_stale_artifact_is_rebuilt_into_index_path(self, monkeypatch, tmp_path, temp_data_dir, counting_embeddings):
+        artifact = tmp_path / "artifact"
+        monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+        monkeypatch.setattr(main.Config, "DATA_PATH", temp_data_dir)
+        monkeypatch.setattr(main.Config, "INDEX_PATH", tmp_path / "index")
+        monkeypatch.setattr(main.Config, "BUNDLED_INDEX_PATH", artifact)
+        main.cli(["build-index", "--out", str(artifact)])
+
+        (temp_data_dir / "doc2.txt").write_text("Completely new lesson text.")
+        main.load_or_create_vectorstore("sk-test")
+
+        assert len(counting_embeddings) == 2
+        assert verify_checksums(tmp_path / "index") == []
+
+
+class TestReloadLessons:
+    """Tests for live, incremental re-indexing"""
+
+    def test_no_changes_is_a_no_op(self, offline_app):
+        """
+        Reloading unchanged lessons should keep the current chain.
+        """
+        chain = offline_app.qa_chain
+
+        changes = offline_app.reload_lessons()
+
+        assert changes == {"added": [], "modified": [], "deleted": []}
+        assert offline_app.qa_chain is chain
+
+    def test_applies_added_modified_and_deleted(self, offline_app, temp_data_dir):
+        """
+        Each kind of change should be reflected in the live index.
+        """
+        (temp_data_dir / "doc1.txt").write_text("Transformers use attention.")
+        (temp_data_dir / "doc3.txt").unlink()
+        (temp_data_dir / "doc4.txt").write_text("Embeddings map text to vectors.")
+
+        changes = offline_app.reload_lessons()
+
+        assert changes == {"added": ["doc4.txt"], "modified": ["doc1.txt"], "deleted": ["doc3.txt"]}
+        sources = {doc.metadata["source"]: doc.page_content for doc in offline_app.documents}
+        assert sources == {
+            "doc1.txt": "Transformers use attention.",
+            "doc2.txt": "Machine Learning is a subset of AI that learns from data.",
+            "doc4.txt": "Embeddings map text to vectors.",
+        }
+        assert offline_app.vectorstore.index.ntotal == 3
+
+    def test_only_changed_files_are_embedded(self, offline_app, temp_data_dir, monkeypatch):
+        """
+        Reload cost should scale with the change, not with the corpus.
+        """
+        embedded = []
+        embeddings = offline_app.vectorstore.embedding_function
+        original = embeddings.embed_documents
+        monkeypatch.setattr(
+            type(embeddings), "embed_documents",
+            lambda self, texts: embedded.extend(texts) or original(texts)
+        )
+
+        (temp_data_dir / "doc2.txt").write_text("Supervised learning uses labels.")
+        offline_app.reload_lessons()
+
+        assert embedded == ["Supervised learning uses labels."]
+
+    def test_swap_leaves_old_store_untouched(self, offline_app, temp_data_dir):
+        """
+        Requests holding the old store must keep seeing the old version.
+        """
+        old_store = offline_app.vectorstore
+        old_total = old_store.index.ntotal
+
+        (temp_data_dir / "doc5.txt").write_text("A brand new lesson.")
+        offline_app.reload_lessons()
+
+        assert offline_app.vectorstore is not old_store
+        assert old_store.index.ntotal == old_total
+        assert offline_app.vectorstore.index.ntotal == old_total + 1
+
+    def test_reindex_endpoint(self, offline_app, temp_data_dir, client):
+        """
+        POST /admin/reindex reports the files that changed.
+        """
+        (temp_data_dir / "doc6.txt").write_text("Vector databases store embeddings.")
+
+        response = client.post("/admin/reindex")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["added"] == ["doc6.txt"]
+        assert data["documents_loaded"] == 4
+
+    def test_reloaded_index_is_persisted(self, offline_app, temp_data_dir):
+        """
+        After a reload the next startup should load the updated index.
+        """
+        (temp_data_dir / "doc7.txt").write_text("Persist me.")
+        offline_app.reload_lessons()
+
+        vectorstore, documents = offline_app.load_or_create_vectorstore("sk-test")
+
+        assert any(doc.page_content == "Persist me." for doc in documents)
+
+    def save_as_another_worker(self, app, data_dir):
+        """Index the lessons and save them, as a reload in another worker would"""
+        manifest = app.current_manifest()
+        store = app.create_vectorstore(app.load_documents(data_dir), "sk-test", app.vectorstore.embedding_function)
+        app.persist_index(store, manifest)
+        return app.manifest_fingerprint(manifest)
+
+    def test_loads_the_index_another_worker_saved(self, offline_app, temp_data_dir, monkeypatch):
+        """
+        A worker catching up with a reload elsewhere embeds nothing.
+        """
+        (temp_data_dir / "doc8.txt").write_text("Saved by another worker.")
+        version = self.save_as_another_worker(offline_app, temp_data_dir)
+        embedded = []
+        embeddings = offline_app.vectorstore.embedding_function
+        original = embeddings.embed_documents
+        monkeypatch.setattr(
+            type(embeddings), "embed_documents",
+            lambda self, texts: embedded.extend(texts) or original(texts)
+        )
+
+        changes = offline_app.reload_lessons()
+
+        assert changes["added"] == ["doc8.txt"]
+        assert embedded == []
+        assert offline_app.index_version == version
+        assert any(doc.page_content == "Saved by another worker." for doc in offline_app.documents)
+
+    async def test_watcher_follows_the_saved_index(self, offline_app, temp_data_dir, monkeypatch):
+        """
+        Workers whose lesson snapshot looks unchanged still pick up a saved reload.
+        """
+        monkeypatch.setattr(offline_app, "lesson_snapshot", lambda data_path: {})
+        watcher = asyncio.create_task(offline_app.watch_lessons(0.01))
+        await asyncio.sleep(0.03)
+
+        (temp_data_dir / "doc9.txt").write_text("Reindexed through another worker.")
+        version = self.save_as_another_worker(offline_app, temp_data_dir)
+        for _ in range(100):
+            if offline_app.index_version == version:
+                break
+            await asyncio.sleep(0.01)
+        watcher.cancel()
+
+        assert offline_app.index_version == version
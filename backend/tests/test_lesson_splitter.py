@@ -0,0 +1,168 @@
+"""
+Tests for the structure-aware lesson splitter.
+"""
+
+from pathlib import Path
+
+import pytest
+
+import main
+from lesson_splitter import split_blocks, split_structured
+
+LESSON = """Vector Databases: Storing Embeddings
+
+Vector databases store embeddings and find the nearest ones to a query vector.
+
+Why Vector Databases Matter:
+
+Keyword search misses paraphrases. Similarity search over embeddings finds passages with the same meaning even when they share no words with the question.
+
+Popular Options:
+
+1. FAISS
+A library for local similarity search. It runs in-process and keeps the whole index in memory, which suits prototypes and small catalogs.
+
+Example:
+```python
+import faiss
+index = faiss.IndexFlatL2(384)
+index.add(vectors)
+distances, ids = index.search(query, 4)
+```
+
+2. Pinecone
+A managed service with metadata filtering and replication, suited to production workloads that need no operations work.
+"""
+
+LESSONS = Path(__file__).resolve().parents[2] / "content" / "lessons"
+
+
+def texts(chunks, text=LESSON):
+    return [text[chunk.start:chunk.end] for chunk in chunks]
+
+
+class TestSplitBlocks:
+    """Tests for split_blocks"""
+
+    def test_code_block_keeps_its_caption_and_blank_lines(self):
+        text = "Intro paragraph.\n\nExample:\n```python\ndef f():\n\n    return 1\n```\n\nAfter."
+
+        blocks = split_blocks(text)
+
+        assert [text[b.start:b.end] for b in blocks] == [
+            "Intro paragraph.",
+            "Example:\n```python\ndef f():\n\n    return 1\n```",
+            "After.",
+        ]
+        assert [b.code for b in blocks] == [False, True, False]
+
+    def test_unterminated_fence_runs_to_the_end(self):
+        text = "Text.\n\n```\ncode\n"
+
+        assert [b.code for b in split_blocks(text)] == [False, True]
+
+
+class TestSplitStructured:
+    """Tests for split_structured"""
+
+    def test_sections_get_their_heading_path(self):
+        chunks = split_structured(LESSON, chunk_size=300, min_chunk_size=50)
+
+        assert [chunk.headings for chunk in chunks] == [
+            (),
+            ("Why Vector Databases Matter",),
+            ("Popular Options", "FAISS"),
+            ("Popular Options", "Pinecone"),
+        ]
+        # The FAISS section and its example fit in one chunk
+        assert texts(chunks)[2].endswith("```")
+
+    def test_heading_without_text_starts_its_subsection_chunk(self):
+        chunks = split_structured(LESSON, chunk_size=300, min_chunk_size=50)
+
+        assert texts(chunks)[2].startswith("Popular Options:\n\n1. FAISS\n")
+
+    def test_long_code_blocks_are_cut_at_lines(self):
+        code = LESSON[LESSON.index("```python"):LESSON.index("```\n\n2.") + 3]
+
+        chunks = split_structured(LESSON, chunk_size=60, min_chunk_size=10)
+
+        pieces = [piece for piece in texts(chunks) if piece in code]
+        assert len(pieces) > 1
+        assert all(len(piece) <= 60 for piece in pieces)
+        assert all(code.startswith(piece) or "\n" + piece in code for piece in pieces)
+
+    def test_long_paragraphs_are_cut_at_spaces(self):
+        text = " ".join(["word"] * 100)
+
+        chunks = split_structured(text, chunk_size=100, min_chunk_size=10)
+
+        assert all(len(piece) <= 100 for piece in texts(chunks, text))
+        assert " ".join(texts(chunks, text)) == text
+
+    def test_small_fragments_are_merged(self):
+        split = split_structured(LESSON, chunk_size=300, min_chunk_size=50)
+        merged = split_structured(LESSON, chunk_size=300, min_chunk_size=250)
+
+        assert len(merged) < len(split)
+        assert all(chunk.end - chunk.start >= 250 for chunk in merged[:-1])
+
+    def test_small_fragments_join_the_previous_sibling(self):
+        text = "Options:\n\n1. FAISS\n" + "Runs in-process. " * 5 + "\n\n2. Pinecone\nManaged."
+
+        chunks = split_structured(text, chunk_size=200, min_chunk_size=50)
+
+        assert len(chunks) == 1
+        assert chunks[0].headings == ("Options",)
+
+    @pytest.mark.parametrize("name", ["00_python_basics_for_ai.txt", "15_building_first_rag_system.txt"])
+    def test_chunk_sizes_on_shipped_lessons(self, name):
+        text = (LESSONS / name).read_text(encoding="utf-8")
+
+        sizes = [chunk.end - chunk.start for chunk in split_structured(text, chunk_size=500, min_chunk_size=200)]
+
+        assert min(sizes) >= 200
+        assert max(sizes) <= 500 + 200
+
+    def test_markdown_lessons(self):
+        text = "=== PYTHON BASICS ===\n\nIntro.\n\n## Tools\n\n### 1. Virtual Environments\n\nIsolate dependencies.\n"
+
+        chunks = split_structured(text, chunk_size=40, min_chunk_size=1)
+
+        assert chunks[-1].headings == ("Tools", "Virtual Environments")
+
+    def test_chunks_are_contiguous_slices(self):
+        chunks = split_structured(LESSON, chunk_size=200, min_chunk_size=50)
+
+        assert all(piece == piece.strip() for piece in texts(chunks))
+        assert [chunk.start for chunk in chunks] == sorted(chunk.start for chunk in chunks)
+        assert all(a.end <= b.start for a, b in zip(chunks, chunks[1:]))
+
+
+class TestSplitLesson:
+    """Tests for split_lesson with each splitter"""
+
+    def test_structured_chunks_carry_the_heading_path(self, monkeypatch):
+        monkeypatch.setattr(main.Config, "LESSON_SPLITTER", "structured")
+        monkeypatch.setattr(main.Config, "CHUNK_SIZE", 300)
+        monkeypatch.setattr(main.Config, "MIN_CHUNK_SIZE", 50)
+
+        docs = main.split_lesson(LESSON, "04_vector_databases.txt")
+
+        assert docs[-1].metadata["heading_path"] == "Popular Options > Pinecone"
+        assert all(
+            LESSON[doc.metadata["start_index"]:doc.metadata["end_index"]] == doc.page_content for doc in docs
+        )
+
+    def test_character_chunks_have_no_heading_path(self, monkeypatch):
+        monkeypatch.setattr(main.Config, "LESSON_SPLITTER", "character")
+
+        docs = main.split_lesson(LESSON, "04_vector_databases.txt")
+
+        assert "heading_path" not in docs[0].metadata
+
+    def test_unknown_splitter_is_rejected(self, monkeypatch):
+        monkeypatch.setattr(main.Config, "LESSON_SPLITTER", "semantic")
+
+        with pytest.raises(ValueError, match="Unknown LESSON_SPLITTER"):
+            main.split_lesson(LESSON, "04_vector_databases.txt")
@@ -0,0 +1,118 @@
+"""
+Tests for Prometheus metrics and the Server-Timing header.
+"""
+
+import pytest
+from fastapi import status
+from prometheus_client import REGISTRY
+
+from metrics import server_timing_header
+
+
+def sample(name, labels=None):
+    """Read the current value of a metric sample (0 if never observed)"""
+    return REGISTRY.get_sample_value(name, labels or {}) or 0.0
+
+
+class TestMetricsEndpoint:
+    """Tests for GET /metrics"""
+
+    def test_metrics_in_prometheus_format(self, client):
+        """
+        /metrics serves the Prometheus text exposition format.
+        """
+        response = client.get("/metrics")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# TYPE rag_stage_duration_seconds histogram" in response.text
+        assert "# TYPE rag_http_requests_total counter" in response.text
+
+    def test_index_and_startup_gauges(self, offline_app):
+        """
+        Initialization reports the index size and startup duration.
+        """
+        assert sample("rag_index_vectors") == offline_app.vectorstore.index.ntotal
+        assert sample("rag_startup_duration_seconds") > 0
+
+    def test_request_counter_uses_route_template(self, client):
+        """
+        Requests are counted per route and status code.
+        """
+        labels = {"method": "GET", "path": "/health", "status": "200"}
+        before = sample("rag_http_requests_total", labels)
+
+        client.get("/health")
+
+        assert sample("rag_http_requests_total", labels) == before + 1
+
+    def test_unknown_paths_share_one_label(self, client):
+        """
+        Scanned URLs don't create a time series each, in-flight gauge included.
+        """
+        before = sample("rag_http_requests_total", {"method": "GET", "path": "unmatched", "status": "404"})
+
+        client.get("/wp-admin/setup.php")
+        client.get("/.env")
+
+        assert sample("rag_http_requests_total", {"method": "GET", "path": "unmatched", "status": "404"}) == before + 2
+        assert sample("rag_http_requests_in_flight", {"path": "unmatched"}) == 0
+        paths = {
+            s.labels["path"] for metric in REGISTRY.collect() if metric.name == "rag_http_requests_in_flight"
+            for s in metric.samples
+        }
+        assert not paths & {"/wp-admin/setup.php", "/.env"}
+
+    def test_server_errors_are_counted(self, client):
+        """
+        5xx responses increment the error counter.
+        """
+        # No chain is initialized here, so /query fails with 503
+        before = sample("rag_errors_total", {"endpoint": "/query"})
+
+        response = client.post("/query", json={"question": "What is AI?"})
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert sample("rag_errors_total", {"endpoint": "/query"}) == before + 1
+
+
+class TestStageTimings:
+    """Tests for per-stage latency reporting"""
+
+    @pytest.mark.parametrize("stage", ["embed", "search", "format_docs", "prompt", "llm"])
+    def test_query_observes_every_stage(self, offline_app, client, stage):
+        """
+        Each stage of the chain is recorded in the stage histogram.
+        """
+        before = sample("rag_stage_duration_seconds_count", {"stage": stage})
+
+        client.post("/query", json={"question": f"Which stage is {stage}?"})
+
+        assert sample("rag_stage_duration_seconds_count", {"stage": stage}) == before + 1
+
+    def test_query_sets_server_timing_header(self, offline_app, client):
+        """
+        /query reports its stage timings in Server-Timing.
+        """
+        response = client.post("/query", json={"question": "What is ML?"})
+
+        header = response.headers["Server-Timing"]
+        stages = {part.split(";")[0].strip() for part in header.split(",")}
+        assert {"cache", "embed", "search", "format_docs", "prompt", "llm"} <= stages
+
+    def test_stream_observes_time_to_first_token(self, offline_app, client):
+        """
+        Streaming records time-to-first-token.
+        """
+        before = sample("rag_stage_duration_seconds_count", {"stage": "llm_first_token"})
+
+        client.post("/query/stream", json={"question": "What is deep learning?"})
+
+        assert sample("rag_stage_duration_seconds_count", {"stage": "llm_first_token"}) == before + 1
+
+
+def test_server_timing_header_format():
+    """
+    Durations are reported in milliseconds.
+    """
+    assert server_timing_header({"embed": 0.0123, "llm": 1.5}) == "embed;dur=12.3, llm;dur=1500.0"
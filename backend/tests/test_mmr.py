@@ -0,0 +1,123 @@
+"""
+Tests for maximal-marginal-relevance re-ranking.
+"""
+
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+
+from index_store import lesson_ranges
+from retrieval import LessonRetriever, maximal_marginal_relevance
+
+
+def reference_mmr(query, candidates, k, lambda_mult):
+    """Textbook MMR with per-pair loops, starting from the most relevant candidate"""
+    def cosine(a, b):
+        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+    selected = [max(range(len(candidates)), key=lambda i: cosine(query, candidates[i]))]
+    while len(selected) < min(k, len(candidates)):
+        best, best_score = None, -np.inf
+        for i, candidate in enumerate(candidates):
+            if i in selected:
+                continue
+            redundancy = max((cosine(candidate, candidates[j]) for j in selected), default=0.0)
+            score = lambda_mult * cosine(query, candidate) - (1 - lambda_mult) * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        selected.append(best)
+    return selected
+
+
+class TestMaximalMarginalRelevance:
+    """Tests for maximal_marginal_relevance"""
+
+    @pytest.mark.parametrize("lambda_mult", [0.0, 0.3, 0.5, 0.8, 1.0])
+    def test_matches_the_pairwise_definition(self, lambda_mult):
+        rng = np.random.default_rng(7)
+        query, candidates = rng.normal(size=16), rng.normal(size=(30, 16))
+
+        assert maximal_marginal_relevance(query, candidates, 6, lambda_mult) == \
+            reference_mmr(query, candidates, 6, lambda_mult)
+
+    def test_near_duplicates_make_room_for_other_topics(self):
+        query = np.array([1.0, 0.2, 0.0])
+        candidates = np.array([
+            [1.0, 0.0, 0.0],  # near-duplicate of the best match
+            [0.98, 0.02, 0.0],
+            [0.7, 0.7, 0.0],
+        ])
+
+        assert maximal_marginal_relevance(query, candidates, 2, 1.0) == [1, 0]
+        assert maximal_marginal_relevance(query, candidates, 2, 0.5) == [1, 2]
+
+    def test_fewer_candidates_than_k(self):
+        assert maximal_marginal_relevance(np.ones(4), np.eye(4)[:2], 4) == [0, 1]
+        assert maximal_marginal_relevance(np.ones(4), np.empty((0, 4)), 4) == []
+
+
+class UnitEmbeddings:
+    """Embeddings looked up from a table of fixed vectors"""
+
+    def __init__(self, table):
+        self.table = table
+
+    def embed_query(self, text):
+        return self.table[text]
+
+    def embed_documents(self, texts):
+        return [self.table[text] for text in texts]
+
+
+@pytest.fixture
+def section_store():
+    """Three near-identical chunks of one section and two other chunks"""
+    table = {
+        "attention a": [1.0, 0.0, 0.0],
+        "attention b": [0.98, 0.1, 0.0],
+        "attention c": [0.98, 0.0, 0.1],
+        "positional encodings": [0.6, 0.8, 0.0],
+        "tokenizers": [0.5, 0.0, 0.85],
+        "How does attention work?": [1.0, 0.2, 0.15],
+    }
+    texts = list(table)[:5]
+    return FAISS.from_embeddings(
+        [(text, table[text]) for text in texts],
+        UnitEmbeddings(table),
+        metadatas=[{"source": "transformers.txt", "lesson_id": "transformers"}] * len(texts),
+        ids=[f"transformers.txt:{i}" for i in range(len(texts))],
+    )
+
+
+class TestMmrRetriever:
+    """Tests for MMR in LessonRetriever"""
+
+    def retriever(self, vectorstore, **settings):
+        return LessonRetriever(
+            vectorstore=vectorstore, k=3, lesson_ranges=lesson_ranges(vectorstore), mode="vector", **settings
+        )
+
+    def test_mmr_replaces_near_duplicates(self, section_store):
+        question = "How does attention work?"
+        plain = self.retriever(section_store).invoke(question)
+        diverse = self.retriever(section_store, mmr=True, mmr_fetch_k=5, mmr_lambda=0.5).invoke(question)
+
+        assert [doc.page_content for doc in plain] == ["attention b", "attention c", "attention a"]
+        assert [doc.page_content for doc in diverse] == ["attention b", "tokenizers", "positional encodings"]
+
+    def test_lambda_one_keeps_the_similarity_order(self, section_store):
+        question = "How does attention work?"
+        plain = self.retriever(section_store).invoke(question)
+        relevance_only = self.retriever(section_store, mmr=True, mmr_fetch_k=5, mmr_lambda=1.0).invoke(question)
+
+        assert relevance_only == plain
+
+    def test_app_retriever_uses_config(self, offline_env, monkeypatch):
+        monkeypatch.setattr(offline_env.Config, "MMR_ENABLED", True)
+        monkeypatch.setattr(offline_env.Config, "MMR_FETCH_K", 3)
+        offline_env.initialize_app()
+
+        docs = offline_env.retriever.invoke("Which topics are covered?", config={"configurable": {"retrieval_mode": "vector"}})
+
+        assert len(docs) == 3
+        assert len({doc.id for doc in docs}) == 3
@@ -0,0 +1,223 @@
+"""
+Tests for second-stage reranking.
+"""
+
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+from langchain_core.runnables import ConfigurableField
+from prometheus_client import REGISTRY
+
+from index_store import lesson_ranges
+from reranking import LexicalReranker, Reranker, rerank
+from retrieval import LessonRetriever
+from retrieval_cache import RetrievalCache
+
+
+def sample(outcome):
+    """Read the current value of the rerank counter (0 if never observed)"""
+    return REGISTRY.get_sample_value("rag_reranks_total", {"outcome": outcome}) or 0.0
+
+
+class ReversingReranker(Reranker):
+    """Scores later candidates higher, advancing a fake clock per batch"""
+
+    name = "reversing"
+
+    def __init__(self, batch_size=2, seconds_per_batch=0.0):
+        self.batch_size = batch_size
+        self.seconds_per_batch = seconds_per_batch
+        self.now = 0.0
+        self.batches = []
+
+    def clock(self):
+        return self.now
+
+    def score(self, query, texts, first_rank=0):
+        self.batches.append(list(texts))
+        self.now += self.seconds_per_batch
+        return np.arange(first_rank, first_rank + len(texts), dtype=np.float32)
+
+
+class TestReranker:
+    """Tests for the Reranker base class"""
+
+    def test_subclass_must_implement_score(self):
+        class Unfinished(Reranker):
+            name = "unfinished"
+
+        with pytest.raises(TypeError, match="score"):
+            Unfinished()
+
+
+class TestLexicalReranker:
+    """Tests for LexicalReranker"""
+
+    def test_chunk_covering_the_question_ranks_first(self):
+        texts = [
+            "Embeddings map text to vectors.",
+            "A vector database stores embeddings for similarity search.",
+            "Prompt engineering shapes model output.",
+        ]
+
+        order = rerank(LexicalReranker(), "vector database similarity search", texts)
+
+        assert order[0] == 1
+
+    def test_rare_terms_weigh_more_with_idf(self):
+        texts = ["the model and the data", "pinecone"]
+        idf = {"pinecone": 5.0}.get
+
+        plain = rerank(LexicalReranker(prior_weight=0), "the pinecone", texts)
+        weighted = rerank(LexicalReranker(idf=lambda term: idf(term, 0.1), prior_weight=0), "the pinecone", texts)
+
+        assert plain == [0, 1]  # Ties keep the first-stage order
+        assert weighted == [1, 0]
+
+    def test_first_stage_rank_breaks_ties(self):
+        scores = LexicalReranker().score("faiss", ["faiss index", "faiss search"], first_rank=3)
+
+        assert scores[0] > scores[1]
+
+
+class TestRerank:
+    """Tests for rerank()"""
+
+    def test_scores_in_batches(self):
+        reranker = ReversingReranker(batch_size=2)
+
+        order = rerank(reranker, "q", ["a", "b", "c", "d", "e"])
+
+        assert reranker.batches == [["a", "b"], ["c", "d"], ["e"]]
+        assert order == [4, 3, 2, 1, 0]
+
+    def test_exhausted_budget_returns_none(self):
+        reranker = ReversingReranker(batch_size=2, seconds_per_batch=0.1)
+
+        assert rerank(reranker, "q", list("abcde"), budget_seconds=0.15, clock=reranker.clock) is None
+        assert len(reranker.batches) == 2
+
+    def test_budget_large_enough_for_every_batch(self):
+        reranker = ReversingReranker(batch_size=2, seconds_per_batch=0.1)
+
+        assert rerank(reranker, "q", list("abcde"), budget_seconds=0.5, clock=reranker.clock) == [4, 3, 2, 1, 0]
+
+    def test_no_candidates(self):
+        assert rerank(ReversingReranker(), "q", []) == []
+
+
+class NumberedEmbeddings(Embeddings):
+    """Embeddings whose similarity to the question falls with the chunk number"""
+
+    def embed_query(self, text):
+        return [1.0, 0.0]
+
+    def embed_documents(self, texts):
+        return [[1.0, 0.1 * int(text.split()[-1])] for text in texts]
+
+
+@pytest.fixture
+def numbered_store():
+    """Six chunks of one lesson, "chunk 0" most similar to every question"""
+    texts = [f"chunk {i}" for i in range(6)]
+    embeddings = NumberedEmbeddings()
+    return FAISS.from_embeddings(
+        list(zip(texts, embeddings.embed_documents(texts))),
+        embeddings,
+        metadatas=[{"source": "lesson.txt", "lesson_id": "lesson"}] * len(texts),
+        ids=[f"lesson.txt:{i}" for i in range(len(texts))],
+    )
+
+
+class TestRerankingRetriever:
+    """Tests for the reranking stage of LessonRetriever"""
+
+    def retriever(self, vectorstore, **settings):
+        return LessonRetriever(
+            vectorstore=vectorstore, k=2, lesson_ranges=lesson_ranges(vectorstore), mode="vector", **settings
+        )
+
+    def contents(self, docs):
+        return [doc.page_content for doc in docs]
+
+    def test_reranker_picks_k_of_the_top_n(self, numbered_store):
+        reranker = ReversingReranker(batch_size=8)
+        retriever = self.retriever(numbered_store, reranker=reranker, rerank_top_n=4, rerank_budget=None)
+        reranked = sample("reranked")
+
+        docs = retriever.invoke("question")
+
+        assert reranker.batches == [["chunk 0", "chunk 1", "chunk 2", "chunk 3"]]
+        assert self.contents(docs) == ["chunk 3", "chunk 2"]
+        assert sample("reranked") - reranked == 1
+
+    def test_skipped_per_call(self, numbered_store):
+        reranker = ReversingReranker()
+        retriever = self.retriever(numbered_store, reranker=reranker).configurable_fields(
+            use_reranker=ConfigurableField(id="rerank")
+        )
+        skipped = sample("skipped")
+
+        docs = retriever.invoke("question", config={"configurable": {"rerank": False}})
+
+        assert self.contents(docs) == ["chunk 0", "chunk 1"]
+        assert reranker.batches == []
+        assert sample("skipped") - skipped == 1
+
+    def test_exceeded_budget_keeps_the_first_stage_order_uncached(self, numbered_store):
+        reranker = ReversingReranker(batch_size=1, seconds_per_batch=1.0)
+        cache = RetrievalCache()
+        retriever = self.retriever(
+            numbered_store, reranker=reranker, rerank_top_n=4, rerank_budget=0.0, cache=cache, index_version="v1"
+        )
+        exceeded = sample("budget_exceeded")
+
+        docs = retriever.invoke("question")
+
+        assert self.contents(docs) == ["chunk 0", "chunk 1"]
+        assert sample("budget_exceeded") - exceeded == 1
+        assert cache.stats()["entries"] == 0
+
+    async def test_async_path_reranks(self, numbered_store):
+        retriever = self.retriever(numbered_store, reranker=ReversingReranker(), rerank_top_n=3, rerank_budget=None)
+
+        docs = await retriever.ainvoke("question")
+
+        assert self.contents(docs) == ["chunk 2", "chunk 1"]
+
+
+class TestRerankingApp:
+    """Tests for the reranker settings of the app"""
+
+    def test_lexical_reranker_uses_the_bm25_idf(self, offline_env, monkeypatch):
+        monkeypatch.setattr(offline_env.Config, "RERANKER", "lexical")
+        offline_env.initialize_app()
+        reranked = sample("reranked")
+
+        docs = offline_env.retriever.invoke("neural networks with multiple layers")
+
+        assert docs[0].page_content.startswith("Deep Learning")
+        assert sample("reranked") - reranked == 1
+
+    def test_unknown_reranker_is_rejected(self, offline_env, monkeypatch):
+        monkeypatch.setattr(offline_env.Config, "RERANKER", "colbert")
+
+        with pytest.raises(ValueError, match="Unknown RERANKER"):
+            offline_env.get_reranker(None)
+
+    def test_query_can_skip_reranking(self, offline_env, client, monkeypatch):
+        monkeypatch.setattr(offline_env.Config, "RERANKER", "lexical")
+        offline_env.initialize_app()
+        skipped = sample("skipped")
+
+        response = client.post("/query", json={"question": "What is deep learning?", "rerank": False})
+
+        assert response.status_code == 200
+        assert sample("skipped") - skipped == 1
+
+    def test_scope_config(self, offline_env):
+        assert offline_env.scope_config(None) is None
+        assert offline_env.scope_config(["03"], rerank=False) == {
+            "configurable": {"lesson_ids": ["03"], "rerank": False}
+        }
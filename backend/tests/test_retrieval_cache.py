@@ -0,0 +1,114 @@
+"""
+Tests for the retrieval result cache.
+"""
+
+import pytest
+
+from retrieval_cache import RetrievalCache, retrieval_key
+
+
+class TestRetrievalCache:
+    """Tests for RetrievalCache"""
+
+    def test_key_ignores_directive_case_and_punctuation(self):
+        assert retrieval_key("[Respond in English] What is RAG?") == "what is rag"
+        assert retrieval_key("[Rispondi in italiano]  what is   RAG") == "what is rag"
+
+    def test_hit_and_miss_counters(self):
+        cache = RetrievalCache()
+        cache.put("q", [("doc1.txt:0", 0.5)], "v1")
+
+        assert cache.get("q", "v1") == [("doc1.txt:0", 0.5)]
+        assert cache.get("other", "v1") is None
+        assert cache.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+    def test_new_index_version_drops_entries(self):
+        cache = RetrievalCache()
+        cache.put("q", [("doc1.txt:0", 0.5)], "v1")
+
+        cache.set_version("v2")
+
+        assert cache.get("q", "v2") is None
+        assert cache.stats()["entries"] == 0
+
+    def test_outdated_version_is_ignored(self):
+        """
+        A request still running on the old index doesn't wipe or fill the new version's cache.
+        """
+        cache = RetrievalCache()
+        cache.set_version("v2")
+        cache.put("q", [("doc1.txt:1", 0.2)], "v2")
+
+        cache.put("late", [("doc1.txt:0", 0.5)], "v1")
+
+        assert cache.get("late", "v1") is None
+        assert cache.get("q", "v2") == [("doc1.txt:1", 0.2)]
+        assert cache.stats()["entries"] == 1
+
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = RetrievalCache(max_entries=2)
+        cache.put("a", [], "v1")
+        cache.put("b", [], "v1")
+        cache.get("a", "v1")
+        cache.put("c", [], "v1")
+
+        assert cache.get("a", "v1") == []
+        assert cache.get("b", "v1") is None
+
+
+class TestRetrieverCaching:
+    """Tests for cached retrievals in the app retriever"""
+
+    @pytest.fixture
+    def embed_calls(self, offline_app, monkeypatch):
+        """Count query embeddings"""
+        calls = []
+        embeddings = offline_app.vectorstore.embedding_function
+        original = embeddings.embed_query
+        monkeypatch.setattr(
+            type(embeddings), "embed_query",
+            lambda self, text: calls.append(text) or original(text)
+        )
+        return calls
+
+    def test_repeated_question_skips_search(self, offline_app, embed_calls):
+        """
+        The same question with another language directive reuses the retrieval.
+        """
+        first = offline_app.retriever.invoke("[Respond in English] Which topics are covered?")
+        second = offline_app.retriever.invoke("[Rispondi in italiano] which topics are covered")
+
+        assert embed_calls == ["Which topics are covered?"]
+        assert [doc.id for doc in second] == [doc.id for doc in first]
+        assert offline_app.retrieval_cache.stats()["hits"] == 1
+
+    def test_scope_and_mode_are_part_of_the_key(self, offline_app, embed_calls):
+        question = "Which topics are covered?"
+        offline_app.retriever.invoke(question)
+
+        scoped = offline_app.retriever.invoke(question, config={"configurable": {"lesson_ids": ["doc1"]}})
+        offline_app.retriever.invoke(question, config={"configurable": {"retrieval_mode": "vector"}})
+
+        assert len(embed_calls) == 3
+        assert {doc.metadata["lesson_id"] for doc in scoped} == {"doc1"}
+
+    def test_reload_invalidates_cached_retrievals(self, offline_app, embed_calls, temp_data_dir):
+        question = "Which topics are covered?"
+        offline_app.retriever.invoke(question)
+
+        (temp_data_dir / "doc4.txt").write_text("Topics covered: transformers and attention.")
+        offline_app.reload_lessons()
+        offline_app.retriever.invoke(question)
+
+        assert len(embed_calls) == 2
+
+    def test_query_endpoint_bypasses_retrieval(self, offline_app, embed_calls, client, monkeypatch):
+        """
+        Without a cached answer, a repeated question still skips embedding and search.
+        """
+        monkeypatch.setattr(offline_app.Config, "ANSWER_CACHE_ENABLED", False)
+
+        for question in ("[Respond in English] Which topics?", "[Rispondi in italiano] Which topics?"):
+            assert client.post("/query", json={"question": question}).status_code == 200
+
+        assert embed_calls == ["Which topics?"]
@@ -0,0 +1,259 @@
+"""
+Tests for single-flight coalescing of identical in-flight questions.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+from langchain_core.runnables import RunnableLambda
+from prometheus_client import REGISTRY
+
+from single_flight import SingleFlight
+
+LATENCY = 0.2
+
+
+def sample(name, kind):
+    """Read the current value of a coalescing counter (0 if never observed)"""
+    return REGISTRY.get_sample_value(name, {"kind": kind}) or 0.0
+
+
+class TestSingleFlight:
+    """Tests for SingleFlight"""
+
+    async def test_identical_calls_share_one_execution(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def run():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        results = await asyncio.gather(*[flights.do("query", "q", run) for _ in range(5)])
+
+        assert results == ["answer"] * 5
+        assert len(calls) == 1
+        assert flights.in_flight() == 0
+
+    async def test_different_keys_run_separately(self):
+        flights = SingleFlight()
+
+        async def run(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        results = await asyncio.gather(
+            flights.do("query", "a", lambda: run("a")),
+            flights.do("query", "b", lambda: run("b")),
+            flights.do("stream_context", "a", lambda: run("c")),
+        )
+
+        assert results == ["a", "b", "c"]
+
+    async def test_error_reaches_every_caller_and_is_not_kept(self):
+        flights = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("upstream broke")
+
+        results = await asyncio.gather(
+            *[flights.do("query", "q", fail) for _ in range(3)], return_exceptions=True
+        )
+
+        assert all(isinstance(r, ValueError) for r in results)
+        assert await flights.do("query", "q", lambda: asyncio.sleep(0, result="retried")) == "retried"
+
+    async def test_cancelled_leader_does_not_cancel_followers(self):
+        flights = SingleFlight()
+
+        async def run():
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        leader = asyncio.ensure_future(flights.do("query", "q", run))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flights.do("query", "q", run))
+        await asyncio.sleep(0)
+        leader.cancel()
+
+        assert await follower == "answer"
+        assert leader.cancelled()
+
+    async def test_late_subscribers_get_every_item(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def tokens():
+            calls.append(1)
+            for token in ["Retrieval", "-augmented", " generation"]:
+                await asyncio.sleep(0.02)
+                yield token
+
+        async def collect(delay):
+            await asyncio.sleep(delay)
+            return [token async for token in flights.stream("stream_answer", "q", tokens)]
+
+        results = await asyncio.gather(collect(0), collect(0.03), collect(0.05))
+
+        assert results == [["Retrieval", "-augmented", " generation"]] * 3
+        assert len(calls) == 1
+        assert flights.in_flight() == 0
+
+    async def test_stream_error_follows_the_items_produced_before_it(self):
+        flights = SingleFlight()
+
+        async def tokens():
+            yield "partial"
+            raise RuntimeError("stream broke")
+
+        received = []
+        with pytest.raises(RuntimeError, match="stream broke"):
+            async for token in flights.stream("stream_answer", "q", tokens):
+                received.append(token)
+
+        assert received == ["partial"]
+
+
+class CountingAnswerChain:
+    """Answer chain streaming a fixed answer slowly and counting executions"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def astream(self, inputs, config=None):
+        self.calls += 1
+        for token in ["Coalesced", " answer."]:
+            await asyncio.sleep(LATENCY / 2)
+            yield token
+
+
+@pytest.fixture
+async def async_client(offline_app):
+    """Async HTTP client talking to the offline app in-process"""
+    transport = httpx.ASGITransport(app=offline_app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://testserver") as client:
+        yield client
+
+
+class TestCoalescedEndpoints:
+    """Tests for coalescing in /query, /query/stream and /query/batch"""
+
+    async def test_identical_queries_run_the_chain_once(self, offline_app, async_client, monkeypatch):
+        calls = []
+
+        async def slow_chain(question):
+            calls.append(question)
+            await asyncio.sleep(LATENCY)
+            return "Shared answer."
+
+        monkeypatch.setattr(offline_app, "qa_chain", RunnableLambda(slow_chain))
+        leaders, coalesced = sample("rag_coalesce_leaders_total", "query"), sample("rag_coalesced_requests_total", "query")
+
+        # Case and whitespace differences still count as the same question
+        questions = ["What is RAG?", "what is  RAG?", "What is RAG?", "  WHAT IS RAG?"]
+        responses = await asyncio.gather(*[
+            async_client.post("/query", json={"question": question}) for question in questions
+        ])
+
+        assert [r.status_code for r in responses] == [200] * 4
+        assert all(r.json()["answer"] == "Shared answer." for r in responses)
+        assert len(calls) == 1
+        assert sample("rag_coalesce_leaders_total", "query") - leaders == 1
+        assert sample("rag_coalesced_requests_total", "query") - coalesced == 3
+
+    async def test_different_scopes_are_not_coalesced(self, offline_app, async_client, monkeypatch):
+        calls = []
+
+        async def slow_chain(question):
+            calls.append(question)
+            await asyncio.sleep(LATENCY)
+            return "Scoped answer."
+
+        monkeypatch.setattr(offline_app, "qa_chain", RunnableLambda(slow_chain))
+
+        await asyncio.gather(
+            async_client.post("/query", json={"question": "What is RAG?"}),
+            async_client.post("/query", json={"question": "What is RAG?", "lesson_ids": ["doc1"]}),
+        )
+
+        assert len(calls) == 2
+
+    async def test_different_retrieval_options_are_not_coalesced(self, offline_app, async_client, monkeypatch):
+        calls = []
+
+        async def slow_chain(question):
+            calls.append(question)
+            await asyncio.sleep(LATENCY)
+            return "Answer."
+
+        monkeypatch.setattr(offline_app, "qa_chain", RunnableLambda(slow_chain))
+
+        await asyncio.gather(
+            async_client.post("/query", json={"question": "What is RAG?"}),
+            async_client.post("/query", json={"question": "What is RAG?", "rerank": False}),
+        )
+
+        assert len(calls) == 2
+
+    def test_key_covers_the_retrieval_settings(self, offline_app):
+        retriever = offline_app.retriever
+        default = offline_app.retrieval_options(retriever)
+
+        assert offline_app.retrieval_options(retriever, offline_app.scope_config(None, rerank=False)) != default
+        assert offline_app.retrieval_options(retriever, {"configurable": {"retrieval_mode": "lexical"}}) != default
+        retriever.default.mmr_lambda = 0.9
+        assert offline_app.retrieval_options(retriever) != default
+
+    async def test_identical_streams_share_tokens(self, offline_app, async_client, monkeypatch):
+        chain = CountingAnswerChain()
+        monkeypatch.setattr(offline_app, "answer_chain", chain)
+        coalesced = sample("rag_coalesced_requests_total", "stream_answer")
+
+        async def stream(delay):
+            await asyncio.sleep(delay)
+            return await async_client.post("/query/stream", json={"question": "Explain embeddings"})
+
+        # The second request attaches after the first token was produced
+        responses = await asyncio.gather(stream(0), stream(LATENCY * 0.75))
+
+        assert chain.calls == 1
+        assert sample("rag_coalesced_requests_total", "stream_answer") - coalesced == 1
+        for response in responses:
+            assert response.text.count("event: token") == 2
+            assert '"answer_length": 17' in response.text
+
+    async def test_disabled_coalescing_runs_every_request(self, offline_app, async_client, monkeypatch):
+        calls = []
+
+        async def slow_chain(question):
+            calls.append(question)
+            await asyncio.sleep(LATENCY)
+            return "Own answer."
+
+        monkeypatch.setattr(offline_app, "qa_chain", RunnableLambda(slow_chain))
+        monkeypatch.setattr(offline_app.Config, "COALESCE_ENABLED", False)
+
+        await asyncio.gather(*[async_client.post("/query", json={"question": "What is RAG?"}) for _ in range(3)])
+
+        assert len(calls) == 3
+
+    def test_repeated_batch_questions_share_one_llm_call(self, offline_app, client, monkeypatch):
+        calls = []
+
+        class CountingChain:
+            async def ainvoke(self, inputs):
+                calls.append(inputs["question"])
+                await asyncio.sleep(0.01)
+                return f"Answer to {inputs['question']}"
+
+        monkeypatch.setattr(offline_app, "answer_chain", CountingChain())
+        monkeypatch.setattr(offline_app.Config, "ANSWER_CACHE_ENABLED", False)
+
+        response = client.post("/query/batch", json={"questions": ["What is RAG?", "What is AI?", "what is rag"]})
+
+        answers = [result["answer"] for result in response.json()["results"]]
+        assert answers == ["Answer to What is RAG?", "Answer to What is AI?", "Answer to What is RAG?"]
+        assert sorted(calls) == ["What is AI?", "What is RAG?"]
@@ -0,0 +1,381 @@
+"""
+Tests for the shared OpenAI transport: retries, circuit breaker, pooling.
+
+Requests go to a local stand-in server that plays back scripted responses
+(status codes, Retry-After, added latency), so failures are injected
+without touching the real API.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+from fastapi import status
+from langchain_core.runnables import RunnableLambda
+
+import main
+from upstream import (
+    AsyncResilientTransport,
+    CircuitBreaker,
+    CircuitOpenError,
+    ResilientTransport,
+    RetryPolicy,
+    build_http_clients,
+    upstream_retry_after,
+)
+
+# The real factories, before offline_app replaces them with fakes
+real_get_llm = main.get_llm
+
+
+class StandInServer:
+    """
+    Local HTTP server answering OpenAI-style requests from a script.
+
+    Each request pops the next step, a dict with optional "status",
+    "delay" (seconds before answering) and "headers"; when the script runs
+    out, requests succeed. Successful answers are chat completion or
+    embedding payloads depending on the path.
+    """
+
+    def __init__(self):
+        self.script = []
+        self.requests = []  # (path, client port) per request
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                server.requests.append((self.path, self.client_address[1]))
+                step = server.script.pop(0) if server.script else {}
+                time.sleep(step.get("delay", 0))
+                code = step.get("status", 200)
+                payload = server.payload(self.path, body) if code == 200 else {
+                    "error": {"message": f"injected {code}", "type": "server_error", "code": None}
+                }
+                data = json.dumps(payload).encode()
+                try:
+                    self.send_response(code)
+                    for name, value in step.get("headers", {}).items():
+                        self.send_header(name, value)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # The client timed out and hung up
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/v1"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def payload(path: str, body: dict) -> dict:
+        if path.endswith("/embeddings"):
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            return {
+                "object": "list",
+                "data": [{"object": "embedding", "index": i, "embedding": [0.6, 0.8]} for i in range(len(inputs))],
+                "model": body["model"],
+                "usage": {"prompt_tokens": 1, "total_tokens": 1},
+            }
+        return {
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": body["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "Answer from the stand-in server."},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+        }
+
+
+@pytest.fixture
+def server():
+    """A running stand-in server"""
+    stand_in = StandInServer()
+    yield stand_in
+    stand_in.httpd.shutdown()
+    stand_in.httpd.server_close()
+
+
+@pytest.fixture
+def clients():
+    """Pooled clients with fast, deterministic retries and a fresh breaker"""
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    sync_client, async_client = build_http_clients(
+        RetryPolicy(max_retries=2, base_delay=0.01, max_delay=0.05),
+        breaker,
+        timeout=0.5
+    )
+    yield sync_client, async_client, breaker
+    sync_client.close()
+
+
+def post(client: httpx.Client, server: StandInServer) -> httpx.Response:
+    return client.post(f"{server.url}/embeddings", json={"model": "m", "input": ["q"]})
+
+
+class TestRetryPolicy:
+    """Tests for backoff delays"""
+
+    def test_full_jitter_exponential_backoff(self):
+        policy = RetryPolicy(base_delay=0.5, max_delay=8.0, jitter=lambda: 0.5)
+
+        assert [policy.delay(attempt) for attempt in range(6)] == [0.25, 0.5, 1.0, 2.0, 4.0, 4.0]
+        assert RetryPolicy(jitter=lambda: 0.0).delay(3) == 0.0
+
+    @pytest.mark.parametrize("headers,expected", [
+        ({"Retry-After": "2"}, 2.0),
+        ({"retry-after-ms": "150"}, 0.15),
+        ({"Retry-After": "120"}, 8.0),  # capped at max_delay
+    ])
+    def test_server_requested_delay_wins(self, headers, expected):
+        response = httpx.Response(429, headers=headers)
+
+        assert RetryPolicy(max_delay=8.0, jitter=lambda: 0.0).delay(0, response) == pytest.approx(expected)
+
+
+class TestCircuitBreaker:
+    """Tests for the closed/open/half-open state machine"""
+
+    @pytest.fixture
+    def clock(self):
+        now = [0.0]
+        return now
+
+    def test_opens_after_consecutive_failures(self, clock):
+        breaker = CircuitBreaker(failure_threshold=3, reset_seconds=10, clock=lambda: clock[0])
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == "closed"
+
+        breaker.record_failure()
+
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError) as error:
+            breaker.before_call()
+        assert error.value.retry_after == 10
+
+    def test_single_trial_call_after_reset(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=lambda: clock[0])
+        breaker.record_failure()
+        clock[0] = 10
+
+        breaker.before_call()
+        assert breaker.state == "half_open"
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        breaker.record_success()
+        assert breaker.state == "closed"
+        breaker.before_call()
+
+    def test_failed_trial_reopens(self, clock):
+        breaker = CircuitBreaker(failure_threshold=5, reset_seconds=10, clock=lambda: clock[0])
+        for _ in range(5):
+            breaker.record_failure()
+        clock[0] = 10
+        breaker.before_call()
+
+        breaker.record_failure()
+
+        assert breaker.state == "open"
+
+    async def cancel_calls(self, breaker, count):
+        """Start count calls that hang upstream, then cancel them"""
+        hang = asyncio.Event()
+
+        class HangingTransport(httpx.AsyncBaseTransport):
+            async def handle_async_request(self, request):
+                await hang.wait()
+
+        client = httpx.AsyncClient(transport=AsyncResilientTransport(HangingTransport(), RetryPolicy(), breaker))
+        calls = [asyncio.create_task(client.post("https://api.test/v1/embeddings")) for _ in range(count)]
+        await asyncio.sleep(0.01)
+        for call in calls:
+            call.cancel()
+        for call in calls:
+            with pytest.raises(asyncio.CancelledError):
+                await call
+
+    async def test_cancelled_trial_releases_the_probe(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=lambda: clock[0])
+        breaker.record_failure()
+        clock[0] = 10
+
+        await self.cancel_calls(breaker, 1)
+
+        assert breaker.state == "half_open"
+        breaker.before_call()  # The next trial is let through right away
+
+    async def test_cancelled_calls_dont_open_the_circuit(self, clock):
+        breaker = CircuitBreaker(failure_threshold=3, reset_seconds=10, clock=lambda: clock[0])
+
+        await self.cancel_calls(breaker, 3)
+
+        assert breaker.state == "closed"
+        breaker.record_failure()
+        breaker.record_failure()
+        assert breaker.state == "closed"  # The cancellations were not counted towards the threshold
+
+    def test_unexpected_error_counts_as_failure(self, clock):
+        breaker = CircuitBreaker(failure_threshold=1, reset_seconds=10, clock=lambda: clock[0])
+
+        def broken(request):
+            raise ValueError("bug in the transport")
+
+        client = httpx.Client(transport=ResilientTransport(httpx.MockTransport(broken), RetryPolicy(), breaker))
+        with pytest.raises(ValueError):
+            client.post("https://api.test/v1/embeddings")
+
+        assert breaker.state == "open"
+
+
+class TestResilientTransport:
+    """Tests against the stand-in server"""
+
+    def test_retries_rate_limits_and_server_errors(self, server, clients):
+        sync_client, _, breaker = clients
+        server.script = [{"status": 429, "headers": {"Retry-After": "0"}}, {"status": 503}]
+
+        response = post(sync_client, server)
+
+        assert response.status_code == 200
+        assert len(server.requests) == 3
+        assert breaker.state == "closed"
+
+    def test_gives_up_after_max_retries(self, server, clients):
+        sync_client, _, _ = clients
+        server.script = [{"status": 500}] * 5
+
+        response = post(sync_client, server)
+
+        assert response.status_code == 500
+        assert len(server.requests) == 3
+
+    def test_client_errors_are_not_retried(self, server, clients):
+        sync_client, _, _ = clients
+        server.script = [{"status": 400}]
+
+        assert post(sync_client, server).status_code == 400
+        assert len(server.requests) == 1
+
+    def test_timeouts_are_retried(self, server, clients):
+        sync_client, _, _ = clients
+        server.script = [{"delay": 1.0}]
+
+        assert post(sync_client, server).status_code == 200
+        assert len(server.requests) == 2
+
+    def test_connections_are_kept_alive(self, server, clients):
+        sync_client, _, _ = clients
+
+        for _ in range(5):
+            post(sync_client, server)
+
+        assert len({port for _, port in server.requests}) == 1
+
+    def test_open_circuit_fails_fast(self, server, clients):
+        """
+        Once upstream keeps failing, calls are rejected without reaching it.
+        """
+        sync_client, _, breaker = clients
+        server.script = [{"status": 503}] * 6
+        post(sync_client, server)
+        post(sync_client, server)
+        assert breaker.state == "open"
+
+        with pytest.raises(CircuitOpenError):
+            post(sync_client, server)
+        assert len(server.requests) == 6
+
+    async def test_async_client_shares_breaker(self, server, clients):
+        _, async_client, breaker = clients
+        server.script = [{"status": 502}]
+
+        async with async_client:
+            response = await async_client.post(f"{server.url}/embeddings", json={"model": "m", "input": ["q"]})
+            # Failures seen by the sync client open the circuit for both
+            breaker.record_failure()
+            breaker.record_failure()
+            with pytest.raises(CircuitOpenError):
+                await async_client.post(f"{server.url}/embeddings", json={"model": "m", "input": ["q"]})
+
+        assert response.status_code == 200
+        assert len(server.requests) == 2
+
+
+class TestOpenAIClients:
+    """Tests for the chat and embeddings clients built by main"""
+
+    @pytest.fixture
+    def openai_app(self, server, clients, monkeypatch):
+        """Point the OpenAI clients at the stand-in server"""
+        sync_client, async_client, breaker = clients
+        monkeypatch.setenv("OPENAI_BASE_URL", server.url)
+        monkeypatch.setattr(main, "http_clients", (sync_client, async_client))
+        monkeypatch.setattr(main, "upstream_breaker", breaker)
+        return main
+
+    def test_chat_and_embeddings_share_the_pool(self, openai_app, server, tmp_path, monkeypatch):
+        monkeypatch.setattr(main.Config, "EMBEDDING_PROVIDER", "openai")
+        monkeypatch.setattr(main.Config, "EMBEDDING_CACHE_PATH", tmp_path / "cache.sqlite")
+        server.script = [{"status": 429, "headers": {"retry-after-ms": "10"}}]
+
+        llm = real_get_llm("sk-test")
+        embeddings = main.get_embeddings("sk-test")
+        openai_embeddings = embeddings.underlying.underlying  # Behind the bulk embedding scheduler
+        # Token-length checks would download the tiktoken encoding
+        openai_embeddings.check_embedding_ctx_length = False
+
+        assert llm.invoke("What is RAG?").content == "Answer from the stand-in server."
+        assert embeddings.embed_query("What is RAG?") == [0.6, 0.8]
+        assert llm.max_retries == openai_embeddings.max_retries == 0
+        assert llm.http_client is openai_embeddings.http_client
+        assert len({port for _, port in server.requests}) == 1
+        embeddings.close()
+
+    def test_query_returns_503_when_upstream_is_down(self, offline_app, openai_app, server, client, monkeypatch):
+        """
+        A rate-limited or failing LLM answers 503 with Retry-After, not 500.
+        """
+        server.script = [{"status": 429, "headers": {"Retry-After": "0"}}] * 3
+        monkeypatch.setattr(
+            offline_app, "qa_chain", offline_app.build_qa_chain(offline_app.retriever, real_get_llm("sk-test"))
+        )
+
+        response = client.post("/query", json={"question": "Which topics are covered?"})
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.headers["Retry-After"] == "1"
+
+    def test_open_circuit_returns_its_retry_after(self, offline_app, client, monkeypatch):
+        def fail(question):
+            raise CircuitOpenError(retry_after=12.4)
+
+        monkeypatch.setattr(offline_app, "qa_chain", RunnableLambda(fail))
+
+        response = client.post("/query", json={"question": "Which topics are covered?"})
+
+        assert response.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert response.headers["Retry-After"] == "12"
+
+    def test_other_errors_stay_500(self):
+        assert upstream_retry_after(ValueError("bad prompt")) is None
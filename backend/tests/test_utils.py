@@ -158,6 +158,51 @@ class TestLoadDocuments:
         documents = load_documents(data_dir)
         assert len(documents) > 0
 
+    def test_load_documents_records_chunk_metadata(self, tmp_path):
+        """
+        Each chunk records its lesson and where it sits in the lesson file.
+        """
+        data_dir = tmp_path / "data"
+        data_dir.mkdir()
+        text = "\n\n".join(f"Paragraph {i} about retrieval. " * 8 for i in range(10))
+        (data_dir / "03_rag_architecture.txt").write_text(text, encoding="utf-8")
+
+        documents = load_documents(data_dir)
+
+        assert len(documents) > 1
+        for i, doc in enumerate(documents):
+            assert doc.metadata["source"] == "03_rag_architecture.txt"
+            assert doc.metadata["lesson_id"] == "03_rag_architecture"
+            assert doc.metadata["chunk"] == i
+            assert text[doc.metadata["start_index"]:doc.metadata["end_index"]] == doc.page_content
+
+    def test_load_documents_keeps_file_order(self, tmp_path, monkeypatch):
+        """
+        Files are loaded in parallel, but chunks come back in file order.
+        """
+        monkeypatch.setattr(Config, "LOAD_WORKERS", 4)
+        data_dir = tmp_path / "data"
+        data_dir.mkdir()
+        for i in range(12):
+            (data_dir / f"{i:02d}_lesson.txt").write_text(f"Lesson {i} content.")
+
+        documents = load_documents(data_dir)
+
+        assert [doc.metadata["lesson_id"] for doc in documents] == [f"{i:02d}_lesson" for i in range(12)]
+
+    def test_load_documents_skips_unreadable_files(self, tmp_path):
+        """
+        A file that cannot be decoded is skipped without failing the load.
+        """
+        data_dir = tmp_path / "data"
+        data_dir.mkdir()
+        (data_dir / "valid.txt").write_text("Valid content here.")
+        (data_dir / "broken.txt").write_bytes(b"\xff\xfe\xfa invalid utf-8")
+
+        documents = load_documents(data_dir)
+
+        assert [doc.metadata["source"] for doc in documents] == ["valid.txt"]
+
 
 class TestCreateVectorstore:
     """Tests for create_vectorstore function"""
@@ -0,0 +1,432 @@
+"""
+Shared HTTP transport for upstream (OpenAI) calls.
+
+The chat model and the embeddings client send their requests through one
+pooled client per I/O style (sync and async), built by build_http_clients()
+with explicit connection limits and keep-alive. Its transport adds what the
+SDK defaults lack:
+
+1. Retries on 429, 5xx, timeouts and connection errors, with full-jitter
+   exponential backoff. Retry-After / retry-after-ms from the server wins
+   (capped at max_delay).
+2. A circuit breaker shared by both transports. After failure_threshold
+   consecutive failed calls it rejects calls immediately for reset_seconds,
+   then lets a single trial call through; its outcome closes or reopens
+   the circuit. A cancelled call (client disconnect) says nothing about
+   upstream: it only releases the trial slot, so a lost trial call can't
+   leave the circuit half-open for good, and disconnects never open it.
+   A call ending in an unexpected exception counts as failed.
+3. An optional on_response hook that sees every response, retried ones
+   included (the bulk embedding rate limiter reads its headers).
+
+The OpenAI SDK's own retries should be disabled (max_retries=0) so the
+attempts are not multiplied.
+"""
+
+import asyncio
+import email.utils
+import itertools
+import logging
+import random
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+import httpx
+import openai
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+ResponseHook = Callable[[httpx.Request, httpx.Response], None]
+
+# Status codes worth retrying: timeouts, lock conflicts, rate limits, server errors
+RETRYABLE_STATUS = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling upstream while the circuit is open."""
+
+    def __init__(self, retry_after: float):
+        """
+        Args:
+            retry_after: Seconds until the circuit lets a trial call through
+        """
+        super().__init__(f"Upstream circuit is open, retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed, open, half-open)."""
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Args:
+            failure_threshold: Consecutive failed calls that open the circuit
+            reset_seconds: How long the circuit stays open before a trial call
+            clock: Monotonic time source (replaceable in tests)
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if self._clock() - self._opened_at < self.reset_seconds:
+            return "open"
+        return "half_open"
+
+    @property
+    def state(self) -> str:
+        """Current state: closed, open or half_open"""
+        with self._lock:
+            return self._state()
+
+    def before_call(self) -> None:
+        """
+        Admit a call, or reject it while the circuit is open.
+
+        In the half-open state only one trial call is admitted at a time.
+
+        Raises:
+            CircuitOpenError: If the call must not reach upstream
+        """
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return
+            retry_after = max(1.0, self._opened_at + self.reset_seconds - self._clock())
+        metrics.UPSTREAM_REJECTED.inc()
+        raise CircuitOpenError(retry_after)
+
+    def record_success(self) -> None:
+        """Close the circuit after a call upstream answered"""
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("Upstream recovered, closing circuit")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+        metrics.UPSTREAM_CIRCUIT_OPEN.set(0)
+
+    def record_failure(self) -> None:
+        """Count a failed call; open the circuit at the threshold or when a trial call fails"""
+        with self._lock:
+            self._failures += 1
+            if not self._probing and self._failures < self.failure_threshold:
+                return
+            self._opened_at = self._clock()
+            self._probing = False
+        logger.warning(f"Upstream degraded ({self._failures} failed calls), failing fast for {self.reset_seconds:.0f}s")
+        metrics.UPSTREAM_CIRCUIT_OPEN.set(1)
+
+    def release(self) -> None:
+        """Free the trial slot of a call that ended without an outcome, counting nothing"""
+        with self._lock:
+            self._probing = False
+
+
+class RetryPolicy:
+    """How many times and how long to wait before retrying an upstream request."""
+
+    def __init__(
+        self,
+        max_retries: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        jitter: Callable[[], float] = random.random
+    ):
+        """
+        Args:
+            max_retries: Retries after the first attempt
+            base_delay: Backoff ceiling of the first retry, doubled per retry
+            max_delay: Upper bound of any delay, including server-requested ones
+            jitter: Uniform [0, 1) source (replaceable in tests)
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._jitter = jitter
+
+    def delay(self, attempt: int, response: Optional[httpx.Response] = None) -> float:
+        """
+        Seconds to wait before retrying.
+
+        Args:
+            attempt: Zero-based number of the attempt that failed
+            response: Its response, if upstream answered
+
+        Returns:
+            The server-requested delay if any, else a random delay up to
+            base_delay * 2**attempt (full jitter); at most max_delay
+        """
+        requested = retry_after_seconds(response) if response is not None else None
+        if requested is not None:
+            return min(requested, self.max_delay)
+        return self._jitter() * min(self.max_delay, self.base_delay * 2 ** attempt)
+
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """
+    Delay requested by retry-after-ms or Retry-After (seconds or HTTP date).
+
+    Args:
+        response: Upstream response
+
+    Returns:
+        Seconds, or None if absent or unparsable
+    """
+    value = response.headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_tz(value)
+        return None if parsed is None else max(0.0, email.utils.mktime_tz(parsed) - time.time())
+
+
+class _Resilience:
+    """Retry and circuit breaker bookkeeping shared by the sync and async transports."""
+
+    def __init__(self, policy: RetryPolicy, breaker: CircuitBreaker, on_response: Optional[ResponseHook] = None):
+        self.policy = policy
+        self.breaker = breaker
+        self.on_response = on_response
+
+    def _settle(
+        self,
+        request: httpx.Request,
+        attempt: int,
+        response: Optional[httpx.Response] = None,
+        error: Optional[Exception] = None
+    ) -> Optional[float]:
+        """
+        Record the outcome of an attempt.
+
+        Returns:
+            Seconds to wait before retrying, or None to return the response
+            (or re-raise the error) as is
+        """
+        if response is not None and self.on_response is not None:
+            self.on_response(request, response)
+        if error is None and response.status_code not in RETRYABLE_STATUS:
+            self.breaker.record_success()
+            return None
+        if attempt >= self.policy.max_retries:
+            self.breaker.record_failure()
+            return None
+        reason = type(error).__name__ if error is not None else str(response.status_code)
+        delay = self.policy.delay(attempt, response)
+        metrics.UPSTREAM_RETRIES.labels(reason=reason).inc()
+        logger.warning(
+            f"Upstream {request.method} {request.url.path} failed ({reason}), "
+            f"retry {attempt + 1}/{self.policy.max_retries} in {delay:.2f}s"
+        )
+        return delay
+
+    def _abandon(self, request: httpx.Request) -> None:
+        """
+        Count a call that ended in an unexpected exception as failed, which
+        also releases a half-open trial call.
+        """
+        logger.warning(f"Upstream {request.method} {request.url.path} abandoned without a response")
+        self.breaker.record_failure()
+
+    def _cancel(self, request: httpx.Request) -> None:
+        """Release a cancelled call's trial slot without counting a failure"""
+        logger.info(f"Upstream {request.method} {request.url.path} cancelled")
+        self.breaker.release()
+
+
+class ResilientTransport(_Resilience, httpx.BaseTransport):
+    """Sync transport with retries and a circuit breaker around a pooled transport."""
+
+    def __init__(
+        self,
+        transport: httpx.BaseTransport,
+        policy: RetryPolicy,
+        breaker: CircuitBreaker,
+        on_response: Optional[ResponseHook] = None
+    ):
+        """
+        Args:
+            transport: Transport that sends the requests (owns the connection pool)
+            policy: Retry policy
+            breaker: Circuit breaker, shared with the async transport
+            on_response: Called with every response, before retrying
+        """
+        super().__init__(policy, breaker, on_response)
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        self.breaker.before_call()
+        settled = False
+        try:
+            for attempt in itertools.count():
+                try:
+                    response = self.transport.handle_request(request)
+                except httpx.TransportError as e:
+                    delay = self._settle(request, attempt, error=e)
+                    if delay is None:
+                        settled = True
+                        raise
+                else:
+                    delay = self._settle(request, attempt, response=response)
+                    if delay is None:
+                        settled = True
+                        return response
+                    # Drain the (small) error body so the connection goes back to the pool
+                    response.read()
+                    response.close()
+                time.sleep(delay)
+        except BaseException:
+            if not settled:
+                self._abandon(request)
+            raise
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncResilientTransport(_Resilience, httpx.AsyncBaseTransport):
+    """Async transport with retries and a circuit breaker around a pooled transport."""
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        policy: RetryPolicy,
+        breaker: CircuitBreaker,
+        on_response: Optional[ResponseHook] = None
+    ):
+        """
+        Args:
+            transport: Transport that sends the requests (owns the connection pool)
+            policy: Retry policy
+            breaker: Circuit breaker, shared with the sync transport
+            on_response: Called with every response, before retrying
+        """
+        super().__init__(policy, breaker, on_response)
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.breaker.before_call()
+        settled = False
+        try:
+            for attempt in itertools.count():
+                try:
+                    response = await self.transport.handle_async_request(request)
+                except httpx.TransportError as e:
+                    delay = self._settle(request, attempt, error=e)
+                    if delay is None:
+                        settled = True
+                        raise
+                else:
+                    delay = self._settle(request, attempt, response=response)
+                    if delay is None:
+                        settled = True
+                        return response
+                    await response.aread()
+                    await response.aclose()
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            # The client disconnected; upstream may be fine
+            self._cancel(request)
+            raise
+        except BaseException:
+            if not settled:
+                self._abandon(request)
+            raise
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def build_http_clients(
+    policy: RetryPolicy,
+    breaker: CircuitBreaker,
+    max_connections: int = 100,
+    max_keepalive_connections: int = 20,
+    keepalive_expiry: float = 30.0,
+    timeout: float = 60.0,
+    connect_timeout: float = 5.0,
+    on_response: Optional[ResponseHook] = None
+) -> Tuple[httpx.Client, httpx.AsyncClient]:
+    """
+    Build the pooled clients every OpenAI call goes through.
+
+    Args:
+        policy: Retry policy
+        breaker: Circuit breaker shared by both clients
+        max_connections: Connections open at once, per client
+        max_keepalive_connections: Idle connections kept for reuse, per client
+        keepalive_expiry: Seconds an idle connection is kept
+        timeout: Read/write/pool timeout in seconds
+        connect_timeout: Connect timeout in seconds
+        on_response: Called with (request, response) for every attempt that
+            got a response
+
+    Returns:
+        Tuple of (sync client, async client)
+    """
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry
+    )
+    timeouts = httpx.Timeout(timeout, connect=connect_timeout)
+    return (
+        httpx.Client(
+            transport=ResilientTransport(httpx.HTTPTransport(limits=limits), policy, breaker, on_response),
+            timeout=timeouts
+        ),
+        httpx.AsyncClient(
+            transport=AsyncResilientTransport(httpx.AsyncHTTPTransport(limits=limits), policy, breaker, on_response),
+            timeout=timeouts
+        ),
+    )
+
+
+def upstream_retry_after(error: BaseException) -> Optional[float]:
+    """
+    Tell whether an error means upstream is unavailable rather than broken.
+
+    Looks through the exception chain for an open circuit, a rate limit,
+    an upstream server error, a timeout or a connection failure.
+
+    Args:
+        error: Exception raised while answering a request
+
+    Returns:
+        Seconds the client should wait before retrying, or None if the
+        error is not an upstream availability problem
+    """
+    while error is not None:
+        if isinstance(error, CircuitOpenError):
+            return error.retry_after
+        if isinstance(error, (openai.RateLimitError, openai.InternalServerError)):
+            return retry_after_seconds(error.response) or 1.0
+        if isinstance(error, (openai.APIConnectionError, httpx.TransportError)):
+            return 1.0
+        error = error.__cause__ or error.__context__
+    return None
@@ -169,6 +169,7 @@ with st.sidebar:
             st.caption(lesson['topics'])
             if st.button(f"Ask about this →", key=f"lesson_{lesson['id']}"):
                 st.session_state.current_question = f"Tell me about {lesson['title'].lower()}"
+                st.session_state.lesson_scope = lesson
                 st.session_state.lessons_visited.add(lesson['id'])
 
     st.markdown("---")
@@ -235,6 +236,38 @@ def check_api_health() -> bool:
     except:
         return False
 
+def stream_answer(question: str, lesson_ids: Optional[List[str]] = None):
+    """
+    Stream an answer from the API's /query/stream endpoint.
+
+    Args:
+        question: The question to ask
+        lesson_ids: Only search these lessons (e.g. ["03"]); None searches all
+
+    Yields:
+        (event, data) pairs parsed from the Server-Sent Events stream
+    """
+    payload = {"question": question}
+    if lesson_ids:
+        payload["lesson_ids"] = lesson_ids
+
+    with requests.post(
+        f"{API_URL}/query/stream",
+        json=payload,
+        stream=True,
+        timeout=(5, 60)  # (connect, max wait between tokens)
+    ) as response:
+        if response.status_code != 200:
+            yield "error", {"detail": f"{response.status_code} - {response.text}"}
+            return
+
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                yield event, json.loads(line[len("data: "):])
+
 # API status indicator
 api_healthy = check_api_health()
 
@@ -283,6 +316,17 @@ question = st.text_area(
 if 'current_question' in st.session_state:
     del st.session_state.current_question
 
+# Questions started from the lesson catalog only search that lesson
+lesson_scope = st.session_state.get('lesson_scope')
+if lesson_scope:
+    scope_col, reset_col = st.columns([3, 1])
+    with scope_col:
+        st.caption(f"🔎 Searching only lesson {lesson_scope['id']}: {lesson_scope['title']}")
+    with reset_col:
+        if st.button("Search all lessons", use_container_width=True):
+            del st.session_state.lesson_scope
+            st.rerun()
+
 col1, col2, col3 = st.columns([2, 1, 1])
 
 with col1:
@@ -297,66 +341,76 @@ with col3:
     show_history = st.checkbox("Show History", value=False)
 
 if ask_button and question:
-    with st.spinner("🤔 Searching through lessons and generating answer..."):
-        try:
-            # Add language instruction if specific language chosen
-            enhanced_question = question
-            if language == "Italian":
-                enhanced_question = f"[Rispondi in italiano] {question}"
-            elif language == "English":
-                enhanced_question = f"[Respond in English] {question}"
-
-            # Call the API
-            response = requests.post(
-                f"{API_URL}/query",
-                json={"question": enhanced_question},
-                timeout=60
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                answer = data.get("answer", "No answer received")
-
-                # Update stats
-                st.session_state.total_questions += 1
-
-                # Display the answer
-                st.markdown("### 📖 Answer:")
-                st.markdown(f'<div class="answer-box">{answer}</div>', unsafe_allow_html=True)
-
-                # Add to history
-                st.session_state.history.append({
-                    "question": question,
-                    "answer": answer
-                })
-
-                # Suggest related topics
-                st.markdown("---")
-                st.markdown("### 🔗 Want to learn more?")
-                col1, col2, col3 = st.columns(3)
-
-                with col1:
-                    if st.button("🧠 Related: Neural Networks"):
-                        st.session_state.current_question = "How do neural networks work?"
-                        st.rerun()
-
-                with col2:
-                    if st.button("🔍 Related: Vector Databases"):
-                        st.session_state.current_question = "What are vector databases?"
-                        st.rerun()
-
-                with col3:
-                    if st.button("⛓️ Related: LangChain"):
-                        st.session_state.current_question = "What is LangChain used for?"
-                        st.rerun()
-
-            else:
-                st.error(f"❌ Error: {response.status_code} - {response.text}")
-
-        except requests.exceptions.Timeout:
-            st.error("⏱️ Request timed out. The question might be complex. Try rephrasing or breaking it into smaller questions!")
-        except Exception as e:
-            st.error(f"❌ An error occurred: {str(e)}")
+    try:
+        # Add language instruction if specific language chosen
+        enhanced_question = question
+        if language == "Italian":
+            enhanced_question = f"[Rispondi in italiano] {question}"
+        elif language == "English":
+            enhanced_question = f"[Respond in English] {question}"
+
+        st.markdown("### 📖 Answer:")
+        answer_placeholder = st.empty()
+        answer = ""
+        sources = []
+        error = None
+
+        # Call the streaming API and render tokens as they arrive
+        with st.spinner("🤔 Searching through lessons and generating answer..."):
+            scope_ids = [lesson_scope['id']] if lesson_scope else None
+            for event, data in stream_answer(enhanced_question, scope_ids):
+                if event == "context":
+                    sources = data.get("sources", [])
+                elif event == "token":
+                    answer += data.get("text", "")
+                    answer_placeholder.markdown(f'<div class="answer-box">{answer}▌</div>', unsafe_allow_html=True)
+                elif event == "error":
+                    error = data.get("detail", "Unknown error")
+
+        if error:
+            answer_placeholder.empty()
+            st.error(f"❌ Error: {error}")
+        else:
+            answer = answer or "No answer received"
+            answer_placeholder.markdown(f'<div class="answer-box">{answer}</div>', unsafe_allow_html=True)
+
+            lesson_files = sorted({s["source"] for s in sources if s.get("source")})
+            if lesson_files:
+                st.caption(f"📚 Sources: {', '.join(lesson_files)}")
+
+            # Update stats
+            st.session_state.total_questions += 1
+
+            # Add to history
+            st.session_state.history.append({
+                "question": question,
+                "answer": answer
+            })
+
+            # Suggest related topics
+            st.markdown("---")
+            st.markdown("### 🔗 Want to learn more?")
+            col1, col2, col3 = st.columns(3)
+
+            with col1:
+                if st.button("🧠 Related: Neural Networks"):
+                    st.session_state.current_question = "How do neural networks work?"
+                    st.rerun()
+
+            with col2:
+                if st.button("🔍 Related: Vector Databases"):
+                    st.session_state.current_question = "What are vector databases?"
+                    st.rerun()
+
+            with col3:
+                if st.button("⛓️ Related: LangChain"):
+                    st.session_state.current_question = "What is LangChain used for?"
+                    st.rerun()
+
+    except requests.exceptions.Timeout:
+        st.error("⏱️ Request timed out. The question might be complex. Try rephrasing or breaking it into smaller questions!")
+    except Exception as e:
+        st.error(f"❌ An error occurred: {str(e)}")
 
 elif ask_button and not question:
     st.warning("⚠️ Please enter a question first!")